@@ -14,3 +14,12 @@ class ModelName(str, Enum):
     OPENAI_CHAT = MODEL_QUEN
     TRANSFORMERS_SUMMARIZATION = "document-question-answering"
     HUGGINGFACE_API_QUESTION_ANSWERING = "huggingface-api-question-answering"
+
+
+class EmbeddingFormat(str, Enum):
+    FLOAT32 = "float32"
+    FLOAT16 = "float16"
+    # one float32 scale per vector
+    INT8 = "int8"
+    # raw little-endian float32 bytes
+    BINARY = "binary"
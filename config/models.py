@@ -19,6 +19,92 @@ MAX_TOKENS = 128
 
 # ollama
 OLLAMA_HOST = os.getenv("OLLAMA_HOST")
+# /api/embed sub-batches, up to OLLAMA_EMBED_CONCURRENCY requests in flight per client
+OLLAMA_EMBED_BATCH_SIZE = int(os.getenv("OLLAMA_EMBED_BATCH_SIZE", "64"))
+OLLAMA_EMBED_BATCH_MAX_CHARS = int(os.getenv("OLLAMA_EMBED_BATCH_MAX_CHARS", "32000"))
+OLLAMA_EMBED_CONCURRENCY = int(os.getenv("OLLAMA_EMBED_CONCURRENCY", "4"))
+OLLAMA_EMBED_MAX_RETRIES = int(os.getenv("OLLAMA_EMBED_MAX_RETRIES", "3"))
+OLLAMA_EMBED_BACKOFF_SECONDS = float(os.getenv("OLLAMA_EMBED_BACKOFF_SECONDS", "0.25"))  # doubled per retry, jittered
+OLLAMA_EMBED_BACKOFF_MAX_SECONDS = float(os.getenv("OLLAMA_EMBED_BACKOFF_MAX_SECONDS", "8"))
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE")  # how long ollama keeps the model loaded, i.e. "30m"
+
+# concurrency
+# upper bound of in-flight calls per model and worker, anything above waits for a free slot
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "32"))
+
+# model loading, models are loaded on first use unless warmed up in the background at startup
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() in ("1", "true", "yes")
+# comma separated model names to warm up, every configured model when empty
+MODEL_WARMUP_MODELS = [name.strip() for name in os.getenv("MODEL_WARMUP_MODELS", "").split(",") if name.strip()]
+
+# model registry (utils.model_service.model_registry), instances are pooled per
+# effective config, the least recently used idle ones are evicted past the budget
+MODEL_REGISTRY_MAX_BYTES = int(os.getenv("MODEL_REGISTRY_MAX_BYTES", str(4 * 1024 * 1024 * 1024)))
+MODEL_REGISTRY_MAX_INSTANCES = int(os.getenv("MODEL_REGISTRY_MAX_INSTANCES", "32"))
+MODEL_REGISTRY_MIN_IDLE_SECONDS = float(os.getenv("MODEL_REGISTRY_MIN_IDLE_SECONDS", "300"))
+
+# http connection pool shared by the chat model and ollama embeddings clients
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # seconds
+
+# embedding cache
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+EMBEDDING_CACHE_DISK = os.getenv("EMBEDDING_CACHE_DISK", "false").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_DIR = ROOT_DIR + "/.cache/embeddings"
+# float32, float16 or int8, the compact dtypes trade a little accuracy for 2-4x more entries
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")
+
+# embedding micro-batching
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+
+# summarize response cache, see utils.response_cache
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+# near-identical content is answered from the cache, embedded with the huggingface model. Only
+# content within its max_seq_length (256 word pieces for all-MiniLM-L6-v2) is compared, longer
+# content would be truncated and is only looked up in the exact tier
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))  # cosine similarity
+# after the embedder failed to load, the semantic tier is skipped for this long before retrying
+RESPONSE_CACHE_EMBEDDER_RETRY_SECONDS = float(os.getenv("RESPONSE_CACHE_EMBEDDER_RETRY_SECONDS", "300"))
+
+# prompt templates saved as json (scripts/prompt_json_generator.py), loaded at startup
+PROMPT_TEMPLATES_DIR = os.getenv("PROMPT_TEMPLATES_DIR", ROOT_DIR + "/templates")
+
+# long document summarization, map-reduce over token-bounded chunks
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+SUMMARIZE_CHUNK_TOKENS = int(os.getenv("SUMMARIZE_CHUNK_TOKENS", "1500"))
+SUMMARIZE_CHUNK_OVERLAP_TOKENS = int(os.getenv("SUMMARIZE_CHUNK_OVERLAP_TOKENS", "100"))
+SUMMARIZE_MAP_MAX_TOKENS = int(os.getenv("SUMMARIZE_MAP_MAX_TOKENS", "512"))  # per partial summary
+SUMMARIZE_MAP_CONCURRENCY = int(os.getenv("SUMMARIZE_MAP_CONCURRENCY", "8"))  # per document
+SUMMARIZE_DOCUMENT_MAX_CHARS = int(os.getenv("SUMMARIZE_DOCUMENT_MAX_CHARS", "500000"))
+
+# batch summarization
+SUMMARIZE_BATCH_MAX_ITEMS = int(os.getenv("SUMMARIZE_BATCH_MAX_ITEMS", "1000"))
+SUMMARIZE_BATCH_CONCURRENCY = int(os.getenv("SUMMARIZE_BATCH_CONCURRENCY", "16"))  # per batch
+
+# huggingface embeddings backend: "inprocess" runs the model in the API process,
+# "process_pool" in a pool of worker processes sharing one copy of the weights (one
+# pool per uvicorn worker),
+# "onnx" with ONNX Runtime from an ONNX export of the model, a speedup for small
+# batches and with int8 quantization, not in general (scripts/bench_onnx_embeddings.py)
+HUGGINGFACE_EMBEDDINGS_BACKEND = os.getenv("HUGGINGFACE_EMBEDDINGS_BACKEND", "inprocess")
+EMBEDDING_POOL_WORKERS = int(os.getenv("EMBEDDING_POOL_WORKERS", "2"))
+EMBEDDING_POOL_THREADS_PER_WORKER = int(os.getenv("EMBEDDING_POOL_THREADS_PER_WORKER", "1"))
+EMBEDDING_POOL_MAX_BATCH = int(os.getenv("EMBEDDING_POOL_MAX_BATCH", "32"))  # texts per worker call
+EMBEDDING_POOL_START_METHOD = os.getenv("EMBEDDING_POOL_START_METHOD", "forkserver")
+# int8 dynamic quantization of the ONNX export, 0 threads is one per physical core
+# (more threads than cores is slower). fp32 only beats torch one text per forward
+# pass, int8 up to about 8, so texts run through the session one at a time
+ONNX_EMBEDDINGS_QUANTIZE = os.getenv("ONNX_EMBEDDINGS_QUANTIZE", "false").lower() in ("1", "true", "yes")
+ONNX_EMBEDDINGS_INTRA_OP_THREADS = int(os.getenv("ONNX_EMBEDDINGS_INTRA_OP_THREADS", "0"))
+ONNX_EMBEDDINGS_BATCH_SIZE = int(os.getenv("ONNX_EMBEDDINGS_BATCH_SIZE", "1"))  # texts per forward pass
+
+# vector index
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", ROOT_DIR + "/.cache/collections")
 
 
 MODELS_CONFIG = {
@@ -27,7 +113,14 @@ MODELS_CONFIG = {
         "singleton": True,
         "config": {
             "model": MODEL_QUEN_EMBEDDINGS,
-            "base_url": OLLAMA_HOST
+            "base_url": OLLAMA_HOST,
+            "batch_size": OLLAMA_EMBED_BATCH_SIZE,
+            "batch_max_chars": OLLAMA_EMBED_BATCH_MAX_CHARS,
+            "max_concurrency": OLLAMA_EMBED_CONCURRENCY,
+            "max_retries": OLLAMA_EMBED_MAX_RETRIES,
+            "backoff_seconds": OLLAMA_EMBED_BACKOFF_SECONDS,
+            "backoff_max_seconds": OLLAMA_EMBED_BACKOFF_MAX_SECONDS,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
         }
     },
     ModelName.HUGGINGFACE_EMBEDDINGS: {
@@ -44,6 +137,7 @@ MODELS_CONFIG = {
     ModelName.OPENAI_CHAT: {
         "provider": "openai",
         "singleton": True,
+        "max_concurrency": MAX_CONCURRENT_REQUESTS,
         "config": {
             "model": MODEL_QUEN,
             "api_key": KEY,
@@ -56,4 +150,20 @@ MODELS_CONFIG = {
             "verbosity": "medium",
         }
     }
-}
\ No newline at end of file
+}
+
+if HUGGINGFACE_EMBEDDINGS_BACKEND == "process_pool":
+    MODELS_CONFIG[ModelName.HUGGINGFACE_EMBEDDINGS]["provider"] = "huggingface_pool"
+    MODELS_CONFIG[ModelName.HUGGINGFACE_EMBEDDINGS]["config"].update({
+        "pool_workers": EMBEDDING_POOL_WORKERS,
+        "pool_threads_per_worker": EMBEDDING_POOL_THREADS_PER_WORKER,
+        "pool_max_batch_size": EMBEDDING_POOL_MAX_BATCH,
+        "pool_start_method": EMBEDDING_POOL_START_METHOD,
+    })
+elif HUGGINGFACE_EMBEDDINGS_BACKEND == "onnx":
+    MODELS_CONFIG[ModelName.HUGGINGFACE_EMBEDDINGS]["provider"] = "onnx"
+    MODELS_CONFIG[ModelName.HUGGINGFACE_EMBEDDINGS]["config"].update({
+        "onnx_quantize": ONNX_EMBEDDINGS_QUANTIZE,
+        "onnx_intra_op_threads": ONNX_EMBEDDINGS_INTRA_OP_THREADS,
+        "onnx_batch_size": ONNX_EMBEDDINGS_BATCH_SIZE,
+    })
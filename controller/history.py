@@ -0,0 +1,110 @@
+import uuid
+from datetime import timedelta
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import and_, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import get_async_db
+from models.chat.history import ChatHistory
+from models.model import Model
+from utils.history_recorder import history_recorder
+
+router = APIRouter(prefix="/history", tags=["history"])
+
+# bounds the recursion on a corrupted (cyclic) thread
+THREAD_MAX_DEPTH = 10000
+# clock difference tolerated between the API instances that recorded a thread
+THREAD_CLOCK_SKEW = timedelta(minutes=5)
+
+
+def thread_query(history_id: uuid.UUID, include_archived: bool = False):
+    """
+    Builds the query of the whole thread an exchange belongs to.
+
+    One recursive CTE walks up the parent_id chain to the root, a second one walks
+    down from the root to every reply, both on ix_chat_history_parent_id / the
+    primary key, so the thread is read in a single round trip whatever its depth.
+    The recorder timestamps an exchange when it is queued, after the response of
+    its parent returned the parent id, so a parent is never created after its
+    replies (up to THREAD_CLOCK_SKEW between instances). This lets each step skip
+    the monthly partitions on the wrong side of the exchange it starts from. When
+    an ancestor was removed by retention, the oldest one still stored is the root.
+
+    Args:
+        history_id: Any exchange of the thread.
+        include_archived: Also return archived exchanges and their replies.
+
+    Returns:
+        A select of the exchanges with their depth below the root, ordered by depth
+        then creation time.
+    """
+    ancestors = (
+        select(ChatHistory.id, ChatHistory.parent_id, ChatHistory.created_at, literal_column("0").label("hops"))
+        .where(ChatHistory.id == history_id)
+        .cte("ancestors", recursive=True)
+    )
+    ancestors = ancestors.union_all(
+        select(ChatHistory.id, ChatHistory.parent_id, ChatHistory.created_at, ancestors.c.hops + 1)
+        .join(ancestors, and_(ChatHistory.id == ancestors.c.parent_id, ChatHistory.created_at <= ancestors.c.created_at + THREAD_CLOCK_SKEW))
+        .where(ancestors.c.hops < THREAD_MAX_DEPTH)
+    )
+    # the farthest ancestor found, the root unless retention removed part of the chain
+    root_id = select(ancestors.c.id).order_by(ancestors.c.hops.desc()).limit(1).scalar_subquery()
+
+    thread = (
+        select(ChatHistory.id, ChatHistory.created_at, literal_column("0").label("depth"))
+        .where(ChatHistory.id == root_id)
+        .cte("thread", recursive=True)
+    )
+    replies = (
+        select(ChatHistory.id, ChatHistory.created_at, thread.c.depth + 1)
+        .join(thread, and_(ChatHistory.parent_id == thread.c.id, ChatHistory.created_at >= thread.c.created_at - THREAD_CLOCK_SKEW))
+        .where(thread.c.depth < THREAD_MAX_DEPTH)
+    )
+    if not include_archived:
+        replies = replies.where(ChatHistory.archived_at.is_(None))
+    thread = thread.union_all(replies)
+
+    return (
+        select(
+            ChatHistory.id,
+            ChatHistory.parent_id,
+            thread.c.depth,
+            ChatHistory.prompt,
+            ChatHistory.params,
+            ChatHistory.answers,
+            ChatHistory.request_route,
+            Model.model_name.label("model"),
+            ChatHistory.created_at,
+            ChatHistory.archived_at,
+        )
+        .join(thread, and_(ChatHistory.id == thread.c.id, ChatHistory.created_at == thread.c.created_at))
+        .join(Model, Model.id == ChatHistory.model_id)
+        .order_by(thread.c.depth, ChatHistory.created_at)
+    )
+
+
+@router.get("/stats")
+async def get_history_stats():
+    """Get the stats of the chat history recorder"""
+    return {"recorder": history_recorder.stats()}
+
+
+@router.get("/{history_id}/thread")
+async def get_thread(history_id: uuid.UUID, include_archived: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """
+    Get the conversation thread of an exchange
+
+    Returns every exchange from the root of the thread down to the last reply,
+    with its depth below the root.
+    """
+    rows = (await db.execute(thread_query(history_id, include_archived))).mappings().all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Chat history not found")
+    return {
+        "thread": rows,
+        "meta": {
+            "rootId": rows[0]["id"],
+            "count": len(rows),
+            "depth": max(row["depth"] for row in rows),
+        },
+    }
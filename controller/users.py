@@ -1,12 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from config.database import get_db
+import base64
+import binascii
+from datetime import datetime
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import async_engine, get_async_db
 from models.user import User
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import AsyncIterator, List, Literal, Optional
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+# columns of a listed user, selected as plain rows instead of ORM objects
+USER_COLUMNS = (User.id, User.email, User.username, User.full_name, User.created_at, User.updated_at)
+EXPORT_BATCH_SIZE = 1000
+BULK_MAX_USERS = 10000
+
+# unique indexes of the users table and the error of a conflict on each
+CONFLICT_DETAILS = {
+    "ix_users_email": "Email already registered",
+    "ix_users_username": "Username already taken",
+}
+
 class UserCreate(BaseModel):
     email: str
     username: str
@@ -19,53 +38,160 @@ class UserUpdate(BaseModel):
 
 class UserResponse(UserCreate):
     id: int
-    created_at: str
-    updated_at: str
+    created_at: datetime
+    updated_at: datetime
 
     class Config:
         from_attributes = True
 
+class BulkUserResult(BaseModel):
+    index: int
+    status: Literal["created", "conflict"]
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class BulkUserResponse(BaseModel):
+    created: int
+    conflicts: int
+    results: List[BulkUserResult]
+
+def _conflict_detail(error: IntegrityError) -> str:
+    message = str(error.orig)
+    for index, detail in CONFLICT_DETAILS.items():
+        if index in message:
+            return detail
+    raise error
+
+def _encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps({"id": last_id})).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        last_id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["id"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(last_id, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_id
+
 @router.get("/", response_model=List[UserResponse])
-def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get all users"""
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+async def get_users(
+    response: Response,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Get all users, ordered by id
+
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one, it
+    seeks on the primary key instead of counting `skip` rows. The header is
+    missing on the last page.
+    """
+    query = select(*USER_COLUMNS).order_by(User.id).limit(limit + 1)
+    if cursor is not None:
+        query = query.where(User.id > _decode_cursor(cursor))
+    elif skip:
+        query = query.offset(skip)
+
+    rows = (await db.execute(query)).mappings().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1]["id"])
+    return rows
+
+@router.get("/export")
+async def export_users():
+    """
+    Export all users as NDJSON, one user per line
+
+    Rows are read through a server-side cursor in batches, memory stays constant
+    whatever the size of the table.
+    """
+    async def lines() -> AsyncIterator[bytes]:
+        async with async_engine.connect() as connection:
+            result = await connection.stream(
+                select(*USER_COLUMNS).order_by(User.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            async for rows in result.mappings().partitions():
+                yield b"".join(orjson.dumps(dict(row)) + b"\n" for row in rows)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_db)):
+async def get_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get user by ID"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 @router.post("/", response_model=UserResponse)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new user"""
-    # Check if user already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already taken")
-
-    # Create new user
-    db_user = User(
-        email=user.email,
-        username=user.username,
-        full_name=user.full_name
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    # a single INSERT ... RETURNING, duplicates are rejected by the unique indexes
+    try:
+        result = await db.execute(insert(User).values(**user.model_dump()).returning(*USER_COLUMNS))
+        db_user = result.mappings().one()
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=_conflict_detail(e))
     return db_user
 
+@router.post("/bulk", response_model=BulkUserResponse)
+async def create_users_bulk(users: List[UserCreate], db: AsyncSession = Depends(get_async_db)):
+    """
+    Create many users at once
+
+    The users are inserted with one batched INSERT ... ON CONFLICT DO NOTHING,
+    rows that conflict with an existing user (or an earlier row of the same
+    request) are skipped and reported by index, the other rows are created.
+    """
+    if len(users) > BULK_MAX_USERS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_USERS} users per request")
+    if not users:
+        return {"created": 0, "conflicts": 0, "results": []}
+
+    rows = [user.model_dump() for user in users]
+    result = await db.execute(
+        pg_insert(User).on_conflict_do_nothing().returning(User.id, User.email, User.username),
+        rows,
+    )
+    created = {(email, username): user_id for user_id, email, username in result.all()}
+    # the first row of a pair gets its id, repeated rows of the request were skipped
+    ids = [created.pop((row["email"], row["username"]), None) for row in rows]
+
+    taken_emails = set()
+    skipped = [row for row, user_id in zip(rows, ids) if user_id is None]
+    if skipped:
+        existing = await db.scalars(
+            select(User.email).where(
+                or_(
+                    User.email.in_({row["email"] for row in skipped}),
+                    User.username.in_({row["username"] for row in skipped}),
+                )
+            )
+        )
+        taken_emails.update(existing)
+    await db.commit()
+
+    results = []
+    for index, (row, user_id) in enumerate(zip(rows, ids)):
+        if user_id is not None:
+            results.append({"index": index, "status": "created", "id": user_id})
+        else:
+            index_name = "ix_users_email" if row["email"] in taken_emails else "ix_users_username"
+            results.append({"index": index, "status": "conflict", "detail": CONFLICT_DETAILS[index_name]})
+
+    created_count = sum(1 for result in results if result["status"] == "created")
+    return {"created": created_count, "conflicts": len(results) - created_count, "results": results}
+
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(user_id: int, user: UserUpdate, db: Session = Depends(get_db)):
+async def update_user(user_id: int, user: UserUpdate, db: AsyncSession = Depends(get_async_db)):
     """Update user by ID"""
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -77,17 +203,20 @@ def update_user(user_id: int, user: UserUpdate, db: Session = Depends(get_db)):
     if user.full_name is not None:
         db_user.full_name = user.full_name
 
-    db.commit()
-    db.refresh(db_user)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=_conflict_detail(e))
     return db_user
 
 @router.delete("/{user_id}", response_model=UserResponse)
-def delete_user(user_id: int, db: Session = Depends(get_db)):
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete user by ID"""
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    db.delete(db_user)
-    db.commit()
+    await db.delete(db_user)
+    await db.commit()
     return db_user
\ No newline at end of file
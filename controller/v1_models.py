@@ -1,6 +1,12 @@
 import logging
+import uuid
+from typing import Optional
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from service.demo_1_models import DemoModel
+from utils.streaming import sse_stream, SSE_HEADERS
+from config.enums import ModelName
+from utils.history_recorder import history_recorder
 
 logger = logging.getLogger(__name__)
 
@@ -12,12 +18,39 @@ router = APIRouter(
 
 
 @router.get("/")
-async def demoChat(question: str):
+async def demoChat(question: str, parent_id: Optional[uuid.UUID] = None):
     logger.info(f"demoChat endpoint called with question: {question}")
     try:
-        result = DemoModel.chat(question)
+        result = await DemoModel.achat(question)
         logger.info(f"demoChat endpoint returning with message: {result}")
-        return {"message": result}
+        history_id = await history_recorder.record(
+            prompt=question,
+            model_name=ModelName.OPENAI_CHAT.value,
+            request_route="/video-1/",
+            answers=[result],
+            parent_id=parent_id,
+        )
+        return {"message": result, "meta": {"historyId": history_id}}
     except Exception as e:
         logger.error(f"Error in demoChat endpoint: {e}", exc_info=True)
         return {"error": str(e)}, 500
+
+
+@router.get("/stream")
+async def demoChatStream(question: str, parent_id: Optional[uuid.UUID] = None):
+    logger.info(f"demoChatStream endpoint called with question: {question}")
+    # historyId is added once the answer is recorded, before the final event
+    meta = {"model": ModelName.OPENAI_CHAT.value}
+    chunks = history_recorder.record_stream(
+        DemoModel.astream_chat(question),
+        prompt=question,
+        model_name=ModelName.OPENAI_CHAT.value,
+        request_route="/video-1/stream",
+        parent_id=parent_id,
+        meta=meta,
+    )
+    return StreamingResponse(
+        sse_stream(chunks, meta=meta),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
@@ -1,8 +1,11 @@
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, Field
 from typing import List, Optional
+from config.enums import EmbeddingFormat
 from service.demo_2_embeddings import DemoEmbeddingsService
+from utils.responses import FastJSONResponse, embeddings_response
 
 logger = logging.getLogger(__name__)
 
@@ -10,28 +13,83 @@ router = APIRouter(
     prefix="/video-2",
     tags=["Embeddings Demo"],
     responses={404: {"description": "Not found"}},
+    default_response_class=FastJSONResponse,
 )
 
 embeddings_service = DemoEmbeddingsService()
 
+DEFAULT_COLLECTION = "month_facts"
+
+MONTH_FACTS = [
+    # January
+    "January is named after the Roman god Janus, the god of beginnings and endings",
+    # February
+    "February is the only month that can pass without a single full moon",
+    # March
+    "The expression 'Mad as a March Hare' comes from the hare's unusual behavior during its breeding season in March",
+    # April
+    "The diamond (April's birthstone) is one of the hardest natural substances on Earth",
+    # May
+    "The month of May is named for the Greek goddess Maia, who was the goddess of fertility",
+    # June
+    "June has the longest daylight hours of the year in the Northern Hemisphere (Summer Solstice)",
+    # July
+    "Before being named after Julius Caesar, July was called Quintilis, which is Latin for 'fifth'",
+    # August
+    "August was originally named Sextilis ('sixth') before being renamed for Augustus Caesar",
+    # September
+    "September comes from the Latin word septem, meaning 'seven', as it was the seventh month in the Roman calendar",
+    # October
+    "The first week of October is officially World Space Week",
+    # November
+    "Daylight Saving Time ends in November, giving everyone an 'extra' hour of sleep",
+    # December
+    "The Winter Solstice, the day with the shortest daylight in the Northern Hemisphere, occurs in December",
+]
+
+MONTH_FACT_IDS = [
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+]
+
 
 class SearchRequest(BaseModel):
     query: str
     documents: Optional[List[str]] = None
+    k: int = Field(default=3, ge=1, le=100)
+
+
+class IngestRequest(BaseModel):
+    documents: List[str] = Field(min_length=1)
+    ids: Optional[List[str]] = None
+
+
+class DeleteRequest(BaseModel):
+    ids: List[str] = Field(min_length=1)
+
+
+class CollectionSearchRequest(BaseModel):
+    query: str
+    k: int = Field(default=3, ge=1, le=100)
+    # only used by collections with an IVF index
+    nprobe: Optional[int] = Field(default=None, ge=1)
+    exact: bool = False
+
+
+class BuildIndexRequest(BaseModel):
+    nlist: Optional[int] = Field(default=None, ge=1)
+    nprobe: Optional[int] = Field(default=None, ge=1)
 
 
 @router.post("/convert-to-embeddings")
-async def convert_to_embeddings_route(text: str):
+async def convert_to_embeddings_route(text: str, http_request: Request, format: EmbeddingFormat = EmbeddingFormat.FLOAT32):
     logger.info(f"convert_to_embeddings_route called with text: {text[:50]}...") # Log first 50 chars
     try:
-        result = embeddings_service.convertToEmbeddings(text)
+        result = await embeddings_service.aconvertToEmbeddings(text)
         logger.info("convert_to_embeddings_route successful.")
-        return {
-            "embeddings": result,
-            "meta": {
-                "model": "mxbai-embed-large"
-            }
-        }
+        return embeddings_response(http_request, "embeddings", result, {
+            "model": "mxbai-embed-large"
+        }, format=format)
     except ValueError as e:
         logger.error(f"ValueError in convert_to_embeddings_route: {e}", exc_info=True)
         raise HTTPException(status_code=400, detail=str(e))
@@ -41,17 +99,17 @@ async def convert_to_embeddings_route(text: str):
 
 
 @router.post("/from-documents")
-async def get_embeddings_from_documents_route(documents: list[str]):
+async def get_embeddings_from_documents_route(
+    documents: list[str], http_request: Request, format: EmbeddingFormat = EmbeddingFormat.FLOAT32
+):
     logger.info(f"get_embeddings_from_documents_route called with {len(documents)} documents.")
     try:
-        result = embeddings_service.getEmbeddingsFromDocuments(documents)
+        # sub-batches and retries (with their backoff) of the blocking ollama client
+        result = await asyncio.to_thread(embeddings_service.getEmbeddingsFromDocuments, documents)
         logger.info("get_embeddings_from_documents_route successful.")
-        return {
-            "document_embeddings": result,
-            "meta": {
-                "model": "mxbai-embed-large"
-            }
-        }
+        return embeddings_response(http_request, "document_embeddings", result, {
+            "model": "mxbai-embed-large"
+        }, format=format)
     except ValueError as e:
         logger.error(f"ValueError in get_embeddings_from_documents_route: {e}", exc_info=True)
         raise HTTPException(status_code=400, detail=str(e))
@@ -66,38 +124,17 @@ async def embeddings_search_route(request: SearchRequest):
     documents = request.documents or []
     logger.info(f"embeddings_search_route called with query: '{query}' and {len(documents)} documents.")
     try:
-        month_facts = [
-            # January
-            "January is named after the Roman god Janus, the god of beginnings and endings",
-            # February
-            "February is the only month that can pass without a single full moon",
-            # March
-            "The expression 'Mad as a March Hare' comes from the hare's unusual behavior during its breeding season in March",
-            # April
-            "The diamond (April's birthstone) is one of the hardest natural substances on Earth",
-            # May
-            "The month of May is named for the Greek goddess Maia, who was the goddess of fertility",
-            # June
-            "June has the longest daylight hours of the year in the Northern Hemisphere (Summer Solstice)",
-            # July
-            "Before being named after Julius Caesar, July was called Quintilis, which is Latin for 'fifth'",
-            # August
-            "August was originally named Sextilis ('sixth') before being renamed for Augustus Caesar",
-            # September
-            "September comes from the Latin word septem, meaning 'seven', as it was the seventh month in the Roman calendar",
-            # October
-            "The first week of October is officially World Space Week",
-            # November
-            "Daylight Saving Time ends in November, giving everyone an 'extra' hour of sleep",
-            # December
-            "The Winter Solstice, the day with the shortest daylight in the Northern Hemisphere, occurs in December",
-        ]
         question = "which month's old name is in latin that represents a number?"
+        query = question if query == "" else query
 
-        result = embeddings_service.embeddingsSearch(
-            question if query == "" else query,
-            documents if len(documents) > 0 else month_facts,
-        )
+        if len(documents) > 0:
+            result = await asyncio.to_thread(embeddings_service.embeddingsSearch, query, documents, k=request.k)
+        else:
+            # the default corpus is embedded once into its own collection
+            if not embeddings_service.hasCollection(DEFAULT_COLLECTION):
+                await asyncio.to_thread(embeddings_service.ingestDocuments, DEFAULT_COLLECTION, MONTH_FACTS, MONTH_FACT_IDS)
+            items = await asyncio.to_thread(embeddings_service.collectionSearch, DEFAULT_COLLECTION, query, k=request.k)
+            result = [f"{item['score']:.4f} ({item['document']})" for item in items]
         logger.info("embeddings_search_route successful.")
         return {
             "search_results": result,
@@ -111,3 +148,139 @@ async def embeddings_search_route(request: SearchRequest):
     except Exception as e:
         logger.error(f"Internal server error in embeddings_search_route: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.get("/collections")
+async def list_collections_route():
+    return {
+        "collections": await asyncio.to_thread(embeddings_service.listCollections),
+        "meta": {}
+    }
+
+
+@router.post("/collections/{collection}/documents")
+async def ingest_documents_route(collection: str, request: IngestRequest):
+    logger.info(f"ingest_documents_route called for collection '{collection}' with {len(request.documents)} documents.")
+    try:
+        ids = await asyncio.to_thread(embeddings_service.ingestDocuments, collection, request.documents, request.ids)
+        logger.info("ingest_documents_route successful.")
+        return {
+            "ids": ids,
+            "meta": {
+                "model": "sentence-transformers/all-MiniLM-L6-v2"
+            }
+        }
+    except ValueError as e:
+        logger.error(f"ValueError in ingest_documents_route: {e}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Internal server error in ingest_documents_route: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.delete("/collections/{collection}/documents")
+async def delete_documents_route(collection: str, request: DeleteRequest):
+    logger.info(f"delete_documents_route called for collection '{collection}' with {len(request.ids)} ids.")
+    try:
+        # may compact the collection
+        deleted = await asyncio.to_thread(embeddings_service.deleteDocuments, collection, request.ids)
+        return {
+            "deleted": deleted,
+            "meta": {}
+        }
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/collections/{collection}")
+async def drop_collection_route(collection: str):
+    logger.info(f"drop_collection_route called for collection '{collection}'.")
+    try:
+        if not await asyncio.to_thread(embeddings_service.dropCollection, collection):
+            raise HTTPException(status_code=404, detail=f"Collection '{collection}' not found")
+        return {
+            "dropped": collection,
+            "meta": {}
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/collections/{collection}/search")
+async def collection_search_route(collection: str, request: CollectionSearchRequest):
+    logger.info(f"collection_search_route called for collection '{collection}' with query: '{request.query}'.")
+    try:
+        result = await asyncio.to_thread(
+            embeddings_service.collectionSearch,
+            collection,
+            request.query,
+            k=request.k,
+            nprobe=request.nprobe,
+            exact=request.exact,
+        )
+        logger.info("collection_search_route successful.")
+        return {
+            "search_results": result,
+            "meta": {
+                "model": "sentence-transformers/all-MiniLM-L6-v2"
+            }
+        }
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        logger.error(f"ValueError in collection_search_route: {e}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Internal server error in collection_search_route: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.post("/collections/{collection}/index")
+async def build_collection_index_route(collection: str, request: BuildIndexRequest):
+    logger.info(f"build_collection_index_route called for collection '{collection}'.")
+    try:
+        # k-means over the whole collection, seconds on large ones
+        index = await asyncio.to_thread(
+            embeddings_service.buildCollectionIndex, collection, nlist=request.nlist, nprobe=request.nprobe
+        )
+        return {
+            "index": index,
+            "meta": {}
+        }
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        logger.error(f"ValueError in build_collection_index_route: {e}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/collections/{collection}/index")
+async def drop_collection_index_route(collection: str):
+    logger.info(f"drop_collection_index_route called for collection '{collection}'.")
+    try:
+        return {
+            "dropped": await asyncio.to_thread(embeddings_service.dropCollectionIndex, collection),
+            "meta": {}
+        }
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/cache/stats")
+async def embeddings_cache_stats_route():
+    return {
+        "cache": embeddings_service.cacheStats(),
+        "meta": {}
+    }
+
+
+@router.get("/batching/stats")
+async def embeddings_batching_stats_route():
+    return {
+        "batching": embeddings_service.batchingStats(),
+        "meta": {}
+    }
@@ -1,7 +1,20 @@
 import logging
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, field_validator
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+import orjson
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator
 from service.demo_3_prompt  import DemoPromptService, ResponseLengthOptions, ResponseFormatOptions
+from utils.streaming import sse_stream, SSE_HEADERS
+from utils.history_recorder import history_recorder
+from config.enums import ModelName
+from config.models import (
+    SUMMARIZE_DOCUMENT_MAX_CHARS,
+    SUMMARIZE_MAP_CONCURRENCY,
+    SUMMARIZE_BATCH_MAX_ITEMS,
+    SUMMARIZE_BATCH_CONCURRENCY,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -19,6 +32,8 @@ class SummarizeRequest(BaseModel):
     content: str
     responseLength: ResponseLengthOptions = ResponseLengthOptions.SHORT
     responseFormat: ResponseFormatOptions = ResponseFormatOptions.PLAIN_TEXT
+    # the chat history id of the exchange this one follows up on
+    parentId: Optional[uuid.UUID] = None
 
     @field_validator('content')
     @classmethod
@@ -29,23 +44,70 @@ class SummarizeRequest(BaseModel):
             raise ValueError('Content length must be less than 2000 characters')
         return v
 
+class SummarizeDocumentRequest(BaseModel):
+    content: str
+    responseLength: ResponseLengthOptions = ResponseLengthOptions.SHORT
+    responseFormat: ResponseFormatOptions = ResponseFormatOptions.PLAIN_TEXT
+    mapConcurrency: int = Field(default=SUMMARIZE_MAP_CONCURRENCY, ge=1, le=32)
+    parentId: Optional[uuid.UUID] = None
+
+    @field_validator('content')
+    @classmethod
+    def content_must_be_valid_length(cls, v):
+        if len(v) == 0:
+            raise ValueError('Content length must be greater than 0')
+        if len(v) > SUMMARIZE_DOCUMENT_MAX_CHARS:
+            raise ValueError(f'Content length must be less than {SUMMARIZE_DOCUMENT_MAX_CHARS} characters')
+        return v
+
+class SummarizeBatchRequest(BaseModel):
+    # validated one by one, an invalid item is reported in its result instead of failing the batch
+    items: List[Dict[str, Any]] = Field(min_length=1, max_length=SUMMARIZE_BATCH_MAX_ITEMS)
+    concurrency: int = Field(default=SUMMARIZE_BATCH_CONCURRENCY, ge=1, le=64)
+
+# request fields not recorded in the params of the chat history
+HISTORY_EXCLUDE = {"content", "parentId"}
+
+
+def use_response_cache(cache_control: Optional[str]) -> bool:
+    # "Cache-Control: no-cache" (or no-store) asks for a freshly generated answer
+    directives = {directive.strip().lower() for directive in (cache_control or "").split(",")}
+    return not directives & {"no-cache", "no-store"}
+
+
 @router.post("/summarize")
-async def summarize_route(request: SummarizeRequest):
+async def summarize_route(
+    request: SummarizeRequest,
+    response: Response,
+    cache_control: Optional[str] = Header(default=None),
+):
     content = request.content
 
     logger.info(f"summarize_route called with content: '{content[:50]}...'")
 
     try:
-        result = prompt_service.getSummarizePrompt(
+        result, cache_status = await prompt_service.agetCachedSummarizePrompt(
             max_length=request.responseLength,
             response_format=request.responseFormat,
             content=content,
+            use_cache=use_response_cache(cache_control),
+        )
+        logger.info(f"summarize_route successful (cache {cache_status}).")
+        response.headers["X-Cache"] = cache_status.upper()
+        history_id = await history_recorder.record(
+            prompt=content,
+            model_name=ModelName.OPENAI_CHAT.value,
+            request_route="/video-3/summarize",
+            answers=[result],
+            params=request.model_dump(mode="json", exclude=HISTORY_EXCLUDE),
+            parent_id=request.parentId,
         )
-        logger.info("summarize_route successful.")
         return {
             "summary": result,
             "meta": {
-                "model": "gpt-3.5-turbo"  # or whatever model is being used
+                "model": "gpt-3.5-turbo",  # or whatever model is being used
+                "cache": cache_status,
+                "historyId": history_id,
             }
         }
     except ValueError as e:
@@ -56,6 +118,154 @@ async def summarize_route(request: SummarizeRequest):
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
 
+@router.post("/summarize/document")
+async def summarize_document_route(
+    request: SummarizeDocumentRequest,
+    cache_control: Optional[str] = Header(default=None),
+):
+    content = request.content
+
+    logger.info(f"summarize_document_route called with {len(content)} chars: '{content[:50]}...'")
+
+    try:
+        result, stats = await prompt_service.agetSummarizeDocument(
+            max_length=request.responseLength,
+            response_format=request.responseFormat,
+            content=content,
+            map_concurrency=request.mapConcurrency,
+            use_cache=use_response_cache(cache_control),
+        )
+        logger.info(f"summarize_document_route successful ({stats}).")
+        history_id = await history_recorder.record(
+            prompt=content,
+            model_name=ModelName.OPENAI_CHAT.value,
+            request_route="/video-3/summarize/document",
+            answers=[result],
+            params=request.model_dump(mode="json", exclude=HISTORY_EXCLUDE),
+            parent_id=request.parentId,
+        )
+        return {
+            "summary": result,
+            "meta": {
+                "model": "gpt-3.5-turbo",  # or whatever model is being used
+                **stats,
+                "historyId": history_id,
+            }
+        }
+    except ValueError as e:
+        logger.error(f"ValueError in summarize_document_route: {e}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Internal server error in summarize_document_route: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+def _batch_error(index: int, detail: str) -> Dict[str, Any]:
+    return {"index": index, "status": "error", "detail": detail}
+
+
+@router.post("/summarize/batch")
+async def summarize_batch_route(
+    request: SummarizeBatchRequest,
+    accept: Optional[str] = Header(default=None),
+    cache_control: Optional[str] = Header(default=None),
+):
+    """
+    Summarize many contents at once
+
+    Every item is a /summarize request body. Items are summarized `concurrency` at
+    a time and each one gets a result with its index, "ok" with the summary or
+    "error" with the detail. Results are returned in the order of the items, or
+    with `Accept: application/x-ndjson` streamed one per line as soon as each item
+    completes.
+    """
+    logger.info(f"summarize_batch_route called with {len(request.items)} items, concurrency {request.concurrency}")
+
+    items: List[SummarizeRequest] = []
+    positions: List[int] = []
+    errors: List[Dict[str, Any]] = []
+    for index, item in enumerate(request.items):
+        try:
+            items.append(SummarizeRequest.model_validate(item))
+            positions.append(index)
+        except ValidationError as e:
+            errors.append(_batch_error(index, "; ".join(error["msg"] for error in e.errors())))
+
+    async def results() -> AsyncIterator[Dict[str, Any]]:
+        for error in errors:
+            yield error
+        completed = prompt_service.abatchSummarizeAsCompleted(
+            [(item.responseLength, item.responseFormat, item.content) for item in items],
+            max_concurrency=request.concurrency,
+            use_cache=use_response_cache(cache_control),
+        )
+        async for position, result in completed:
+            index, item = positions[position], items[position]
+            if isinstance(result, Exception):
+                yield _batch_error(index, str(result))
+                continue
+            summary, cache_status = result
+            history_id = await history_recorder.record(
+                prompt=item.content,
+                model_name=ModelName.OPENAI_CHAT.value,
+                request_route="/video-3/summarize/batch",
+                answers=[summary],
+                params=item.model_dump(mode="json", exclude=HISTORY_EXCLUDE),
+                parent_id=item.parentId,
+            )
+            yield {"index": index, "status": "ok", "summary": summary, "cache": cache_status, "historyId": history_id}
+
+    if "application/x-ndjson" in (accept or ""):
+        async def lines() -> AsyncIterator[bytes]:
+            async for result in results():
+                yield orjson.dumps(result) + b"\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    ordered: List[Optional[Dict[str, Any]]] = [None] * len(request.items)
+    async for result in results():
+        ordered[result["index"]] = result
+    succeeded = sum(1 for result in ordered if result["status"] == "ok")
+    logger.info(f"summarize_batch_route done, {succeeded} of {len(ordered)} items succeeded.")
+    return {
+        "results": ordered,
+        "meta": {
+            "model": "gpt-3.5-turbo",  # or whatever model is being used
+            "items": len(ordered),
+            "succeeded": succeeded,
+            "failed": len(ordered) - succeeded,
+        }
+    }
+
+
+@router.post("/summarize/stream")
+async def summarize_stream_route(request: SummarizeRequest):
+    content = request.content
+
+    logger.info(f"summarize_stream_route called with content: '{content[:50]}...'")
+
+    # historyId is added once the answer is recorded, before the final event
+    meta: Dict[str, Any] = {"model": "gpt-3.5-turbo"}  # or whatever model is being used
+    chunks = history_recorder.record_stream(
+        prompt_service.astreamSummarizePrompt(
+            max_length=request.responseLength,
+            response_format=request.responseFormat,
+            content=content,
+        ),
+        prompt=content,
+        model_name=ModelName.OPENAI_CHAT.value,
+        request_route="/video-3/summarize/stream",
+        params=request.model_dump(mode="json", exclude=HISTORY_EXCLUDE),
+        parent_id=request.parentId,
+        meta=meta,
+    )
+    return StreamingResponse(
+        sse_stream(chunks, meta=meta),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
 @router.post("/summarize-v2")
 async def summarize_route_v2(request: SummarizeRequest):
     content = request.content
@@ -63,16 +273,25 @@ async def summarize_route_v2(request: SummarizeRequest):
     logger.info(f"summarize_route_v2 called with content: '{content[:50]}...'")
 
     try:
-        result = prompt_service.getSummarizePromptV2(
+        result = await prompt_service.agetSummarizePromptV2(
             max_length=request.responseLength,
             response_format=request.responseFormat,
             content=content,
         )
         logger.info("summarize_route_v2 successful.")
+        history_id = await history_recorder.record(
+            prompt=content,
+            model_name=ModelName.OPENAI_CHAT.value,
+            request_route="/video-3/summarize-v2",
+            answers=[result],
+            params=request.model_dump(mode="json", exclude=HISTORY_EXCLUDE),
+            parent_id=request.parentId,
+        )
         return {
             "summary": result,
             "meta": {
-                "model": "gpt-3.5-turbo"  # or whatever model is being used
+                "model": "gpt-3.5-turbo",  # or whatever model is being used
+                "historyId": history_id,
             }
         }
     except ValueError as e:
@@ -83,3 +302,17 @@ async def summarize_route_v2(request: SummarizeRequest):
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
 
+@router.get("/cache/stats")
+async def summarize_cache_stats_route():
+    return {
+        "cache": prompt_service.cacheStats(),
+        "meta": {}
+    }
+
+
+@router.get("/templates/stats")
+async def prompt_templates_stats_route():
+    return {
+        "templates": prompt_service.templateStats(),
+        "meta": {}
+    }
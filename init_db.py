@@ -1,11 +1,18 @@
 from config.database import engine, Base
 from models.user import User
+from utils.history_partitions import ensure_partitions
 # Import all other models here
 
+def create_history_partitions():
+    """Create the monthly partitions of chat_history, as the maintenance does"""
+    with engine.connect() as connection:
+        ensure_partitions(connection)
+
 def init_db():
     """Initialize database tables"""
     # Create all tables
     Base.metadata.create_all(bind=engine)
+    create_history_partitions()
     print("Database tables created successfully!")
 
 def reset_db():
@@ -14,6 +21,7 @@ def reset_db():
     Base.metadata.drop_all(bind=engine)
     # Create all tables
     Base.metadata.create_all(bind=engine)
+    create_history_partitions()
     print("Database tables reset successfully!")
 
 if __name__ == "__main__":
@@ -1,22 +1,57 @@
+import asyncio
 import logging
 from logging.config import dictConfig
 from logging_config import LOGGING_CONFIG
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware # Import CORSMiddleware
 from controller.v1_models import router as v1_models
-from controller.v2_embeddings import router as v2_embeddings
+from controller.v2_embeddings import router as v2_embeddings, embeddings_service
 from controller.v3_prompts import router as v3_prompts
 from controller.users import router as users_router
+from controller.history import router as history_router
 from middleware.timing_middleware import TimingMiddleware
+from utils.responses import FastJSONResponse
+from utils.history_recorder import history_recorder
+from utils.history_partitions import maintenance_loop as history_maintenance_loop
+from utils.model_service import loaded_models, warm_up
+from config.database import HISTORY_MAINTENANCE_INTERVAL_HOURS
+from config.models import MODEL_WARMUP, MODEL_WARMUP_MODELS
+from config.enums import ModelName
 
 dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger("") # Get the root logger
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    history_recorder.start()
+    # models load on first use, the warm-up loads them in the background so the
+    # worker serves traffic right away, /readyz tells when they are warm
+    app.state.warmup = None
+    if MODEL_WARMUP:
+        models = [ModelName(name) for name in MODEL_WARMUP_MODELS] or None
+        app.state.warmup = asyncio.create_task(asyncio.to_thread(warm_up, models))
+    maintenance = None
+    if HISTORY_MAINTENANCE_INTERVAL_HOURS > 0:
+        # chat history partitions and retention
+        maintenance = asyncio.create_task(history_maintenance_loop())
+    yield
+    if maintenance is not None:
+        maintenance.cancel()
+    if app.state.warmup is not None:
+        # a thread cannot be interrupted, the task result is just dropped
+        app.state.warmup.cancel()
+    # answer the embedding requests still queued, then write the chat history
+    await embeddings_service.ollama_batcher.stop()
+    await history_recorder.stop()
+
 app = FastAPI(
+    lifespan=lifespan,
     title="My FastAPI App",
     description="This is my awesome FastAPI application.",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
 
 # Configure CORS
@@ -40,6 +75,7 @@ app.include_router(v1_models)
 app.include_router(v2_embeddings)
 app.include_router(v3_prompts)
 app.include_router(users_router)
+app.include_router(history_router)
 
 
 @app.get("/")
@@ -50,3 +86,22 @@ async def read_root():
 @app.get("/healthz")
 async def health_check():
     return {"status": "ok"}
+
+@app.get("/readyz")
+async def readiness_check(response: Response):
+    """
+    Readiness, unlike /healthz which only tells that the worker is up
+
+    503 while the startup warm-up runs, then "ready", or "degraded" when a model
+    failed to load (routes that need it will fail, the others still work).
+    """
+    warmup = getattr(app.state, "warmup", None)
+    models = loaded_models()
+    if warmup is not None and not warmup.done():
+        response.status_code = 503
+        return {"status": "warming", "models": models}
+
+    errors = {}
+    if warmup is not None and not warmup.cancelled() and warmup.exception() is None:
+        errors = {name: error for name, error in warmup.result().items() if error}
+    return {"status": "degraded" if errors else "ready", "models": models, "errors": errors}
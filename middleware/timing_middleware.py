@@ -1,120 +1,184 @@
 import logging
 import time
 from datetime import datetime, timezone
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-import json
-from typing import Any, cast
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import orjson
+from typing import Any, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
-class TimingMiddleware(BaseHTTPMiddleware):
+
+def _dumps(data: Any) -> bytes:
+    return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def _is_json(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip()
+    return media_type == "application/json" or media_type.endswith("+json")
+
+
+def splice_meta(body: bytes, timing: Dict[str, Any]) -> bytes:
+    """
+    Adds timing information to the `meta` block of a JSON body without parsing it.
+
+    Routes put `meta` as the last key of their response, so only the tail of the
+    body after the last `"meta"` key is parsed. A body without any `meta` key gets
+    one appended, a non-object body is wrapped as {"data": ..., "meta": ...}. Any
+    other shape falls back to a full parse.
+
+    Args:
+        body: A complete JSON document.
+        timing: The timing keys to add to `meta`.
+
+    Returns:
+        The new JSON document.
+    """
+    stripped = body.strip()
+    if not stripped:
+        return _dumps({"meta": timing})
+
+    if not stripped.startswith(b"{"):
+        # If response is not a dict, wrap it
+        return b'{"data":' + stripped + b',"meta":' + _dumps(timing) + b"}"
+
+    key = stripped.rfind(b'"meta"')
+    if key == -1:
+        inner = stripped[1:-1].strip()
+        if not inner:
+            return b'{"meta":' + _dumps(timing) + b"}"
+        return stripped[:-1].rstrip() + b',"meta":' + _dumps(timing) + b"}"
+
+    # the tail `"meta": {...}, ...}` only parses as an object if meta is a key of the
+    # outer object, a nested `meta` key leaves unbalanced brackets
+    if stripped[:key].rstrip()[-1:] in (b",", b"{"):
+        try:
+            tail = orjson.loads(b"{" + stripped[key:])
+        except orjson.JSONDecodeError:
+            tail = None
+        if isinstance(tail, dict) and isinstance(tail.get("meta"), dict):
+            # keys following meta, if any, are part of the tail and re-serialized with it
+            tail["meta"] = {**tail["meta"], **timing}
+            return stripped[:key] + _dumps(tail)[1:]
+
+    response_data = orjson.loads(body)
+    if not isinstance(response_data.get("meta"), dict):
+        response_data["meta"] = {}
+    response_data["meta"].update(timing)
+    return _dumps(response_data)
+
+
+class TimingMiddleware:
     """
     Middleware to add processing time and timestamps to response metadata
+
+    Pure ASGI: JSON bodies are collected as a list of chunks and get their `meta`
+    block spliced in (see splice_meta), every other response is forwarded chunk by
+    chunk with the timing as X-Request-Time / X-Response-Time / X-Process-Time
+    headers, and the time to the first chunk of a stream is logged.
     """
 
-    async def dispatch(self, request: Request, call_next):
-        logger.info(f"Request received for route: {request.method} {request.url.path}")
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        logger.info(f"Request received for route: {scope['method']} {scope['path']}")
         # Capture request time in UTC
         request_time = datetime.now(timezone.utc).isoformat()
         start_time = time.time()
 
+        start_message: Optional[Message] = None
+        chunks: List[bytes] = []
+        is_json = False
+        first_chunk_time: Optional[float] = None
+        streamed = False
+
+        def timing() -> Dict[str, Any]:
+            return {
+                "requestTime": request_time,
+                "responseTime": datetime.now(timezone.utc).isoformat(),
+                "processTime": round(time.time() - start_time, 4),
+            }
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal start_message, is_json, first_chunk_time, streamed
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = MutableHeaders(scope=message)
+                is_json = (
+                    _is_json(headers.get("content-type", ""))
+                    and scope["method"] != "HEAD"
+                    and message["status"] not in (204, 304)
+                )
+                if is_json:
+                    # sent together with the body, once content-length is known
+                    return
+                current = timing()
+                headers["X-Request-Time"] = current["requestTime"]
+                headers["X-Response-Time"] = current["responseTime"]
+                headers["X-Process-Time"] = str(current["processTime"])
+                await send(message)
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            more_body = message.get("more_body", False)
+            if not is_json:
+                if first_chunk_time is None:
+                    first_chunk_time = time.time() - start_time
+                streamed = streamed or more_body
+                await send(message)
+                if streamed and not more_body:
+                    logger.info(
+                        f"Streamed {scope['method']} {scope['path']}: "
+                        f"timeToFirstToken={round(first_chunk_time, 4)}s totalTime={round(time.time() - start_time, 4)}s"
+                    )
+                return
+
+            chunks.append(message.get("body", b""))
+            if more_body:
+                return
+
+            assert start_message is not None
+            body = b"".join(chunks)
+            chunks.clear()
+            current = timing()
+            try:
+                body = splice_meta(body, current)
+            except (ValueError, AttributeError) as e:
+                # If we can't parse or modify the response, just add the timing as a header
+                logger.warning(f"Could not add timing to JSON response: {e}")
+                headers = MutableHeaders(scope=start_message)
+                headers["X-Request-Time"] = current["requestTime"]
+                headers["X-Response-Time"] = current["responseTime"]
+                headers["X-Process-Time"] = str(current["processTime"])
+
+            MutableHeaders(scope=start_message)["content-length"] = str(len(body))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_with_timing)
         except Exception as e:
-            # Even if there's an error, we still want to add timing info
-            process_time = time.time() - start_time
-            response_time = datetime.now(timezone.utc).isoformat()
-
             logger.error(f"Error processing request: {e}")
+            if start_message is not None and not is_json:
+                # the response already started, nothing can be sent anymore
+                raise
             # Return a proper error response with timing information
-            response_content = json.dumps({
-                "error": str(e),
-                "meta": {
-                    "requestTime": request_time,
-                    "responseTime": response_time,
-                    "processTime": round(process_time, 4)
-                }
+            body = _dumps({"error": str(e), "meta": timing()})
+            await send({
+                "type": "http.response.start",
+                "status": 500,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
             })
-            return Response(
-                content=response_content,
-                status_code=500,
-                media_type="application/json"
-            )
-
-        # Capture response time in UTC
-        response_time = datetime.now(timezone.utc).isoformat()
-        process_time = time.time() - start_time
-
-        # For JSON responses, add timing to the response body
-        if response.headers.get("content-type", "").startswith("application/json"):
-            try:
-                # Read the response body
-                body = b""
-                async for chunk in cast(Any, response).body_iterator:
-                    body += chunk
-
-                # Parse the JSON response
-                if body:
-                    response_data = json.loads(body.decode())
-
-                    # Add timing information to the response
-                    if isinstance(response_data, dict):
-                        if "meta" not in response_data:
-                            response_data["meta"] = {}
-                        response_data["meta"]["requestTime"] = request_time
-                        response_data["meta"]["responseTime"] = response_time
-                        response_data["meta"]["processTime"] = round(process_time, 4)
-                        # Model information will be preserved if already in response_data["meta"]
-                    else:
-                        # If response is not a dict, wrap it
-                        response_data = {
-                            "data": response_data,
-                            "meta": {
-                                "requestTime": request_time,
-                                "responseTime": response_time,
-                                "processTime": round(process_time, 4)
-                            }
-                        }
-
-                    # Create new response with modified content
-                    response_content = json.dumps(response_data)
-                    response.headers["content-length"] = str(len(response_content.encode()))
-
-                    return Response(
-                        content=response_content,
-                        status_code=response.status_code,
-                        headers=dict(response.headers),
-                        media_type=response.media_type
-                    )
-                else:
-                    # Empty response
-                    response_content = json.dumps({
-                        "meta": {
-                            "requestTime": request_time,
-                            "responseTime": response_time,
-                            "processTime": round(process_time, 4)
-                        }
-                    })
-                    response.headers["content-length"] = str(len(response_content.encode()))
-
-                    return Response(
-                        content=response_content,
-                        status_code=response.status_code,
-                        headers=dict(response.headers),
-                        media_type=response.media_type
-                    )
-            except Exception as e:
-                # If we can't parse or modify the response, just add the timing as a header
-                logger.warning(f"Could not add timing to JSON response: {e}")
-                response.headers["X-Request-Time"] = request_time
-                response.headers["X-Response-Time"] = response_time
-                response.headers["X-Process-Time"] = str(round(process_time, 4))
-                return response
-        else:
-            # For non-JSON responses, add timing as headers
-            response.headers["X-Request-Time"] = request_time
-            response.headers["X-Response-Time"] = response_time
-            response.headers["X-Process-Time"] = str(round(process_time, 4))
-            return response
\ No newline at end of file
+            await send({"type": "http.response.body", "body": body, "more_body": False})
@@ -0,0 +1,45 @@
+"""add chat history indexes
+
+Revision ID: 99ba35166371
+Revises: cb7686e059e7
+Create Date: 2026-10-18 21:05:12.381204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '99ba35166371'
+down_revision = 'cb7686e059e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # built concurrently, so that writes to a large chat_history are not blocked;
+    # CREATE INDEX CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        # thread traversal and the self-referencing foreign key
+        op.create_index(
+            'ix_chat_history_parent_id', 'chat_history', ['parent_id'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        # history of a model, and the models foreign key
+        op.create_index(
+            'ix_chat_history_model_id_created_at', 'chat_history', ['model_id', 'created_at'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        # recent history, archived rows are never listed
+        op.create_index(
+            'ix_chat_history_created_at_active', 'chat_history', ['created_at'],
+            postgresql_where=sa.text('archived_at IS NULL'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_chat_history_created_at_active', table_name='chat_history', postgresql_concurrently=True)
+        op.drop_index('ix_chat_history_model_id_created_at', table_name='chat_history', postgresql_concurrently=True)
+        op.drop_index('ix_chat_history_parent_id', table_name='chat_history', postgresql_concurrently=True)
@@ -0,0 +1,121 @@
+"""partition chat history by month
+
+Revision ID: 9cb41ac02923
+Revises: 99ba35166371
+Create Date: 2026-10-18 22:14:37.902113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9cb41ac02923'
+down_revision = '99ba35166371'
+branch_labels = None
+depends_on = None
+
+# monthly partitions created past the current month, the maintenance job
+# (utils.history_partitions) keeps creating them afterwards
+MONTHS_AHEAD = 3
+
+COLUMNS = "id, prompt, params, model_id, parent_id, request_route, answers, created_at, updated_at, archived_at"
+
+
+def create_indexes() -> None:
+    # on the partitioned table, every partition gets its own index
+    op.create_index('ix_chat_history_parent_id', 'chat_history', ['parent_id'])
+    op.create_index('ix_chat_history_model_id_created_at', 'chat_history', ['model_id', 'created_at'])
+    op.create_index(
+        'ix_chat_history_created_at_active', 'chat_history', ['created_at'],
+        postgresql_where=sa.text('archived_at IS NULL'),
+    )
+
+
+def upgrade() -> None:
+    # the rows are copied, writes to chat_history wait for the migration
+    op.execute("LOCK TABLE chat_history IN EXCLUSIVE MODE")
+    op.execute("SET LOCAL statement_timeout = 0")
+
+    # the partition key must be part of the primary key, and a foreign key cannot
+    # reference a partitioned table without it, so parent_id is no longer enforced
+    op.execute(
+        """
+        CREATE TABLE chat_history_partitioned (
+            id uuid NOT NULL DEFAULT gen_random_uuid(),
+            prompt text NOT NULL,
+            params json,
+            model_id uuid NOT NULL,
+            parent_id uuid,
+            request_route varchar NOT NULL,
+            answers json,
+            created_at timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            archived_at timestamp,
+            CONSTRAINT chat_history_partitioned_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+
+    # one partition per month from the oldest exchange, and a default partition
+    # for rows outside of them (the maintenance job moves them out)
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            month date := date_trunc('month', coalesce((SELECT min(created_at) FROM chat_history), now()));
+            last date := date_trunc('month', greatest((SELECT max(created_at) FROM chat_history), now()))
+                + interval '{MONTHS_AHEAD} months';
+        BEGIN
+            WHILE month <= last LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF chat_history_partitioned FOR VALUES FROM (%L) TO (%L)',
+                    'chat_history_y' || to_char(month, 'YYYY') || 'm' || to_char(month, 'MM'),
+                    month, month + interval '1 month'
+                );
+                month := month + interval '1 month';
+            END LOOP;
+        END $$
+        """
+    )
+    op.execute("CREATE TABLE chat_history_default PARTITION OF chat_history_partitioned DEFAULT")
+
+    op.execute(f"INSERT INTO chat_history_partitioned ({COLUMNS}) SELECT {COLUMNS} FROM chat_history")
+    op.drop_table('chat_history')
+    op.rename_table('chat_history_partitioned', 'chat_history')
+    op.execute("ALTER TABLE chat_history RENAME CONSTRAINT chat_history_partitioned_pkey TO chat_history_pkey")
+    op.create_foreign_key('chat_history_model_id_fkey', 'chat_history', 'models', ['model_id'], ['id'])
+    create_indexes()
+    op.execute("ANALYZE chat_history")
+
+
+def downgrade() -> None:
+    op.execute("LOCK TABLE chat_history IN EXCLUSIVE MODE")
+    op.execute("SET LOCAL statement_timeout = 0")
+
+    # partitions detached by the maintenance job are left as they are
+    op.create_table(
+        'chat_history_unpartitioned',
+        sa.Column('id', sa.UUID(), nullable=False, server_default=sa.text('gen_random_uuid()')),
+        sa.Column('prompt', sa.Text(), nullable=False),
+        sa.Column('params', sa.JSON(), nullable=True),
+        sa.Column('model_id', sa.UUID(), nullable=False),
+        sa.Column('parent_id', sa.UUID(), nullable=True),
+        sa.Column('request_route', sa.String(), nullable=False),
+        sa.Column('answers', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+    )
+    op.execute(f"INSERT INTO chat_history_unpartitioned ({COLUMNS}) SELECT {COLUMNS} FROM chat_history")
+    op.drop_table('chat_history')
+    op.rename_table('chat_history_unpartitioned', 'chat_history')
+    op.create_primary_key('chat_history_pkey', 'chat_history', ['id'])
+    op.create_foreign_key('chat_history_model_id_fkey', 'chat_history', 'models', ['model_id'], ['id'])
+    # parents may have been retired with their partition, existing rows are not checked
+    op.execute(
+        "ALTER TABLE chat_history ADD CONSTRAINT chat_history_parent_id_fkey "
+        "FOREIGN KEY (parent_id) REFERENCES chat_history (id) NOT VALID"
+    )
+    create_indexes()
+    op.execute("ANALYZE chat_history")
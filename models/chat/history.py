@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Text, DateTime, UUID, ForeignKey, JSON
-from sqlalchemy.sql import func
+from sqlalchemy import Column, String, Text, DateTime, UUID, ForeignKey, JSON, Index, DDL, event
+from sqlalchemy.sql import func, text
 from config.database import Base
 import uuid
 from typing import Optional, Dict, Any
@@ -12,12 +12,32 @@ class ChatHistory(Base):
     prompt = Column(Text, nullable=False)
     params = Column(JSON, nullable=True)
     model_id = Column(UUID(as_uuid=True), ForeignKey("models.id"), nullable=False)
-    parent_id = Column(UUID(as_uuid=True), ForeignKey("chat_history.id"), nullable=True)
+    # not a foreign key, a partitioned table can only be referenced by its whole primary key
+    parent_id = Column(UUID(as_uuid=True), nullable=True)
     request_route = Column(String, nullable=False)
     answers = Column(JSON, nullable=True)
-    created_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+    # partition key, part of the primary key of a partitioned table
+    created_at = Column(DateTime, primary_key=True, nullable=False, server_default=func.current_timestamp())
     updated_at = Column(DateTime, nullable=False, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
     archived_at = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        Index("ix_chat_history_parent_id", "parent_id"),
+        Index("ix_chat_history_model_id_created_at", "model_id", "created_at"),
+        Index("ix_chat_history_created_at_active", "created_at", postgresql_where=text("archived_at IS NULL")),
+        # monthly partitions, managed by utils.history_partitions
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
     def __repr__(self):
-        return f"<ChatHistory(id='{self.id}', prompt='{self.prompt[:50]}...')>"
\ No newline at end of file
+        return f"<ChatHistory(id='{self.id}', prompt='{self.prompt[:50]}...')>"
+
+
+# a partitioned table accepts no rows without partitions, metadata.create_all (init_db.py)
+# creates the default one like the migration does, the monthly ones are created by
+# utils.history_partitions
+event.listen(
+    ChatHistory.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS chat_history_default PARTITION OF chat_history DEFAULT").execute_if(dialect="postgresql"),
+)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Recall / latency benchmark of the IVF index of a collection against exact search on
+a synthetic corpus of clustered, normalized 384 dimensional vectors (the size of
+all-MiniLM-L6-v2 embeddings), on CPU.
+
+For every nprobe it reports recall@k (share of the exact top-k found) and QPS.
+
+Usage:
+    python scripts/bench_ann.py --documents 1000000 --nprobe 1 4 8 16 32 64
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+
+from utils.vector_index import VectorIndexStore
+
+
+def clustered(rows: int, dimensions: int, centers: np.ndarray, rng: np.random.Generator, spread: float = 0.35) -> np.ndarray:
+    vectors = centers[rng.integers(0, centers.shape[0], size=rows)]
+    vectors = vectors + spread * rng.standard_normal((rows, dimensions), dtype=np.float32) / np.sqrt(dimensions)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def timed_search(collection, queries: np.ndarray, k: int, **kwargs):
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append([doc_id for doc_id, _, _ in collection.search(query, k, **kwargs)])
+    return results, len(queries) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000, help="topics of the synthetic corpus")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None, help="defaults to about 4 * sqrt(documents)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((args.clusters, args.dimensions), dtype=np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    queries = clustered(args.queries, args.dimensions, centers, rng)
+
+    with tempfile.TemporaryDirectory() as directory:
+        collection = VectorIndexStore(directory).get_or_create("bench", args.dimensions)
+        start = time.perf_counter()
+        chunk = 100_000
+        for offset in range(0, args.documents, chunk):
+            rows = min(chunk, args.documents - offset)
+            collection.add([""] * rows, clustered(rows, args.dimensions, centers, rng), [str(offset + i) for i in range(rows)])
+        print(f"ingested {len(collection)} vectors in {time.perf_counter() - start:.1f} s")
+
+        exact, exact_qps = timed_search(collection, queries, args.k, exact=True)
+
+        start = time.perf_counter()
+        index = collection.build_index(nlist=args.nlist)
+        print(f"trained and filled IVF index {index} in {time.perf_counter() - start:.1f} s\n")
+
+        print(f"{'search':<14}{'recall@' + str(args.k):>12}{'qps':>10}")
+        print(f"{'exact':<14}{1.0:>12.4f}{exact_qps:>10.1f}")
+        for nprobe in args.nprobe:
+            approximate, qps = timed_search(collection, queries, args.k, nprobe=nprobe)
+            recall = np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approximate, exact)])
+            print(f"{'ivf nprobe=' + str(nprobe):<14}{recall:>12.4f}{qps:>10.1f}")
+
+        # incremental inserts land in the trained cells
+        start = time.perf_counter()
+        rows = min(10_000, args.documents)
+        collection.add([""] * rows, clustered(rows, args.dimensions, centers, rng))
+        print(f"\nincremental insert of {rows} vectors: {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Load test for the /video-1 and /video-3 routes against the local stub OpenAI server.
+
+Every request is sent through the ASGI app, once with the awaited ainvoke path the
+routes use and once with the previous blocking invoke path, to show that throughput
+now scales with concurrency instead of flat-lining at 1 / latency.
+
+Usage:
+    python scripts/bench_async_chat.py --latency 0.2 --requests 64
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+STUB_PORT = 8711
+os.environ.setdefault("KEY", "stub-key")
+os.environ["HOST"] = f"http://127.0.0.1:{STUB_PORT}/v1"
+os.environ.setdefault("MODEL_QUEN", "stub-model")
+
+import httpx
+from fastapi import FastAPI
+
+from scripts.stub_openai_server import StubServer, create_app
+from controller.v1_models import router as v1_models
+from controller.v3_prompts import router as v3_prompts, prompt_service
+from service.demo_1_models import DemoModel
+from service.demo_3_prompt import ResponseLengthOptions, ResponseFormatOptions
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(v1_models)
+    app.include_router(v3_prompts)
+
+    # the pre-async behaviour, kept here only as the baseline of the benchmark
+    @app.get("/blocking/video-1/")
+    async def blocking_chat(question: str):
+        return {"message": DemoModel.chat(question)}
+
+    @app.post("/blocking/video-3/summarize")
+    async def blocking_summarize(payload: dict):
+        return {
+            "summary": prompt_service.getSummarizePrompt(
+                max_length=ResponseLengthOptions.SHORT,
+                response_format=ResponseFormatOptions.PLAIN_TEXT,
+                content=payload["content"],
+                use_cache=False,
+            )
+        }
+
+    return app
+
+
+async def run_load(client: httpx.AsyncClient, method: str, url: str, total: int, concurrency: int, **kwargs) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            response = await client.request(method, url, **kwargs)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(total: int, concurrency_levels) -> None:
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        cases = [
+            ("GET /video-1/", "GET", "/video-1/", {"params": {"question": "why do parrots talk?"}}),
+            ("GET /video-1/ (blocking)", "GET", "/blocking/video-1/", {"params": {"question": "why do parrots talk?"}}),
+            # the same content every time, both summarize cases bypass the response cache
+            (
+                "POST /video-3/summarize",
+                "POST",
+                "/video-3/summarize",
+                {"json": {"content": "parrots talk to bond."}, "headers": {"Cache-Control": "no-store"}},
+            ),
+            ("POST /video-3/summarize (blocking)", "POST", "/blocking/video-3/summarize", {"json": {"content": "parrots talk to bond."}}),
+        ]
+        header = f"{'case':<38}" + "".join(f"{'c=' + str(c):>10}" for c in concurrency_levels)
+        print(header)
+        print("-" * len(header))
+        for name, method, url, kwargs in cases:
+            row = f"{name:<38}"
+            for concurrency in concurrency_levels:
+                rps = await run_load(client, method, url, total, concurrency, **kwargs)
+                row += f"{rps:>10.1f}"
+            print(row, flush=True)
+        print("\nvalues are requests/second")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub completion latency in seconds")
+    parser.add_argument("--requests", type=int, default=64, help="requests per case and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    with StubServer(create_app(args.latency), port=STUB_PORT):
+        asyncio.run(main(args.requests, args.concurrency))
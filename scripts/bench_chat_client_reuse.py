@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the per-request overhead of DemoModel.chat against the local stub
+OpenAI server (zero latency by default, so only client overhead is measured).
+
+    before: a new ChatOpenAI (and HTTP client) is built per request with the seed
+    after:  the pooled singleton is bound to the seed with bind_openAIChat
+
+The stub server counts distinct client ports, i.e. TCP connections opened.
+
+Usage:
+    python scripts/bench_chat_client_reuse.py --requests 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+STUB_PORT = 8712
+os.environ.setdefault("KEY", "stub-key")
+os.environ["HOST"] = f"http://127.0.0.1:{STUB_PORT}/v1"
+os.environ.setdefault("MODEL_QUEN", "stub-model")
+
+import httpx
+from langchain_openai import ChatOpenAI
+from pydantic import SecretStr
+
+from config.enums import ModelName
+from config.models import MODELS_CONFIG
+from scripts.stub_openai_server import StubServer, create_app
+from utils.model_service import bind_openAIChat
+
+
+def build_per_request(seed: int) -> ChatOpenAI:
+    # the previous behaviour of init_openAIChat(seed=seed)
+    config = MODELS_CONFIG[ModelName.OPENAI_CHAT]["config"].copy()
+    config["api_key"] = SecretStr(config["api_key"])
+    config["model_kwargs"] = {"seed": seed}
+    return ChatOpenAI(**config)
+
+
+def run(name: str, factory, total: int, stats_url: str) -> None:
+    before = httpx.get(stats_url).json()["connections"]
+    build_times, call_times = [], []
+    for _ in range(total):
+        seed = random.randint(0, 999999)
+        start = time.perf_counter()
+        model = factory(seed)
+        built = time.perf_counter()
+        model.invoke("ping")
+        done = time.perf_counter()
+        build_times.append((built - start) * 1000)
+        call_times.append((done - start) * 1000)
+    connections = httpx.get(stats_url).json()["connections"] - before
+    print(
+        f"{name:<8} build p50 {statistics.median(build_times):7.3f} ms"
+        f" | request p50 {statistics.median(call_times):7.3f} ms"
+        f" p99 {sorted(call_times)[int(len(call_times) * 0.99) - 1]:7.3f} ms"
+        f" | connections opened {connections}/{total}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub completion latency in seconds")
+    args = parser.parse_args()
+
+    with StubServer(create_app(args.latency), port=STUB_PORT) as server:
+        stats_url = f"http://127.0.0.1:{STUB_PORT}/stats"
+        run("before", build_per_request, args.requests, stats_url)
+        run("after", lambda seed: bind_openAIChat(seed=seed), args.requests, stats_url)
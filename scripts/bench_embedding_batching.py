@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Latency / throughput of single-text embedding requests, unbatched (one embed call
+per request in a worker thread) versus coalesced by utils.batching.EmbeddingBatcher.
+
+By default a simulated model is used whose call costs a fixed overhead plus a per
+text cost (like a forward pass or an HTTP round trip to ollama); pass
+--model huggingface to run the real all-MiniLM-L6-v2 model on CPU.
+
+Usage:
+    python scripts/bench_embedding_batching.py --concurrency 1 8 32 128
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from utils.batching import EmbeddingBatcher
+
+
+class SimulatedModel:
+    def __init__(self, call_overhead_ms: float, per_text_ms: float):
+        self.call_overhead = call_overhead_ms / 1000
+        self.per_text = per_text_ms / 1000
+
+    def embed_documents(self, texts):
+        time.sleep(self.call_overhead + self.per_text * len(texts))
+        return [[float(len(text))] * 8 for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+async def run(embed, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await embed(f"text number {i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return statistics.median(latencies), latencies[max(0, int(len(latencies) * 0.99) - 1)], total / elapsed
+
+
+async def main(model, args) -> None:
+    batcher = EmbeddingBatcher(model.embed_documents, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+
+    async def unbatched(text):
+        return await asyncio.to_thread(model.embed_query, text)
+
+    print(f"{'mode':<10}{'concurrency':>12}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for concurrency in args.concurrency:
+        for name, embed in (("unbatched", unbatched), ("batched", batcher.embed)):
+            p50, p99, rps = await run(embed, args.requests, concurrency)
+            print(f"{name:<10}{concurrency:>12}{p50:>10.2f}{p99:>10.2f}{rps:>10.1f}", flush=True)
+    print(f"\nbatcher: {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=["simulated", "huggingface"], default="simulated")
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--call-overhead-ms", type=float, default=8.0, help="simulated model only")
+    parser.add_argument("--per-text-ms", type=float, default=0.5, help="simulated model only")
+    args = parser.parse_args()
+
+    if args.model == "huggingface":
+        from config.enums import ModelName
+        from utils.model_service import model_registry
+
+        model = model_registry.get(ModelName.HUGGINGFACE_EMBEDDINGS, show_progress=False).model
+    else:
+        model = SimulatedModel(args.call_overhead_ms, args.per_text_ms)
+
+    asyncio.run(main(model, args))
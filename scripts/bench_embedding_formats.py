@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Payload size, encode time and accuracy of the embedding output formats
+(`?format=` of /video-2/convert-to-embeddings and /video-2/from-documents) for
+1024 dimensional vectors, like mxbai-embed-large.
+
+    json:    float32 as arrays of numbers (default)
+    base64:  float32, Accept: application/vnd.embeddings+json
+    binary:  float32 raw bytes (format=binary)
+    float16 / int8: packed JSON, and raw bytes with Accept: application/octet-stream
+
+The cosine error is 1 - cos(original, decoded), which is also the error of the
+embedding cache with the same EMBEDDING_CACHE_DTYPE. recall@10 compares the top 10
+of a query against the quantized vectors with the float32 top 10.
+
+Usage:
+    python scripts/bench_embedding_formats.py --vectors 1 100 1000
+"""
+import argparse
+import base64
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+import orjson
+from starlette.requests import Request
+
+from config.enums import EmbeddingFormat
+from middleware.timing_middleware import splice_meta
+from utils.quantization import QuantizedVectors
+from utils.responses import BASE64_MEDIA_TYPE, BINARY_MEDIA_TYPE, embeddings_response
+from utils.vector_index import top_k
+
+META = {"model": "mxbai-embed-large"}
+TIMING = {"requestTime": "2025-01-01T00:00:00+00:00", "responseTime": "2025-01-01T00:00:00+00:00", "processTime": 0.1}
+
+CASES = [
+    ("json", EmbeddingFormat.FLOAT32, "application/json"),
+    ("base64", EmbeddingFormat.FLOAT32, BASE64_MEDIA_TYPE),
+    ("binary", EmbeddingFormat.BINARY, "*/*"),
+    ("float16", EmbeddingFormat.FLOAT16, "application/json"),
+    ("float16 bin", EmbeddingFormat.FLOAT16, BINARY_MEDIA_TYPE),
+    ("int8", EmbeddingFormat.INT8, "application/json"),
+    ("int8 bin", EmbeddingFormat.INT8, BINARY_MEDIA_TYPE),
+]
+
+
+def request_accepting(media_type: str) -> Request:
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": [(b"accept", media_type.encode())]})
+
+
+def encode(vectors: np.ndarray, format: EmbeddingFormat, media_type: str) -> bytes:
+    response = embeddings_response(request_accepting(media_type), "document_embeddings", vectors, META, format=format)
+    body = bytes(response.body)
+    return body if response.media_type == BINARY_MEDIA_TYPE else splice_meta(body, TIMING)
+
+
+def decode(body: bytes, format: EmbeddingFormat, media_type: str, shape: tuple) -> np.ndarray:
+    rows, dimensions = shape
+    if format == EmbeddingFormat.BINARY or media_type == BINARY_MEDIA_TYPE:
+        dtype = np.dtype("<f4") if format == EmbeddingFormat.BINARY else np.dtype(format.value).newbyteorder("<")
+        data = np.frombuffer(body, dtype=dtype, count=rows * dimensions).reshape(shape)
+        scale = None
+        if format == EmbeddingFormat.INT8:
+            scale = np.frombuffer(body, dtype="<f4", offset=data.nbytes)
+        return QuantizedVectors(data, scale).dequantize()
+
+    field = orjson.loads(body)["document_embeddings"]
+    if isinstance(field, list):
+        return np.asarray(field, dtype=np.float32)
+    data = np.frombuffer(base64.b64decode(field["data"]), dtype=np.dtype(field["dtype"]).newbyteorder("<"))
+    scale = np.asarray(field["scale"], dtype=np.float32) if "scale" in field else None
+    return QuantizedVectors(data.reshape(field["shape"]), scale).dequantize()
+
+
+def measure(vectors: np.ndarray, format: EmbeddingFormat, media_type: str, min_seconds: float = 0.3):
+    runs, start = 0, time.perf_counter()
+    while True:
+        body = encode(vectors, format, media_type)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds and runs >= 3:
+            return elapsed / runs * 1000, body
+
+
+def cosine_error(original: np.ndarray, decoded: np.ndarray) -> np.ndarray:
+    # float64, the error of float16 is below the float32 rounding of the dot product
+    original, decoded = original.astype(np.float64), decoded.astype(np.float64)
+    norms = np.linalg.norm(original, axis=1) * np.linalg.norm(decoded, axis=1)
+    return 1.0 - np.sum(original * decoded, axis=1) / norms
+
+
+def recall_at_10(original: np.ndarray, decoded: np.ndarray, queries: np.ndarray) -> float:
+    k = min(10, len(original))
+    hits = 0
+    for query in queries:
+        expected = set(top_k(original @ query, k).tolist())
+        hits += len(expected & set(top_k(decoded @ query, k).tolist()))
+    return hits / (k * len(queries))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--dimensions", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(
+        f"{'vectors':>8}  {'format':<12}{'bytes':>12}{'vs json':>9}{'encode ms':>11}"
+        f"{'mean cos err':>14}{'max cos err':>13}{'recall@10':>11}"
+    )
+    for rows in args.vectors:
+        # normalized like the embeddings of the models in MODELS_CONFIG
+        vectors = rng.normal(size=(rows, args.dimensions)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        queries = vectors[rng.integers(0, rows, size=args.queries)] + rng.normal(scale=0.05, size=(args.queries, args.dimensions))
+        queries = queries.astype(np.float32)
+
+        json_size = None
+        for name, format, media_type in CASES:
+            ms, body = measure(vectors, format, media_type)
+            json_size = json_size or len(body)
+            decoded = decode(body, format, media_type, vectors.shape)
+            errors = cosine_error(vectors, decoded)
+            print(
+                f"{rows:>8}  {name:<12}{len(body):>12}{json_size / len(body):>8.1f}x{ms:>11.3f}"
+                f"{errors.mean():>14.2e}{errors.max():>13.2e}{recall_at_10(vectors, decoded, queries):>11.3f}",
+                flush=True,
+            )
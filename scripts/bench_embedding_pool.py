@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Throughput and memory of the huggingface embeddings backends:
+
+    inprocess:  SentenceTransformer.encode in the API process (the "huggingface"
+                provider), batches of --batch texts
+    pool N:     utils.embedding_pool.EmbeddingProcessPool with N workers (the
+                "huggingface_pool" provider), the same texts in one call, split in
+                sub-batches of --batch dispatched to the workers concurrently
+
+Each configuration runs in a fresh interpreter. Memory is summed over the process
+and its descendants (forkserver and workers): RSS counts the shared weights once
+per process, PSS splits them between the processes mapping them. "N copies" is
+the RSS of N in-process loads, what N uvicorn workers each with its own model
+take. The pool vectors are checked against the in-process ones.
+
+Without access to the Hugging Face hub, --synthetic builds a randomly initialized
+model of the all-MiniLM-L6-v2 shape (6 layers, 384 dimensions, 30522 tokens), the
+throughput is the same, the vectors are meaningless.
+
+Usage:
+    python scripts/bench_embedding_pool.py --workers 1 2 4 8 --texts 1024
+    python scripts/bench_embedding_pool.py --synthetic --workers 1 2 4 8
+"""
+import argparse
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SYNTHETIC_DIR = os.path.join(tempfile.gettempdir(), "synthetic-all-MiniLM-L6-v2")
+
+
+def build_synthetic(path: str) -> str:
+    if os.path.exists(os.path.join(path, "modules.json")):
+        return path
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    rng = random.Random(0)
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + list(string.ascii_lowercase)
+    vocab += ["##" + c for c in string.ascii_lowercase]
+    seen = set(vocab)
+    while len(vocab) < 30522:
+        word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 8)))
+        if word not in seen:
+            seen.add(word)
+            vocab.append(word)
+
+    bert_dir = path + "-bert"
+    os.makedirs(bert_dir, exist_ok=True)
+    with open(os.path.join(bert_dir, "vocab.txt"), "w") as f:
+        f.write("\n".join(vocab))
+    BertTokenizerFast(os.path.join(bert_dir, "vocab.txt")).save_pretrained(bert_dir)
+    config = BertConfig(
+        vocab_size=30522, hidden_size=384, num_hidden_layers=6, num_attention_heads=12, intermediate_size=1536
+    )
+    BertModel(config).save_pretrained(bert_dir)
+    model = SentenceTransformer(modules=[
+        models.Transformer(bert_dir, max_seq_length=256),
+        models.Pooling(384, "mean"),
+        models.Normalize(),
+    ])
+    model.save(path)
+    return path
+
+
+def make_texts(count: int) -> list:
+    rng = random.Random(1)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9))) for _ in range(5000)]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(10, 60))) for _ in range(count)]
+
+
+def memory(pid: int) -> tuple:
+    # (rss, pss) in bytes of a process and its descendants
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    rss = pss = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1]) * 1024
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return rss, pss
+
+
+def run(args) -> dict:
+    # one configuration, in a fresh interpreter
+    import numpy as np
+    import torch
+
+    texts = make_texts(args.texts)
+    model_kwargs = {"device": "cpu"}
+    if args.run == "inprocess":
+        from sentence_transformers import SentenceTransformer
+
+        torch.set_num_threads(args.threads)
+        model = SentenceTransformer(args.model, **model_kwargs)
+        model.encode(texts[:args.batch], batch_size=args.batch, normalize_embeddings=True, show_progress_bar=False)
+        start = time.perf_counter()
+        vectors = model.encode(texts, batch_size=args.batch, normalize_embeddings=True, show_progress_bar=False)
+        elapsed = time.perf_counter() - start
+    else:
+        from utils.embedding_pool import EmbeddingProcessPool
+
+        pool = EmbeddingProcessPool(
+            args.model,
+            model_kwargs=model_kwargs,
+            workers=int(args.run),
+            threads_per_worker=args.threads,
+            max_batch_size=args.batch,
+        )
+        encode_kwargs = {"batch_size": args.batch, "normalize_embeddings": True}
+        # every worker runs one batch before the clock starts
+        pool.embed(texts[:args.batch * pool.workers], encode_kwargs)
+        start = time.perf_counter()
+        vectors = pool.embed(texts, encode_kwargs)
+        elapsed = time.perf_counter() - start
+    rss, pss = memory(os.getpid())
+    np.save(args.vectors, vectors)
+    return {"seconds": elapsed, "rss": rss, "pss": pss}
+
+
+def measure(args, mode: str, vectors_path: str) -> dict:
+    command = [
+        sys.executable, os.path.abspath(__file__), "--run", mode, "--model", args.model, "--texts", str(args.texts),
+        "--batch", str(args.batch), "--threads", str(args.threads), "--vectors", vectors_path,
+    ]
+    result = subprocess.run(command, cwd=ROOT_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stderr[-2000:], file=sys.stderr)
+        raise SystemExit(f"{mode} failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(args) -> None:
+    import numpy as np
+
+    mib = 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = measure(args, "inprocess", os.path.join(tmp, "inprocess.npy"))
+        expected = np.load(os.path.join(tmp, "inprocess.npy"))
+        print(f"{args.texts} texts, batches of {args.batch}, {args.threads} torch thread(s) per process, {os.cpu_count()} cpu(s)")
+        print(f"{'backend':<12}{'texts/s':>10}{'rss MiB':>10}{'pss MiB':>10}{'N copies MiB':>14}{'max |diff|':>12}")
+        print(f"{'inprocess':<12}{args.texts / baseline['seconds']:>10.1f}{baseline['rss'] / mib:>10.0f}"
+              f"{baseline['pss'] / mib:>10.0f}{baseline['rss'] / mib:>14.0f}{0.0:>12.1e}")
+        for workers in args.workers:
+            path = os.path.join(tmp, f"pool-{workers}.npy")
+            result = measure(args, str(workers), path)
+            diff = float(np.abs(np.load(path) - expected).max())
+            print(f"{f'pool {workers}':<12}{args.texts / result['seconds']:>10.1f}{result['rss'] / mib:>10.0f}"
+                  f"{result['pss'] / mib:>10.0f}{workers * baseline['rss'] / mib:>14.0f}{diff:>12.1e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="model name or path")
+    parser.add_argument("--synthetic", action="store_true", help=f"build and use a random model in {SYNTHETIC_DIR}")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--texts", type=int, default=1024)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=1, help="torch threads per process")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    parser.add_argument("--vectors", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args)))
+    else:
+        if args.synthetic:
+            args.model = build_synthetic(SYNTHETIC_DIR)
+        main(args)
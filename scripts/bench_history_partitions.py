@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Recent-data query latency and retention cost of chat_history before and after
+monthly partitioning, against a local Postgres. Two copies of the table are
+seeded with --rows exchanges spread over the last --months months, in the
+bench_partitions schema:
+
+    plain:        the unpartitioned table with its former indexes
+    partitioned:  the same rows in monthly range partitions on created_at, as
+                  the 9cb41ac02923 migration creates them
+
+and timed on:
+
+    latest:       last 50 exchanges of a model over the last day
+    week:         count of active exchanges over the last 7 days
+    month:        exchanges per model since the start of the month
+    by_id:        one exchange by id (every partition is probed)
+    retention:    removing the oldest month, DELETE on plain, DETACH + DROP of
+                  the partition on partitioned (rolled back)
+
+The tables are kept between runs, pass --cleanup to drop the schema. Start
+Postgres first:
+    docker compose -f docker-compose.dev.yml up -d postgres
+
+Usage:
+    python scripts/bench_history_partitions.py --rows 50000000 --months 24
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from sqlalchemy import text
+
+from config.database import async_engine
+from utils.history_partitions import add_months, month_start, partition_name
+
+SCHEMA = "bench_partitions"
+SEED_BATCH = 2_000_000
+MODELS = 8
+ARCHIVE_AFTER_DAYS = 90
+
+COLUMNS = """
+    id uuid NOT NULL DEFAULT gen_random_uuid(),
+    prompt text NOT NULL,
+    params json,
+    model_id uuid NOT NULL,
+    parent_id uuid,
+    request_route varchar NOT NULL,
+    answers json,
+    created_at timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    archived_at timestamp
+"""
+
+# n-th exchange, evenly spread from :first to :last, archived after ARCHIVE_AFTER_DAYS
+SEED_SQL = f"""
+INSERT INTO {SCHEMA}.plain
+SELECT
+    md5('partition-bench-' || n)::uuid,
+    'Bench prompt ' || n,
+    '{{"responseLength": "short"}}'::json,
+    md5('partition-bench-model-' || (n % {MODELS}))::uuid,
+    CASE WHEN n % 4 = 0 THEN NULL ELSE md5('partition-bench-' || (n - 1))::uuid END,
+    '/video-3/summarize',
+    '["Bench answer"]'::json,
+    created,
+    created,
+    CASE WHEN created < CAST(:last AS timestamp) - interval '{ARCHIVE_AFTER_DAYS} days'
+        THEN created + interval '{ARCHIVE_AFTER_DAYS} days' END
+FROM generate_series(CAST(:start AS bigint), CAST(:stop AS bigint)) AS n,
+    LATERAL (SELECT CAST(:first AS timestamp) + (CAST(:last AS timestamp) - CAST(:first AS timestamp)) * (n / CAST(:rows AS float8)) AS created) AS t
+"""
+
+# built after the load, like the primary keys
+PRIMARY_KEYS = {"plain": "id", "partitioned": "id, created_at"}
+INDEXES = [
+    "CREATE INDEX ON {table} (parent_id)",
+    "CREATE INDEX ON {table} (model_id, created_at)",
+    "CREATE INDEX ON {table} (created_at) WHERE archived_at IS NULL",
+]
+
+QUERIES = {
+    "latest": (
+        "SELECT id, created_at FROM {table} WHERE model_id = :model_id AND created_at >= CAST(:now AS timestamp) - interval '1 day' "
+        "ORDER BY created_at DESC LIMIT 50"
+    ),
+    "week": "SELECT count(*) FROM {table} WHERE created_at >= CAST(:now AS timestamp) - interval '7 days' AND archived_at IS NULL",
+    "month": (
+        "SELECT model_id, count(*) FROM {table} WHERE created_at >= date_trunc('month', CAST(:now AS timestamp)) "
+        "GROUP BY model_id"
+    ),
+    "by_id": "SELECT * FROM {table} WHERE id = :id",
+}
+
+
+def seeded_id(n: int) -> uuid.UUID:
+    return uuid.UUID(hashlib.md5(f"partition-bench-{n}".encode()).hexdigest())
+
+
+def model_id(i: int) -> uuid.UUID:
+    return uuid.UUID(hashlib.md5(f"partition-bench-model-{i}".encode()).hexdigest())
+
+
+async def execute(sql: str, params: dict = None) -> None:
+    async with async_engine.begin() as connection:
+        await connection.execute(text("SET LOCAL statement_timeout = 0"))
+        await connection.execute(text(sql), params or {})
+
+
+async def seeded_rows() -> int:
+    async with async_engine.connect() as connection:
+        exists = await connection.scalar(text(f"SELECT to_regclass('{SCHEMA}.partitioned') IS NOT NULL"))
+        if not exists:
+            return 0
+        return await connection.scalar(text(f"SELECT count(*) FROM {SCHEMA}.partitioned"))
+
+
+async def seed(rows: int, months: int, last: datetime) -> None:
+    first_month = add_months(month_start(last.date()), -(months - 1))
+    first = datetime.combine(first_month, datetime.min.time())
+
+    await execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await execute(f"CREATE SCHEMA {SCHEMA}")
+    await execute(f"CREATE TABLE {SCHEMA}.plain ({COLUMNS})")
+    await execute(f"CREATE TABLE {SCHEMA}.partitioned ({COLUMNS}) PARTITION BY RANGE (created_at)")
+    month = first_month
+    while month <= month_start(last.date()):
+        await execute(
+            f"CREATE TABLE {SCHEMA}.{partition_name(month)} PARTITION OF {SCHEMA}.partitioned "
+            f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+        )
+        month = add_months(month, 1)
+
+    for start in range(0, rows, SEED_BATCH):
+        stop = min(start + SEED_BATCH, rows) - 1
+        began = time.perf_counter()
+        await execute(SEED_SQL, {"start": start, "stop": stop, "rows": rows, "first": first, "last": last})
+        print(f"Seeded rows {start}..{stop} in {time.perf_counter() - began:.1f}s", flush=True)
+
+    began = time.perf_counter()
+    await execute(f"INSERT INTO {SCHEMA}.partitioned SELECT * FROM {SCHEMA}.plain")
+    print(f"Copied into partitions in {time.perf_counter() - began:.1f}s", flush=True)
+
+
+async def index(table: str) -> None:
+    async with async_engine.connect() as connection:
+        indexed = await connection.scalar(
+            text("SELECT count(*) > 0 FROM pg_indexes WHERE schemaname = :schema AND tablename = :table"),
+            {"schema": SCHEMA, "table": table},
+        )
+    if indexed:
+        return
+
+    began = time.perf_counter()
+    await execute(f"ALTER TABLE {SCHEMA}.{table} ADD PRIMARY KEY ({PRIMARY_KEYS[table]})")
+    for sql in INDEXES:
+        await execute(sql.format(table=f"{SCHEMA}.{table}"))
+    # VACUUM cannot run in a transaction, it sets the visibility map for index-only scans
+    async with async_engine.connect() as connection:
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        await connection.execute(text(f"VACUUM ANALYZE {SCHEMA}.{table}"))
+    print(f"Indexed {table} in {time.perf_counter() - began:.1f}s", flush=True)
+
+
+async def sizes() -> dict:
+    async with async_engine.connect() as connection:
+        return {
+            # pg_partition_tree lists nothing for a plain table
+            table: await connection.scalar(text(
+                f"SELECT pg_size_pretty(coalesce(sum(pg_total_relation_size(relid)), pg_total_relation_size('{SCHEMA}.{table}'))) "
+                f"FROM pg_partition_tree('{SCHEMA}.{table}')"
+            ))
+            for table in ("plain", "partitioned")
+        }
+
+
+async def timed(table: str, sql: str, params: list) -> tuple:
+    timings = []
+    async with async_engine.connect() as connection:
+        for values in params:
+            start = time.perf_counter()
+            await connection.execute(text(sql.format(table=f"{SCHEMA}.{table}")), values)
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+async def retention(table: str, oldest: str) -> float:
+    async with async_engine.connect() as connection:
+        transaction = await connection.begin()
+        await connection.execute(text("SET LOCAL statement_timeout = 0"))
+        start = time.perf_counter()
+        if table == "plain":
+            month = datetime.strptime(oldest.rsplit("_", 1)[1], "y%Ym%m")
+            await connection.execute(
+                text(f"DELETE FROM {SCHEMA}.plain WHERE created_at < :end"),
+                {"end": datetime.combine(add_months(month.date(), 1), datetime.min.time())},
+            )
+        else:
+            await connection.execute(text(f"ALTER TABLE {SCHEMA}.partitioned DETACH PARTITION {SCHEMA}.{oldest}"))
+            await connection.execute(text(f"DROP TABLE {SCHEMA}.{oldest}"))
+        elapsed = time.perf_counter() - start
+        await transaction.rollback()
+    return elapsed * 1000
+
+
+async def main(args) -> None:
+    if args.cleanup:
+        await execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        return
+
+    last = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    if await seeded_rows() != args.rows:
+        await seed(args.rows, args.months, last)
+    for table in ("plain", "partitioned"):
+        await index(table)
+
+    async with async_engine.connect() as connection:
+        now = await connection.scalar(text(f"SELECT max(created_at) FROM {SCHEMA}.partitioned"))
+        oldest = await connection.scalar(text(
+            f"SELECT min(relname::text) FROM pg_partition_tree('{SCHEMA}.partitioned') t "
+            f"JOIN pg_class ON pg_class.oid = t.relid WHERE t.isleaf"
+        ))
+    print(f"{args.rows} rows, size {await sizes()}, latest exchange {now}")
+
+    rng = random.Random(0)
+    models = [model_id(i) for i in range(MODELS)]
+    params = {
+        "latest": [{"now": now, "model_id": rng.choice(models)} for _ in range(args.repeat)],
+        "week": [{"now": now} for _ in range(args.repeat)],
+        "month": [{"now": now} for _ in range(args.repeat)],
+        "by_id": [{"id": seeded_id(rng.randrange(args.rows))} for _ in range(args.repeat)],
+    }
+
+    print(f"{'query':<10}{'plain ms':>12}{'max':>10}{'partitioned ms':>18}{'max':>10}")
+    for name, sql in QUERIES.items():
+        plain = await timed("plain", sql, params[name])
+        partitioned = await timed("partitioned", sql, params[name])
+        print(f"{name:<10}{plain[0]:>12.2f}{plain[1]:>10.2f}{partitioned[0]:>18.2f}{partitioned[1]:>10.2f}", flush=True)
+
+    plain = await retention("plain", oldest)
+    partitioned = await retention("partitioned", oldest)
+    print(f"{'retention':<10}{plain:>12.1f}{'':>10}{partitioned:>18.1f}   (oldest month, {oldest})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--cleanup", action="store_true", help="drop the bench schema and exit")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Per-request overhead and sustained throughput of the chat history write-behind
+recorder (utils.history_recorder) against a local Postgres, compared with an
+inline INSERT + COMMIT per request.
+
+    inline:   await one INSERT + COMMIT in the request
+    enqueue:  await history_recorder.record(...) in the request
+    sustained: --producers concurrent requests recording --records rows, until
+              the last one is written
+
+Rows are written with request_route /bench/history and deleted at the end.
+Start Postgres and create the tables first:
+    docker compose -f docker-compose.dev.yml up -d postgres
+    python -m alembic upgrade head
+
+Usage:
+    python scripts/bench_history_recorder.py --records 100000 --producers 64
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from sqlalchemy import delete, insert, select, text
+
+from config.database import AsyncSessionLocal
+from models.chat.history import ChatHistory
+from models.model import Model
+from utils.history_recorder import HistoryRecorder
+
+ROUTE = "/bench/history"
+MODEL_NAME = "bench-history-model"
+PROMPT = "Summarize the following text about the history of the calendar. " * 4
+ANSWER = "The Roman calendar had ten months before January and February were added. " * 3
+
+
+def record_kwargs(i: int) -> dict:
+    return {
+        "prompt": PROMPT,
+        "model_name": MODEL_NAME,
+        "request_route": ROUTE,
+        "answers": [ANSWER],
+        "params": {"responseLength": "short", "responseFormat": "plain_text", "i": i},
+    }
+
+
+def summary(timings: list) -> str:
+    timings = sorted(timings)
+    p99 = timings[max(0, int(len(timings) * 0.99) - 1)]
+    return f"mean {statistics.mean(timings) * 1e6:>9.1f} us   p99 {p99 * 1e6:>9.1f} us"
+
+
+async def inline(requests: int) -> list:
+    async with AsyncSessionLocal() as db:
+        model_id = await db.scalar(select(Model.id).where(Model.model_name == MODEL_NAME))
+    timings = []
+    for i in range(requests):
+        kwargs = record_kwargs(i)
+        start = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(ChatHistory).values(
+                id=uuid.uuid4(), prompt=kwargs["prompt"], params=kwargs["params"], model_id=model_id,
+                request_route=ROUTE, answers=kwargs["answers"],
+            ))
+            await db.commit()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def enqueue(recorder: HistoryRecorder, requests: int) -> list:
+    timings = []
+    for i in range(requests):
+        start = time.perf_counter()
+        await recorder.record(**record_kwargs(i))
+        timings.append(time.perf_counter() - start)
+        if i % 100 == 0:
+            # like the rest of a request, gives the worker a chance to run
+            await asyncio.sleep(0)
+    return timings
+
+
+async def sustained(recorder: HistoryRecorder, records: int, producers: int) -> float:
+    counter = iter(range(records))
+
+    async def producer():
+        for i in counter:
+            await recorder.record(**record_kwargs(i))
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(producer() for _ in range(producers)))
+    await recorder.stop(timeout=300)
+    return time.perf_counter() - start
+
+
+async def cleanup() -> None:
+    async with AsyncSessionLocal() as db:
+        # the self-referencing parent_id foreign key is checked for every deleted row,
+        # an index dropped again with the transaction keeps that from scanning the table
+        await db.execute(text("SET LOCAL statement_timeout = 0"))
+        await db.execute(text("CREATE INDEX bench_history_parent_id ON chat_history (parent_id)"))
+        await db.execute(delete(ChatHistory).where(ChatHistory.request_route == ROUTE))
+        await db.execute(text("DROP INDEX bench_history_parent_id"))
+        await db.execute(delete(Model).where(Model.model_name == MODEL_NAME))
+        await db.commit()
+
+
+def new_recorder(args) -> HistoryRecorder:
+    return HistoryRecorder(
+        max_queue_size=args.queue_size,
+        batch_size=args.batch_size,
+        flush_interval_ms=args.flush_interval_ms,
+        enqueue_timeout_ms=args.enqueue_timeout_ms,
+    )
+
+
+async def main(args) -> None:
+    try:
+        # creates the model row, so that inline has a model id
+        warmup = new_recorder(args)
+        await warmup.record(**record_kwargs(-1))
+        await warmup.stop()
+
+        print(f"inline   {summary(await inline(args.inline_requests))}   ({args.inline_requests} requests)")
+
+        recorder = new_recorder(args)
+        timings = await enqueue(recorder, args.overhead_requests)
+        await recorder.stop(timeout=300)
+        print(f"enqueue  {summary(timings)}   ({args.overhead_requests} requests)")
+
+        recorder = new_recorder(args)
+        elapsed = await sustained(recorder, args.records, args.producers)
+        stats = recorder.stats()
+        print(
+            f"sustained: {stats['recorded']} rows in {elapsed:.2f}s = {stats['recorded'] / elapsed:.0f} rows/s, "
+            f"{stats['batches']} batches (avg {stats['avgBatchSize']} rows, {stats['avgFlushMs']} ms), "
+            f"dropped {stats['dropped']}, failed {stats['failed']}"
+        )
+    finally:
+        await cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--producers", type=int, default=64)
+    parser.add_argument("--inline-requests", type=int, default=1000)
+    parser.add_argument("--overhead-requests", type=int, default=10_000)
+    parser.add_argument("--queue-size", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--flush-interval-ms", type=float, default=200)
+    parser.add_argument("--enqueue-timeout-ms", type=float, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args))
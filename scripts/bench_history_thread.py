@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Latency of reading a whole conversation thread from chat_history against a local
+Postgres, on a table seeded with --rows exchanges in threads of --thread-size
+(deep chains with a branch every 5 replies):
+
+    cte:   controller.history.thread_query, one recursive CTE round trip
+    hops:  one query per parent hop up to the root, one per level down to the
+           leaves, then one to load the rows (what lazy ORM relationships do)
+
+With --without-index the cte is also timed with ix_chat_history_parent_id
+dropped inside a transaction that is rolled back (slow on a large table).
+
+Seeded rows use request_route /bench/thread and are kept between runs, pass
+--cleanup to delete them. Start Postgres and migrate first:
+    docker compose -f docker-compose.dev.yml up -d postgres
+    python -m alembic upgrade head
+
+Usage:
+    python scripts/bench_history_thread.py --rows 10000000 --thread-size 1000
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from config.database import AsyncSessionLocal
+from controller.history import thread_query
+from models.chat.history import ChatHistory
+from models.model import Model
+
+ROUTE = "/bench/thread"
+MODEL_NAME = "bench-thread-model"
+SEED_BATCH = 1_000_000
+
+# n-th seeded exchange, its thread is n // thread_size and its position n % thread_size;
+# position 0 is the root, every 5th reply branches off the exchange before its parent
+SEED_SQL = """
+INSERT INTO chat_history (id, prompt, params, model_id, parent_id, request_route, answers, created_at, updated_at)
+SELECT
+    md5('thread-bench-' || n)::uuid,
+    'Bench prompt ' || n,
+    '{"responseLength": "short"}'::json,
+    :model_id,
+    CASE
+        WHEN n % CAST(:thread_size AS bigint) = 0 THEN NULL
+        WHEN n % CAST(:thread_size AS bigint) >= 2 AND n % 5 = 0 THEN md5('thread-bench-' || (n - 2))::uuid
+        ELSE md5('thread-bench-' || (n - 1))::uuid
+    END,
+    :route,
+    '["Bench answer"]'::json,
+    timestamp '2025-01-01' + n * interval '1 second',
+    timestamp '2025-01-01' + n * interval '1 second'
+FROM generate_series(CAST(:start AS bigint), CAST(:stop AS bigint)) AS n
+"""
+
+
+def seeded_id(n: int) -> uuid.UUID:
+    return uuid.UUID(hashlib.md5(f"thread-bench-{n}".encode()).hexdigest())
+
+
+async def seed(rows: int, thread_size: int) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(pg_insert(Model).on_conflict_do_nothing(index_elements=[Model.model_name]), [{"model_name": MODEL_NAME}])
+        model_id = await db.scalar(select(Model.id).where(Model.model_name == MODEL_NAME))
+        count = await db.scalar(select(func.count()).select_from(ChatHistory).where(ChatHistory.request_route == ROUTE))
+        await db.commit()
+
+    for start in range(count, rows, SEED_BATCH):
+        stop = min(start + SEED_BATCH, rows) - 1
+        began = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SET LOCAL statement_timeout = 0"))
+            await db.execute(text(SEED_SQL), {
+                "model_id": model_id, "thread_size": thread_size, "route": ROUTE, "start": start, "stop": stop,
+            })
+            await db.commit()
+        print(f"Seeded rows {start}..{stop} in {time.perf_counter() - began:.1f}s", flush=True)
+
+    if count < rows:
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("ANALYZE chat_history"))
+            await db.commit()
+
+
+async def cte(db, history_id) -> int:
+    return len((await db.execute(thread_query(history_id))).all())
+
+
+async def hops(db, history_id) -> int:
+    # up to the root, one query per parent
+    root_id, parent_id = history_id, await db.scalar(select(ChatHistory.parent_id).where(ChatHistory.id == history_id))
+    while parent_id is not None:
+        root_id = parent_id
+        parent_id = await db.scalar(select(ChatHistory.parent_id).where(ChatHistory.id == parent_id))
+
+    # down to the leaves, one query per level
+    ids, level = [root_id], [root_id]
+    while level:
+        level = list(await db.scalars(
+            select(ChatHistory.id).where(ChatHistory.parent_id.in_(level), ChatHistory.archived_at.is_(None))
+        ))
+        ids.extend(level)
+
+    rows = await db.execute(
+        select(ChatHistory, Model.model_name).join(Model, Model.id == ChatHistory.model_id).where(ChatHistory.id.in_(ids))
+    )
+    return len(rows.all())
+
+
+async def timed(fetch, ids: list) -> tuple:
+    timings, count = [], 0
+    async with AsyncSessionLocal() as db:
+        for history_id in ids:
+            start = time.perf_counter()
+            count = await fetch(db, history_id)
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), max(timings), count
+
+
+async def without_index(ids: list) -> str:
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("SET LOCAL statement_timeout = '120s'"))
+        await db.execute(text("DROP INDEX ix_chat_history_parent_id"))
+        start = time.perf_counter()
+        try:
+            await cte(db, ids[0])
+            result = f"{(time.perf_counter() - start) * 1000:.1f} ms"
+        except Exception as e:
+            result = f"failed after {time.perf_counter() - start:.0f}s ({type(e).__name__})"
+        await db.rollback()
+    return result
+
+
+async def cleanup() -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("SET LOCAL statement_timeout = 0"))
+        await db.execute(delete(ChatHistory).where(ChatHistory.request_route == ROUTE))
+        await db.execute(delete(Model).where(Model.model_name == MODEL_NAME))
+        await db.commit()
+
+
+async def main(args) -> None:
+    if args.cleanup:
+        await cleanup()
+        return
+
+    await seed(args.rows, args.thread_size)
+    rng = random.Random(0)
+    threads = args.rows // args.thread_size
+    # the last exchange of random threads, the deepest way in
+    ids = [seeded_id(rng.randrange(threads) * args.thread_size + args.thread_size - 1) for _ in range(args.repeat)]
+
+    print(f"{'method':<8}{'median ms':>12}{'max ms':>10}{'rows':>8}")
+    for name, fetch in (("cte", cte), ("hops", hops)):
+        median, worst, count = await timed(fetch, ids)
+        print(f"{name:<8}{median:>12.1f}{worst:>10.1f}{count:>8}", flush=True)
+
+    if args.without_index:
+        print(f"cte without ix_chat_history_parent_id: {await without_index(ids)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--thread-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--without-index", action="store_true")
+    parser.add_argument("--cleanup", action="store_true", help="delete the seeded rows and exit")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Serialization cost of embedding responses per payload size (1024 dimensional
+vectors, like mxbai-embed-large), from the vectors returned by the service to the
+bytes sent by the timing middleware.
+
+    stdlib:   jsonable_encoder + json.dumps (FastAPI default) and the previous
+              middleware round trip (json.loads + json.dumps)
+    orjson:   FastJSONResponse with native NumPy serialization + splice_meta
+    base64:   Accept: application/vnd.embeddings+json
+    binary:   Accept: application/octet-stream
+
+Usage:
+    python scripts/bench_json_serialization.py --vectors 1 10 100 1000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+
+from middleware.timing_middleware import splice_meta
+from utils.responses import BASE64_MEDIA_TYPE, BINARY_MEDIA_TYPE, embeddings_response
+
+META = {"model": "mxbai-embed-large"}
+TIMING = {"requestTime": "2025-01-01T00:00:00+00:00", "responseTime": "2025-01-01T00:00:00+00:00", "processTime": 0.1}
+
+
+def request_accepting(media_type: str) -> Request:
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": [(b"accept", media_type.encode())]})
+
+
+def stdlib(vectors: np.ndarray) -> bytes:
+    body = json.dumps(jsonable_encoder({"document_embeddings": vectors.tolist(), "meta": META})).encode()
+    data = json.loads(body)
+    data["meta"].update(TIMING)
+    return json.dumps(data).encode()
+
+
+def fast(media_type: str):
+    request = request_accepting(media_type)
+
+    def serialize(vectors: np.ndarray) -> bytes:
+        body = bytes(embeddings_response(request, "document_embeddings", vectors, META).body)
+        return body if media_type == BINARY_MEDIA_TYPE else splice_meta(body, TIMING)
+
+    return serialize
+
+
+def measure(serialize, vectors: np.ndarray, min_seconds: float = 0.5):
+    runs, start = 0, time.perf_counter()
+    while True:
+        size = len(serialize(vectors))
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds and runs >= 3:
+            return elapsed / runs * 1000, size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--dimensions", type=int, default=1024)
+    args = parser.parse_args()
+
+    cases = [
+        ("stdlib", stdlib),
+        ("orjson", fast("application/json")),
+        ("base64", fast(BASE64_MEDIA_TYPE)),
+        ("binary", fast(BINARY_MEDIA_TYPE)),
+    ]
+    rng = np.random.default_rng(0)
+    print(f"{'vectors':>8}  {'format':<8}{'ms':>10}{'bytes':>14}{'speedup':>10}")
+    for rows in args.vectors:
+        vectors = rng.uniform(-1, 1, size=(rows, args.dimensions)).astype(np.float32)
+        baseline = None
+        for name, serialize in cases:
+            ms, size = measure(serialize, vectors)
+            baseline = baseline or ms
+            print(f"{rows:>8}  {name:<8}{ms:>10.3f}{size:>14}{baseline / ms:>9.1f}x", flush=True)
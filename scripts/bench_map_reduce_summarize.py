@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Wall-clock time of the long-document summarize mode (DemoPromptService.agetSummarizeDocument)
+against the local stub OpenAI server, for documents of --sizes characters:
+
+    serial:      the chunks of the map stage are summarized one at a time
+    concurrent:  up to --concurrency chunks of the map stage are in flight
+
+Every completion of the stub takes --latency seconds, so the map stage costs about
+chunks * latency serially and chunks / concurrency * latency concurrently. The
+response cache is bypassed so that every run calls the model.
+
+Usage:
+    python scripts/bench_map_reduce_summarize.py --sizes 20000 100000 500000 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+STUB_PORT = 8711
+os.environ.setdefault("KEY", "stub-key")
+os.environ["HOST"] = f"http://127.0.0.1:{STUB_PORT}/v1"
+os.environ.setdefault("MODEL_QUEN", "stub-model")
+
+from scripts.stub_openai_server import StubServer, create_app
+from service.demo_3_prompt import DemoPromptService, ResponseFormatOptions, ResponseLengthOptions
+from utils.chunking import count_tokens
+
+WORDS = (
+    "the model summary document service request latency token chunk budget answer "
+    "prompt partial reduce concurrent batch worker queue report figure quarter growth"
+).split()
+
+
+def document(chars: int, seed: int = 0) -> str:
+    # paragraphs of 4 to 8 sentences of 8 to 20 words
+    rng = random.Random(seed)
+    paragraphs, size = [], 0
+    while size < chars:
+        sentences = []
+        for _ in range(rng.randint(4, 8)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:chars]
+
+
+async def timed(service: DemoPromptService, content: str, concurrency: int) -> tuple:
+    start = time.perf_counter()
+    _, stats = await service.agetSummarizeDocument(
+        max_length=ResponseLengthOptions.MEDIUM,
+        response_format=ResponseFormatOptions.PLAIN_TEXT,
+        content=content,
+        map_concurrency=concurrency,
+        use_cache=False,
+    )
+    return time.perf_counter() - start, stats
+
+
+async def main(args) -> None:
+    service = DemoPromptService()
+    print(f"{'chars':>8}{'tokens':>9}{'chunks':>8}{'map calls':>11}{'passes':>8}{'serial s':>11}{'concurrent s':>14}{'speedup':>9}")
+    for size in args.sizes:
+        content = document(size)
+        serial, stats = await timed(service, content, 1)
+        concurrent, _ = await timed(service, content, args.concurrency)
+        print(
+            f"{size:>8}{count_tokens(content):>9}{stats['chunks']:>8}{stats['mapCalls']:>11}{stats['mapPasses']:>8}"
+            f"{serial:>11.2f}{concurrent:>14.2f}{serial / concurrent:>8.1f}x",
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 20000, 100000, 500000])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds spent per completion by the stub")
+    args = parser.parse_args()
+
+    with StubServer(create_app(args.latency), port=STUB_PORT):
+        asyncio.run(main(args))
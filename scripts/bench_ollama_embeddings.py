@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Throughput of embedding --documents documents through ollama /api/embed, against
+the local stub server (scripts/stub_ollama_server.py) running --parallel requests
+at a time:
+
+    per text:     langchain OllamaEmbeddings.embed_query for each document, one
+                  round trip per text (on --per-text-max documents)
+    single call:  langchain OllamaEmbeddings.embed_documents, the whole list in one
+                  request, what the ollama provider did before
+    client N:     utils.ollama_embeddings.OllamaEmbeddingsClient, sub-batches of
+                  --batch-size sent N at a time over the shared keep-alive pool
+    retries:      the client against a stub answering --failure-rate of the
+                  requests with a 503
+
+Prints docs/s, the requests and TCP connections the server saw, and checks every
+vector against the one the stub computes for its document.
+
+Usage:
+    python scripts/bench_ollama_embeddings.py --documents 10000 --concurrency 1 2 4 8
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+os.environ.setdefault("KEY", "stub-key")
+os.environ.setdefault("HOST", "http://127.0.0.1:8711/v1")
+
+import httpx
+import numpy as np
+
+from scripts.stub_ollama_server import create_app, embed
+from scripts.stub_openai_server import StubServer
+from utils.model_service import get_http_clients
+from utils.ollama_embeddings import OllamaEmbeddingsClient
+
+MODEL = "stub-embed"
+
+
+def make_documents(count: int) -> list:
+    rng = random.Random(0)
+    words = "report growth region quarter revenue customer product market team launch cost margin".split()
+    return [f"Document {i}: " + " ".join(rng.choice(words) for _ in range(rng.randint(20, 200))) for i in range(count)]
+
+
+def stats(url: str) -> dict:
+    return httpx.get(f"{url}/stats").json()
+
+
+def run(name: str, url: str, embed_all, documents: list, dimensions: int, total: int) -> None:
+    before = stats(url)
+    start = time.perf_counter()
+    vectors = np.asarray(embed_all(documents), dtype=np.float32)
+    elapsed = time.perf_counter() - start
+    after = stats(url)
+    sample = random.Random(1).sample(range(len(documents)), min(100, len(documents)))
+    ok = vectors.shape == (len(documents), dimensions) and all(
+        np.allclose(vectors[i], embed(documents[i], dimensions), atol=1e-6) for i in sample
+    )
+    rate = len(documents) / elapsed
+    print(
+        f"{name:<14}{rate:>10.0f}{total / rate:>12.1f}{after['requests'] - before['requests']:>10}"
+        f"{after['failures'] - before['failures']:>10}{after['connections'] - before['connections']:>13}"
+        f"  {'OK' if ok else 'WRONG VECTORS'}"
+    )
+
+
+def main(args) -> None:
+    from langchain_ollama import OllamaEmbeddings
+
+    documents = make_documents(args.documents)
+    app = create_app(args.latency, args.per_text, args.parallel, dimensions=args.dimensions)
+    failing_app = create_app(args.latency, args.per_text, args.parallel, args.failure_rate, args.dimensions)
+    with StubServer(app, port=args.port), StubServer(failing_app, port=args.port + 1):
+        url, failing_url = f"http://127.0.0.1:{args.port}", f"http://127.0.0.1:{args.port + 1}"
+        print(
+            f"{args.documents} documents, stub: {args.parallel} parallel requests, "
+            f"{args.latency * 1000:.0f} ms + {args.per_text * 1000:.1f} ms per text"
+        )
+        print(f"{'':<14}{'docs/s':>10}{f'{args.documents} in s':>12}{'requests':>10}{'503s':>10}{'connections':>13}")
+
+        langchain = OllamaEmbeddings(model=MODEL, base_url=url)
+        per_text = documents[:args.per_text_max]
+        run("per text", url, lambda texts: [langchain.embed_query(text) for text in texts], per_text, args.dimensions, args.documents)
+        run("single call", url, langchain.embed_documents, documents, args.dimensions, args.documents)
+
+        http_client = get_http_clients()[0]
+        for concurrency in args.concurrency:
+            client = OllamaEmbeddingsClient(
+                MODEL, base_url=url, http_client=http_client, batch_size=args.batch_size, max_concurrency=concurrency
+            )
+            run(f"client {concurrency}", url, client.embed_documents_array, documents, args.dimensions, args.documents)
+
+        client = OllamaEmbeddingsClient(
+            MODEL,
+            base_url=failing_url,
+            http_client=http_client,
+            batch_size=args.batch_size,
+            max_concurrency=max(args.concurrency),
+            max_retries=args.max_retries,
+            backoff_seconds=0.05,
+        )
+        run(f"retries {max(args.concurrency)}", failing_url, client.embed_documents_array, documents, args.dimensions, args.documents)
+        print(f"client retries: {client.stats()['retries']}, failed requests: {client.stats()['failures']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--per-text-max", type=int, default=500, help="documents embedded one request each")
+    parser.add_argument("--port", type=int, default=11435, help="stub port, the failing stub listens on the next one")
+    parser.add_argument("--latency", type=float, default=0.02, help="stub seconds per request")
+    parser.add_argument("--per-text", type=float, default=0.001, help="stub seconds per text")
+    parser.add_argument("--parallel", type=int, default=4, help="stub requests processed at once")
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--dimensions", type=int, default=1024)
+    main(parser.parse_args())
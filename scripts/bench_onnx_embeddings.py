@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Throughput of the huggingface embeddings model on CPU, per batch size:
+
+    torch:      SentenceTransformer.encode (the "huggingface" provider)
+    onnx fp32:  utils.onnx_embeddings.OnnxEmbeddings (the "onnx" provider)
+    onnx int8:  the same with ONNX_EMBEDDINGS_QUANTIZE
+
+Every backend embeds the same --texts texts after one warm-up batch, once per
+--threads intra-op thread count (0: one per core), torch with the same count.
+The batch size is the number of texts per forward pass, what
+ONNX_EMBEDDINGS_BATCH_SIZE sets for the onnx provider. Check the accuracy of
+the ONNX vectors with scripts/onnx_embeddings_accuracy.py.
+
+Usage:
+    python scripts/bench_onnx_embeddings.py --batch-sizes 1 8 32 64 --texts 256
+    python scripts/bench_onnx_embeddings.py --synthetic --threads 1 2 4 0
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from config.enums import ModelName
+from config.models import MODELS_CONFIG
+from scripts.bench_embedding_pool import SYNTHETIC_DIR, build_synthetic, make_texts
+from utils.onnx_embeddings import OnnxEmbeddings
+
+HUGGINGFACE_CONFIG = MODELS_CONFIG[ModelName.HUGGINGFACE_EMBEDDINGS]["config"]
+
+
+def throughput(embed, texts: list, batch_size: int) -> float:
+    embed(texts[:batch_size])
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        embed(texts[i:i + batch_size])
+    return len(texts) / (time.perf_counter() - start)
+
+
+def run(args, texts: list, reference, threads: int) -> None:
+    import torch
+
+    torch.set_num_threads(threads or os.cpu_count())
+    backends = {
+        "torch": lambda batch: reference.encode(
+            batch, batch_size=len(batch), normalize_embeddings=True, show_progress_bar=False
+        ),
+    }
+    for name, quantize in (("onnx fp32", False), ("onnx int8", True)):
+        # one session per variant, every session keeps an arena sized by its largest batch
+        embeddings = OnnxEmbeddings(
+            args.model,
+            cache_folder=args.cache_folder,
+            encode_kwargs={"normalize_embeddings": True},
+            onnx_quantize=quantize,
+            onnx_intra_op_threads=threads,
+            onnx_batch_size=max(args.batch_sizes),
+        )
+        backends[name] = embeddings.embed_documents_array
+
+    print(f"{args.texts} texts, {threads or 'all'} thread(s), {os.cpu_count()} cpu(s), texts/s")
+    print(f"{'batch':>6}" + "".join(f"{name:>12}" for name in ("torch", "onnx fp32", "onnx int8")) + f"{'int8 speedup':>14}")
+    for batch_size in args.batch_sizes:
+        rates = [throughput(backends[name], texts, batch_size) for name in ("torch", "onnx fp32", "onnx int8")]
+        print(f"{batch_size:>6}" + "".join(f"{rate:>12.1f}" for rate in rates) + f"{rates[2] / rates[0]:>13.2f}x")
+
+
+def main(args) -> None:
+    from sentence_transformers import SentenceTransformer
+
+    texts = make_texts(args.texts)
+    reference = SentenceTransformer(args.model, cache_folder=args.cache_folder, device="cpu")
+    for threads in args.threads:
+        run(args, texts, reference, threads)
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=HUGGINGFACE_CONFIG["model_name"], help="model name or path")
+    parser.add_argument("--cache-folder", default=HUGGINGFACE_CONFIG["cache_folder"])
+    parser.add_argument("--synthetic", action="store_true", help=f"build and use a random model in {SYNTHETIC_DIR}")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="intra-op threads, 0 for one per core")
+    args = parser.parse_args()
+    if args.synthetic:
+        args.model = build_synthetic(SYNTHETIC_DIR)
+        args.cache_folder = tempfile.gettempdir()
+    main(args)
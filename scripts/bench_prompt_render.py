@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Per-request render cost of the summarize prompt, for content of --sizes
+characters, cycling through every length and format option:
+
+    langchain:  PromptTemplate(validate_template=True).invoke, as the service
+                rendered it before the template registry
+    registry:   utils.prompt_templates, the static part is bound once per
+                (length, format) and only the content is substituted
+
+Usage:
+    python scripts/bench_prompt_render.py --sizes 100 2000 20000
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from langchain_core.prompts import PromptTemplate
+
+from service.demo_3_prompt import SUMMARIZE_PROMPT, ResponseFormatOptions, ResponseLengthOptions
+from utils.prompt_templates import TemplateRegistry
+
+OPTIONS = list(itertools.product(ResponseLengthOptions, ResponseFormatOptions))
+
+
+def langchain_render(template: PromptTemplate):
+    def render(max_length, response_format, content: str) -> str:
+        return template.invoke({
+            "content": content,
+            "max_length": max_length.description,
+            "response_format": response_format.description,
+            "rules": response_format.rules,
+        }).to_string()
+    return render
+
+
+def registry_render(registry: TemplateRegistry):
+    def render(max_length, response_format, content: str) -> str:
+        return registry.render(
+            "summarize",
+            {
+                "max_length": max_length.description,
+                "response_format": response_format.description,
+                "rules": response_format.rules,
+            },
+            content=content,
+        )
+    return render
+
+
+def timed(render, content: str, min_seconds: float) -> float:
+    runs, start = 0, time.perf_counter()
+    while True:
+        for max_length, response_format in OPTIONS:
+            render(max_length, response_format, content)
+        runs += len(OPTIONS)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / runs * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 2000, 20000])
+    parser.add_argument("--min-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    template = PromptTemplate(
+        input_variables=["content", "max_length", "response_format", "rules"],
+        template=SUMMARIZE_PROMPT,
+        validate_template=True,
+    )
+    registry = TemplateRegistry()
+    registry.register("summarize", SUMMARIZE_PROMPT)
+    renders = {"langchain": langchain_render(template), "registry": registry_render(registry)}
+
+    content = "The quick brown fox jumps over the lazy dog. "
+    for max_length, response_format in OPTIONS:
+        assert renders["langchain"](max_length, response_format, content) == renders["registry"](max_length, response_format, content)
+
+    print(f"{'chars':>8}{'langchain us':>15}{'registry us':>14}{'speedup':>10}")
+    for size in args.sizes:
+        text = (content * (size // len(content) + 1))[:size]
+        langchain_us = timed(renders["langchain"], text, args.min_seconds)
+        registry_us = timed(renders["registry"], text, args.min_seconds)
+        print(f"{size:>8}{langchain_us:>15.2f}{registry_us:>14.2f}{langchain_us / registry_us:>9.1f}x", flush=True)
+    print(f"registry stats: {registry.stats()}")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Worker cold start: how long importing the app takes and where the time goes, from
+`python -X importtime -c "import main"` run in a fresh interpreter.
+
+    lazy:   import main, the models load on first use (or in the background
+            with MODEL_WARMUP, which does not delay the import)
+    eager:  import main, then load every configured model synchronously, what
+            importing the controllers did before the models were loaded lazily
+
+For each mode prints the wall time, the slowest imports of main and of the
+model loading (cumulative)
+and whether the heavy provider packages were imported at all. With --serve, also
+the time until a uvicorn worker answers /healthz and /readyz.
+
+Usage:
+    python scripts/bench_startup.py --top 15 --serve
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+HEAVY = ("langchain_openai", "langchain_ollama", "langchain_huggingface", "sentence_transformers", "transformers", "torch")
+CODE = {
+    "lazy": "import main",
+    "eager": "import main\nfrom utils.model_service import warm_up\nwarm_up()",
+}
+# import time:       self [us] |  cumulative | imported package
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def importtime(code: str, env: dict) -> tuple:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT_DIR, env=env, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        print(result.stderr[-2000:], file=sys.stderr)
+        raise SystemExit(f"'{code}' failed")
+
+    top_level, imported = [], set()
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, module = int(match.group(2)), len(match.group(3)), match.group(4)
+        imported.add(module.split(".")[0])
+        # 1 space of indentation at the top level, 2 more per nesting level:
+        # the imports of main and the top-level ones (model loading), not main itself
+        if indent <= 3 and module != "main":
+            top_level.append((cumulative / 1e6, module))
+    return elapsed, sorted(top_level, reverse=True), imported
+
+
+def wait_for(url: str, deadline: float) -> bool:
+    start = time.perf_counter()
+    while time.perf_counter() - start < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.05)
+    return False
+
+
+def serve(env: dict, port: int, deadline: float) -> tuple:
+    # seconds from the worker start until /healthz and /readyz answer 200, None on timeout
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        timings = []
+        for route in ("healthz", "readyz"):
+            ok = wait_for(f"http://127.0.0.1:{port}/{route}", deadline)
+            timings.append(time.perf_counter() - start if ok else None)
+        return tuple(timings)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=list(CODE), default=list(CODE))
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to print")
+    parser.add_argument("--serve", action="store_true", help="also time /healthz and /readyz of a uvicorn worker")
+    parser.add_argument("--port", type=int, default=8713)
+    parser.add_argument("--deadline", type=float, default=300, help="seconds to wait for the worker")
+    args = parser.parse_args()
+
+    env = {**os.environ, "HISTORY_MAINTENANCE_INTERVAL_HOURS": os.environ.get("HISTORY_MAINTENANCE_INTERVAL_HOURS", "0")}
+    for mode in args.modes:
+        elapsed, top_level, imported = importtime(CODE[mode], env)
+        print(f"\n{mode}: {elapsed:.2f}s wall")
+        for seconds, module in top_level[:args.top]:
+            print(f"    {seconds:>8.3f}s  {module}")
+        print(f"    heavy packages imported: {', '.join(p for p in HEAVY if p in imported) or 'none'}")
+
+    if args.serve:
+        for route, seconds in zip(("/healthz", "/readyz"), serve(env, args.port, args.deadline)):
+            print(f"uvicorn main:app  {route} after {seconds:.2f}s" if seconds is not None else f"{route} timed out")
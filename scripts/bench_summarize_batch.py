@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Throughput of POST /video-3/summarize/batch against the local stub OpenAI server,
+for batches of --sizes items, each with a distinct content:
+
+    one-by-one:  one /video-3/summarize call per item, issued serially, as clients
+                 did before the batch route (only up to --serial-max items)
+    batch:       one /video-3/summarize/batch call, results returned in order
+    ndjson:      the same call with Accept: application/x-ndjson, with the time
+                 to the first streamed result
+
+The app is served by uvicorn on --app-port (ASGITransport would buffer the NDJSON
+stream) and requests are sent with Cache-Control: no-cache, so that every item
+calls the model.
+
+Usage:
+    python scripts/bench_summarize_batch.py --sizes 10 100 1000 --latency 0.2 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+STUB_PORT = 8711
+os.environ.setdefault("KEY", "stub-key")
+os.environ["HOST"] = f"http://127.0.0.1:{STUB_PORT}/v1"
+os.environ.setdefault("MODEL_QUEN", "stub-model")
+os.environ.setdefault("HISTORY_ENABLED", "false")
+
+import httpx
+from fastapi import FastAPI
+
+from scripts.stub_openai_server import StubServer, create_app
+from controller.v3_prompts import router as v3_prompts
+
+HEADERS = {"Cache-Control": "no-cache"}
+
+
+def items(size: int) -> list:
+    return [
+        {"content": f"Snippet {i}: the quarterly report shows growth in every region.", "responseLength": "SHORT"}
+        for i in range(size)
+    ]
+
+
+async def one_by_one(client: httpx.AsyncClient, size: int) -> float:
+    start = time.perf_counter()
+    for item in items(size):
+        response = await client.post("/video-3/summarize", json=item, headers=HEADERS)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def batch(client: httpx.AsyncClient, size: int, concurrency: int) -> float:
+    start = time.perf_counter()
+    response = await client.post(
+        "/video-3/summarize/batch", json={"items": items(size), "concurrency": concurrency}, headers=HEADERS
+    )
+    response.raise_for_status()
+    assert response.json()["meta"]["succeeded"] == size, response.json()["meta"]
+    return time.perf_counter() - start
+
+
+async def ndjson(client: httpx.AsyncClient, size: int, concurrency: int) -> tuple:
+    start, first, lines = time.perf_counter(), None, 0
+    async with client.stream(
+        "POST",
+        "/video-3/summarize/batch",
+        json={"items": items(size), "concurrency": concurrency},
+        headers={**HEADERS, "Accept": "application/x-ndjson"},
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line:
+                first = first or time.perf_counter() - start
+                lines += 1
+    assert lines == size, lines
+    return time.perf_counter() - start, first
+
+
+async def main(args, base_url: str) -> None:
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        print(f"{'items':>6}{'one-by-one/s':>15}{'batch/s':>10}{'ndjson/s':>11}{'first result s':>17}")
+        for size in args.sizes:
+            serial = f"{size / await one_by_one(client, size):>15.1f}" if size <= args.serial_max else f"{'-':>15}"
+            batched = size / await batch(client, size, args.concurrency)
+            streamed, first = await ndjson(client, size, args.concurrency)
+            print(f"{size:>6}{serial}{batched:>10.1f}{size / streamed:>11.1f}{first:>17.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--serial-max", type=int, default=100, help="largest batch also sent one item at a time")
+    parser.add_argument("--app-port", type=int, default=8712)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds spent per completion by the stub")
+    args = parser.parse_args()
+
+    app = FastAPI()
+    app.include_router(v3_prompts)
+    with StubServer(create_app(args.latency), port=STUB_PORT), StubServer(app, port=args.app_port) as server:
+        asyncio.run(main(args, f"http://{server.host}:{server.port}"))
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Response time and peak RSS of an embedding response of about 10 MB (1024 dimensional
+vectors) through the timing middleware.
+
+    none:   no timing middleware
+    legacy: the previous BaseHTTPMiddleware (body += chunk, json.loads, json.dumps)
+    asgi:   middleware.timing_middleware.TimingMiddleware
+
+Each variant runs in its own process so that ru_maxrss is not shared.
+
+Usage:
+    python scripts/bench_timing_middleware.py --megabytes 10 --requests 10
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+VARIANTS = ("none", "legacy", "asgi")
+
+
+def build_app(variant: str, vectors: int):
+    import random
+    from typing import Any, cast
+    from fastapi import FastAPI
+    from fastapi.responses import Response
+    from starlette.middleware.base import BaseHTTPMiddleware
+
+    from middleware.timing_middleware import TimingMiddleware
+
+    class LegacyTimingMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            start_time = time.time()
+            response = await call_next(request)
+            body = b""
+            async for chunk in cast(Any, response).body_iterator:
+                body += chunk
+            response_data = json.loads(body.decode())
+            response_data.setdefault("meta", {})["processTime"] = round(time.time() - start_time, 4)
+            response_content = json.dumps(response_data)
+            response.headers["content-length"] = str(len(response_content.encode()))
+            return Response(content=response_content, status_code=response.status_code, headers=dict(response.headers))
+
+    rng = random.Random(0)
+    embeddings = [[rng.uniform(-1, 1) for _ in range(1024)] for _ in range(vectors)]
+
+    app = FastAPI()
+    if variant == "legacy":
+        app.add_middleware(LegacyTimingMiddleware)
+    elif variant == "asgi":
+        app.add_middleware(TimingMiddleware)
+
+    @app.post("/from-documents")
+    async def from_documents():
+        return {"document_embeddings": embeddings, "meta": {"model": "mxbai-embed-large"}}
+
+    return app
+
+
+def run_variant(variant: str, vectors: int, requests: int) -> None:
+    import asyncio
+    import httpx
+
+    app = build_app(variant, vectors)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            timings, size = [], 0
+            for _ in range(requests):
+                start = time.perf_counter()
+                response = await client.post("/from-documents")
+                timings.append((time.perf_counter() - start) * 1000)
+                size = len(response.content)
+                assert "meta" in response.json()
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            timings.sort()
+            print(json.dumps({
+                "variant": variant,
+                "payloadMB": round(size / 1e6, 2),
+                "p50Ms": round(timings[len(timings) // 2], 1),
+                "maxMs": round(timings[-1], 1),
+                "peakRssMB": round(peak_rss / 1024, 1),
+                "rssGrowthMB": round((peak_rss - baseline_rss) / 1024, 1),
+            }))
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=float, default=10.0, help="approximate JSON payload size")
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # one 1024 dimensional vector is about 20 KB of JSON
+    vectors = max(1, int(args.megabytes * 1e6 / 20_000))
+    if args.variant:
+        run_variant(args.variant, vectors, args.requests)
+    else:
+        print(f"{'variant':<8}{'payload MB':>12}{'p50 ms':>10}{'max ms':>10}{'peak RSS MB':>13}{'RSS growth MB':>15}")
+        for variant in VARIANTS:
+            output = subprocess.run(
+                [sys.executable, __file__, "--variant", variant, "--megabytes", str(args.megabytes), "--requests", str(args.requests)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{variant:<8}{result['payloadMB']:>12}{result['p50Ms']:>10}{result['maxMs']:>10}"
+                f"{result['peakRssMB']:>13}{result['rssGrowthMB']:>15}"
+            )
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Rows/second of user creation against a local Postgres:
+
+    legacy single:  the previous POST /users/ (SELECT email, SELECT username,
+                    INSERT, COMMIT, refresh SELECT)
+    single:         POST /users/ (INSERT ... RETURNING)
+    bulk:           POST /users/bulk with --batch-size users per request
+
+Single creations are sent by --concurrency clients. Every run inserts fresh
+users, which are deleted at the end. Start Postgres and create the tables first:
+    docker compose -f docker-compose.dev.yml up -d postgres
+    python -m alembic upgrade head
+
+Usage:
+    python scripts/bench_users_bulk.py --users 2000 --batch-size 1000
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.database import AsyncSessionLocal, get_async_db
+from controller.users import UserCreate, UserResponse, router
+from models.user import User
+
+PREFIX = "bulkbench-"
+_run = itertools.count()
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/legacy/users/", response_model=UserResponse)
+    async def legacy_create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+        if await db.scalar(select(User).where(User.email == user.email).limit(1)):
+            raise HTTPException(status_code=400, detail="Email already registered")
+        if await db.scalar(select(User).where(User.username == user.username).limit(1)):
+            raise HTTPException(status_code=400, detail="Username already taken")
+        db_user = User(email=user.email, username=user.username, full_name=user.full_name)
+        db.add(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        return db_user
+
+    app.include_router(router)
+    return app
+
+
+def new_users(count: int) -> list:
+    run = next(_run)
+    return [
+        {"email": f"{PREFIX}{run}-{i}@example.com", "username": f"{PREFIX}{run}-{i}", "full_name": f"Bench {i}"}
+        for i in range(count)
+    ]
+
+
+async def create_single(client: httpx.AsyncClient, path: str, users: list, concurrency: int) -> None:
+    queue = iter(users)
+
+    async def worker():
+        for user in queue:
+            (await client.post(path, json=user)).raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def create_bulk(client: httpx.AsyncClient, users: list, batch_size: int) -> None:
+    for start in range(0, len(users), batch_size):
+        response = await client.post("/users/bulk", json=users[start:start + batch_size])
+        response.raise_for_status()
+        assert response.json()["conflicts"] == 0
+
+
+async def cleanup() -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(User).where(User.username.like(f"{PREFIX}%")))
+        await db.commit()
+
+
+async def main(count: int, batch_size: int, concurrency: int) -> None:
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        runs = [
+            ("legacy single", lambda users: create_single(client, "/legacy/users/", users, concurrency)),
+            ("single", lambda users: create_single(client, "/users/", users, concurrency)),
+            ("bulk", lambda users: create_bulk(client, users, batch_size)),
+        ]
+        print(f"{'variant':<16}{'users':>8}{'seconds':>10}{'rows/s':>10}")
+        try:
+            for name, create in runs:
+                users = new_users(count)
+                start = time.perf_counter()
+                await create(users)
+                elapsed = time.perf_counter() - start
+                print(f"{name:<16}{count:>8}{elapsed:>10.2f}{count / elapsed:>10.0f}", flush=True)
+        finally:
+            await cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8, help="clients sending single creations")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.batch_size, args.concurrency))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Page latency of GET /users/ deep into the table against a local Postgres:
+
+    offset orm:   offset(skip).limit(limit) loading ORM User objects (previous route)
+    offset rows:  ?skip= with the column projection of the current route
+    keyset:       ?cursor= seeking on users.id
+
+plus, with --export, the throughput and peak RSS of GET /users/export.
+
+The users table is filled up to --rows with generated rows first (a few seconds
+per million rows). Start Postgres and create the tables first:
+    docker compose -f docker-compose.dev.yml up -d postgres
+    python -m alembic upgrade head
+
+Usage:
+    python scripts/bench_users_pagination.py --offsets 0 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from config.database import SessionLocal, get_async_db
+from controller.users import UserResponse, _encode_cursor, export_users, router
+from models.user import User
+
+
+def fill(rows: int) -> None:
+    with SessionLocal() as db:
+        count = db.scalar(select(func.count()).select_from(User))
+        if count >= rows:
+            return
+        print(f"Inserting {rows - count} users...", flush=True)
+        db.execute(
+            text(
+                "INSERT INTO users (email, username, full_name, created_at, updated_at) "
+                "SELECT 'bench-' || n || '@example.com', 'bench-' || n, 'Bench User ' || n, now(), now() "
+                "FROM generate_series(:start, :stop) AS n ON CONFLICT DO NOTHING"
+            ),
+            {"start": count, "stop": rows},
+        )
+        db.commit()
+        db.execute(text("ANALYZE users"))
+        db.commit()
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/legacy/users/", response_model=List[UserResponse])
+    async def legacy_users(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+        users = await db.scalars(select(User).order_by(User.id).offset(skip).limit(limit))
+        return users.all()
+
+    app.include_router(router)
+    return app
+
+
+async def cursor_at(offset: int) -> str:
+    # the cursor a client walking the pages would hold at this offset
+    from config.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        if offset == 0:
+            return _encode_cursor(0)
+        last_id = await db.scalar(select(User.id).order_by(User.id).offset(offset - 1).limit(1))
+        return _encode_cursor(last_id)
+
+
+async def timed(client: httpx.AsyncClient, path: str, params: dict, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(path, params=params)
+        response.raise_for_status()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+async def main(offsets: List[int], limit: int, repeat: int, export: bool) -> None:
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"{'offset':>10}{'offset orm ms':>15}{'offset rows ms':>16}{'keyset ms':>11}")
+        for offset in offsets:
+            cursor = await cursor_at(offset)
+            orm = await timed(client, "/legacy/users/", {"skip": offset, "limit": limit}, repeat)
+            rows = await timed(client, "/users/", {"skip": offset, "limit": limit}, repeat)
+            keyset = await timed(client, "/users/", {"cursor": cursor, "limit": limit}, repeat)
+            print(f"{offset:>10}{orm:>15.2f}{rows:>16.2f}{keyset:>11.2f}", flush=True)
+
+        if export:
+            baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            start, lines, size = time.perf_counter(), 0, 0
+            # iterates the route's body directly, ASGITransport buffers whole responses
+            response = await export_users()
+            async for chunk in response.body_iterator:
+                lines += chunk.count(b"\n")
+                size += len(chunk)
+            elapsed = time.perf_counter() - start
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print(
+                f"export: {lines} rows, {size / 1e6:.1f} MB in {elapsed:.1f}s ({lines / elapsed:.0f} rows/s), "
+                f"RSS growth {(peak_rss - baseline_rss) / 1024:.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_100_000, help="minimum number of rows in the users table")
+    parser.add_argument("--offsets", type=int, nargs="+", default=[0, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--export", action="store_true", help="also stream the NDJSON export")
+    args = parser.parse_args()
+
+    fill(args.rows)
+    asyncio.run(main(args.offsets, args.limit, args.repeat, args.export))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the collection search behind /video-2/search on a synthetic corpus of
+normalized 384 dimensional vectors (the size of all-MiniLM-L6-v2 embeddings).
+
+    brute-force: cosine_similarity + sorted() over the full result (previous path)
+    index:       memory-mapped float32 matrix, dot product + argpartition top-k
+
+Usage:
+    python scripts/bench_vector_index.py --documents 1000000 --queries 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from utils.vector_index import VectorIndexStore
+
+
+def normalized(rows: int, dimensions: int, rng: np.random.Generator) -> np.ndarray:
+    vectors = rng.standard_normal((rows, dimensions), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def brute_force(matrix: np.ndarray, query: np.ndarray, k: int):
+    result = cosine_similarity(np.array([query]), matrix)
+    return sorted(enumerate(result.tolist()[0]), key=lambda y: y[1], reverse=True)[:k]
+
+
+def report(name: str, timings) -> None:
+    timings = sorted(timings)
+    print(
+        f"{name:<12} p50 {statistics.median(timings):9.2f} ms"
+        f"  p99 {timings[max(0, int(len(timings) * 0.99) - 1)]:9.2f} ms"
+        f"  qps {1000 / statistics.mean(timings):9.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--skip-brute-force", action="store_true")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = normalized(args.queries, args.dimensions, rng)
+
+    with tempfile.TemporaryDirectory() as directory:
+        collection = VectorIndexStore(directory).get_or_create("bench", args.dimensions)
+        start = time.perf_counter()
+        chunk = 100_000
+        for offset in range(0, args.documents, chunk):
+            rows = min(chunk, args.documents - offset)
+            collection.add([f"doc {offset + i}" for i in range(rows)], normalized(rows, args.dimensions, rng))
+        print(f"ingested {len(collection)} vectors in {time.perf_counter() - start:.1f} s")
+
+        matrix = np.asarray(collection._matrix[: collection.count])
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            collection.search(query, args.k)
+            timings.append((time.perf_counter() - start) * 1000)
+        report("index", timings)
+
+        if not args.skip_brute_force:
+            timings = []
+            for query in queries[: max(1, args.queries // 10)]:
+                start = time.perf_counter()
+                brute_force(matrix, query, args.k)
+                timings.append((time.perf_counter() - start) * 1000)
+            report("brute-force", timings)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Runs the chat_history partition maintenance once (utils.history_partitions), what
+the app lifespan does every HISTORY_MAINTENANCE_INTERVAL_HOURS:
+
+    1. creates the monthly partitions up to --partitions-ahead months from now,
+       moving matching rows out of the default partition
+    2. archives the exchanges older than --archive-after-days, --batch-size rows
+       per transaction
+    3. detaches the partitions older than --retention-months, or drops them
+       with --drop
+
+Detached partitions are plain tables named chat_history_yYYYYmMM, dump them
+(pg_dump -t chat_history_y2025m01) before dropping them by hand. Defaults come
+from the HISTORY_* settings in config/database.py. --dry-run prints what would
+be done without changing anything.
+
+Usage:
+    python scripts/history_retention.py --retention-months 12 --dry-run
+"""
+import argparse
+import json
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from config.database import (
+    engine,
+    HISTORY_ARCHIVE_AFTER_DAYS,
+    HISTORY_ARCHIVE_BATCH_SIZE,
+    HISTORY_MAINTENANCE_LOCK_TIMEOUT_MS,
+    HISTORY_PARTITIONS_AHEAD,
+    HISTORY_RETENTION_DROP,
+    HISTORY_RETENTION_MONTHS,
+)
+from utils.history_partitions import list_partitions, run_maintenance
+
+
+def main(args) -> None:
+    with engine.connect() as connection:
+        # every step commits on its own
+        report = run_maintenance(
+            connection,
+            archive_after_days=args.archive_after_days,
+            retention_months=args.retention_months,
+            drop=args.drop,
+            months_ahead=args.partitions_ahead,
+            batch_size=args.batch_size,
+            lock_timeout_ms=args.lock_timeout_ms,
+            dry_run=args.dry_run,
+        )
+        report["partitions"] = [name for name, _ in list_partitions(connection)]
+    report["dryRun"] = args.dry_run
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archive-after-days", type=int, default=HISTORY_ARCHIVE_AFTER_DAYS, help="0 never archives")
+    parser.add_argument("--retention-months", type=int, default=HISTORY_RETENTION_MONTHS, help="0 keeps every partition")
+    parser.add_argument("--drop", action="store_true", default=HISTORY_RETENTION_DROP, help="drop retired partitions")
+    parser.add_argument("--partitions-ahead", type=int, default=HISTORY_PARTITIONS_AHEAD)
+    parser.add_argument("--batch-size", type=int, default=HISTORY_ARCHIVE_BATCH_SIZE, help="rows archived per transaction")
+    parser.add_argument("--lock-timeout-ms", type=int, default=HISTORY_MAINTENANCE_LOCK_TIMEOUT_MS)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Load test of the /users routes against a local Postgres, comparing the previous
+threadpool path (sync Session, default create_engine pool, def routes) with the
+async path of controller/users.py (asyncpg, pool from DB_POOL_SIZE /
+DB_MAX_OVERFLOW / DB_POOL_PRE_PING / DB_POOL_RECYCLE).
+
+Each variant runs in its own uvicorn process; the clients mix GET /users/{id} and
+GET /users/?limit=20 (read heavy, like the UI) for a fixed duration.
+
+Start Postgres and create the tables first:
+    docker compose -f docker-compose.dev.yml up -d postgres
+    python -m alembic upgrade head
+
+Usage:
+    python scripts/load_test_users.py --concurrency 100 500 --duration 15
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+VARIANTS = ("threadpool", "async")
+
+
+def build_app(variant: str):
+    from fastapi import FastAPI
+
+    app = FastAPI()
+    if variant == "async":
+        from controller.users import router
+        app.include_router(router)
+        return app
+
+    # the routes as they were before the async port
+    from fastapi import Depends, HTTPException
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session, sessionmaker
+    from typing import List
+
+    from config.database import DATABASE_URL
+    from controller.users import UserResponse
+    from models.user import User
+
+    engine = create_engine(DATABASE_URL)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/users/", response_model=List[UserResponse])
+    def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+        return db.query(User).offset(skip).limit(limit).all()
+
+    @app.get("/users/{user_id}", response_model=UserResponse)
+    def get_user(user_id: int, db: Session = Depends(get_db)):
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
+
+    return app
+
+
+def seed(users: int) -> list:
+    from sqlalchemy import func, select
+    from sqlalchemy.dialects.postgresql import insert
+
+    from config.database import SessionLocal
+    from models.user import User
+
+    with SessionLocal() as db:
+        existing = db.scalar(select(func.count()).select_from(User).where(User.username.like("loadtest-%")))
+        if existing < users:
+            rows = [
+                {"email": f"loadtest-{i}@example.com", "username": f"loadtest-{i}", "full_name": f"Load Test {i}"}
+                for i in range(users)
+            ]
+            db.execute(insert(User).values(rows).on_conflict_do_nothing())
+            db.commit()
+        return list(db.scalars(select(User.id).where(User.username.like("loadtest-%"))))
+
+
+async def drive(port: int, ids: list, concurrency: int, duration: float) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        async def worker(rng: random.Random):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                path = f"/users/{rng.choice(ids)}" if rng.random() < 0.8 else f"/users/?skip={rng.randrange(len(ids))}&limit=20"
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        errors += 1
+                        continue
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(random.Random(i)) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50Ms": round(statistics.median(latencies) * 1000, 1) if latencies else "-",
+        "p99Ms": round(latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000, 1) if latencies else "-",
+    }
+
+
+def wait_until_ready(port: int, timeout: float = 30) -> None:
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/docs", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per run")
+    parser.add_argument("--users", type=int, default=10_000, help="rows seeded into the users table")
+    parser.add_argument("--port", type=int, default=8721)
+    parser.add_argument("--serve", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        import uvicorn
+        # failed requests are counted by the client, the tracebacks would drown the results
+        uvicorn.run(build_app(args.serve), host="127.0.0.1", port=args.port, log_level="critical", backlog=4096)
+        sys.exit(0)
+
+    ids = seed(args.users)
+    print(f"{'variant':<12}{'clients':>8}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+    for variant in VARIANTS:
+        server = subprocess.Popen([sys.executable, __file__, "--serve", variant, "--port", str(args.port)])
+        try:
+            wait_until_ready(args.port)
+            for concurrency in args.concurrency:
+                result = asyncio.run(drive(args.port, ids, concurrency, args.duration))
+                print(
+                    f"{variant:<12}{concurrency:>8}{result['requests']:>10}{result['errors']:>8}"
+                    f"{result['rps']:>9}{result['p50Ms']:>9}{result['p99Ms']:>9}",
+                    flush=True,
+                )
+        finally:
+            server.terminate()
+            server.wait()
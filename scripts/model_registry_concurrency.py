@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Checks that utils.model_service.model_registry builds a model once under
+--threads simultaneous first calls, released together by a barrier:
+
+    openai:     the configured chat model, through the real openai provider
+    slow:       a provider plugged in for the check, whose build sleeps
+                --build-seconds to widen the race, half of the calls with
+                one of --overrides distinct config overrides
+    eviction:   --overrides + 1 configs with max_instances=--overrides, the least
+                recently used one is evicted
+    hot path:   cost of a call once the model is pooled
+
+Exits with status 1 when a model is built more than once per config.
+
+Usage:
+    python scripts/model_registry_concurrency.py --threads 100 --build-seconds 0.5
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+os.environ.setdefault("KEY", "stub-key")
+os.environ.setdefault("HOST", "http://127.0.0.1:8711/v1")
+
+from config.enums import ModelName
+from utils.model_registry import ModelProvider, ModelRegistry
+from utils.model_service import model_registry
+
+
+def simultaneous(threads: int, call) -> list:
+    # every thread waits on the barrier, then calls at once
+    barrier = threading.Barrier(threads)
+    results = [None] * threads
+
+    def run(i: int) -> None:
+        barrier.wait()
+        results[i] = call(i)
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def check(name: str, builds: int, expected: int, distinct: int, elapsed: float) -> bool:
+    ok = builds == expected and distinct == expected
+    print(f"{name:<10} builds {builds:>3} (expected {expected}), distinct instances {distinct:>3}, {elapsed:.2f}s  {'OK' if ok else 'FAILED'}")
+    return ok
+
+
+def slow_registry(build_seconds: float, **kwargs) -> tuple:
+    built = []
+    lock = threading.Lock()
+
+    def build(config: dict) -> object:
+        time.sleep(build_seconds)
+        instance = object()
+        with lock:
+            built.append(instance)
+        return instance
+
+    registry = ModelRegistry(
+        {ModelName.OPENAI_CHAT: {"provider": "slow", "singleton": True, "config": {"model": "slow", "temperature": 0.0}}},
+        **kwargs,
+    )
+    registry.register_provider("slow", ModelProvider(build=build))
+    return registry, built
+
+
+def main(args) -> bool:
+    ok = True
+
+    start = time.perf_counter()
+    models = simultaneous(args.threads, lambda i: model_registry.get(ModelName.OPENAI_CHAT).model)
+    ok &= check("openai", model_registry.stats()["builds"], 1, len({id(model) for model in models}), time.perf_counter() - start)
+
+    registry, built = slow_registry(args.build_seconds)
+
+    def call(i: int):
+        if i % 2:
+            return registry.get(ModelName.OPENAI_CHAT, temperature=float(i // 2 % args.overrides) + 1).model
+        return registry.get(ModelName.OPENAI_CHAT).model
+
+    start = time.perf_counter()
+    models = simultaneous(args.threads, call)
+    ok &= check("slow", len(built), args.overrides + 1, len({id(model) for model in models}), time.perf_counter() - start)
+
+    registry, built = slow_registry(0, max_instances=args.overrides, min_idle_seconds=0)
+    for temperature in range(args.overrides + 1):
+        registry.get(ModelName.OPENAI_CHAT, temperature=float(temperature))
+    stats = registry.stats()
+    evicted = stats["evictions"] == 1 and stats["instances"] == {ModelName.OPENAI_CHAT.value: args.overrides}
+    print(f"{'eviction':<10} {stats['instances']}, evictions {stats['evictions']}  {'OK' if evicted else 'FAILED'}")
+    ok &= evicted
+
+    calls = 100_000
+    start = time.perf_counter()
+    for _ in range(calls):
+        model_registry.get(ModelName.OPENAI_CHAT)
+    print(f"{'hot path':<10} {(time.perf_counter() - start) / calls * 1e6:.2f} us per pooled get")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=100)
+    parser.add_argument("--build-seconds", type=float, default=0.5)
+    parser.add_argument("--overrides", type=int, default=4)
+    args = parser.parse_args()
+    sys.exit(0 if main(args) else 1)
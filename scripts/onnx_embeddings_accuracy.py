@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Checks that utils.onnx_embeddings.OnnxEmbeddings (the "onnx" provider) embeds
+like the PyTorch sentence-transformers model it was exported from, in float32
+and with int8 dynamic quantization:
+
+    shape:      same (texts, dimensions) matrix, vectors of norm 1
+    cosine:     cosine similarity of each ONNX vector with its PyTorch one, the
+                minimum must reach --fp32-threshold / --int8-threshold
+    top-1:      share of queries whose nearest document is the same with both
+
+Exits with status 1 when a threshold is missed.
+
+Usage:
+    python scripts/onnx_embeddings_accuracy.py --texts 512
+    python scripts/onnx_embeddings_accuracy.py --synthetic
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+from config.enums import ModelName
+from config.models import MODELS_CONFIG
+from scripts.bench_embedding_pool import SYNTHETIC_DIR, build_synthetic, make_texts
+from utils.onnx_embeddings import OnnxEmbeddings
+
+HUGGINGFACE_CONFIG = MODELS_CONFIG[ModelName.HUGGINGFACE_EMBEDDINGS]["config"]
+
+
+def top1(documents: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    return (queries @ documents.T).argmax(axis=1)
+
+
+def main(args) -> bool:
+    from sentence_transformers import SentenceTransformer
+
+    texts = make_texts(args.texts)
+    # very short and truncated texts too
+    texts += ["ok", "a b", " ".join(["long"] * 1000)]
+    queries = make_texts(args.texts // 4 + 1)[::-1]
+
+    reference = SentenceTransformer(args.model, cache_folder=args.cache_folder, device="cpu")
+    expected = reference.encode(texts, normalize_embeddings=True)
+    expected_top1 = top1(expected, reference.encode(queries, normalize_embeddings=True))
+
+    ok = True
+    for quantize, threshold in ((False, args.fp32_threshold), (True, args.int8_threshold)):
+        embeddings = OnnxEmbeddings(
+            args.model,
+            cache_folder=args.cache_folder,
+            encode_kwargs={"normalize_embeddings": True},
+            onnx_quantize=quantize,
+        )
+        vectors = embeddings.embed_documents_array(texts)
+        cosine = (vectors * expected).sum(axis=1)
+        norms = np.linalg.norm(vectors, axis=1)
+        agreement = float((top1(vectors, embeddings.embed_documents_array(queries)) == expected_top1).mean())
+        passed = vectors.shape == expected.shape and np.allclose(norms, 1, atol=1e-5) and cosine.min() >= threshold
+        ok &= bool(passed)
+        print(
+            f"{'int8' if quantize else 'fp32':<5} {os.path.getsize(embeddings.model_path) / 1e6:>6.1f} MB  "
+            f"shape {vectors.shape}  cosine min {cosine.min():.6f} mean {cosine.mean():.6f}  "
+            f"top-1 agreement {agreement:.3f}  (min cosine {threshold})  {'OK' if passed else 'FAILED'}"
+        )
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=HUGGINGFACE_CONFIG["model_name"], help="model name or path")
+    parser.add_argument("--cache-folder", default=HUGGINGFACE_CONFIG["cache_folder"])
+    parser.add_argument("--synthetic", action="store_true", help=f"build and use a random model in {SYNTHETIC_DIR}")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--fp32-threshold", type=float, default=0.9999)
+    parser.add_argument("--int8-threshold", type=float, default=0.98)
+    args = parser.parse_args()
+    if args.synthetic:
+        args.model = build_synthetic(SYNTHETIC_DIR)
+        args.cache_folder = tempfile.gettempdir()
+    sys.exit(0 if main(args) else 1)
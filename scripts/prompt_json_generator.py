@@ -1,6 +1,8 @@
+import os
 import re
 from langchain_core.prompts import PromptTemplate
 from utils.model_service import convert_prompt
+from config.models import PROMPT_TEMPLATES_DIR
 
 template_string = """
     Index: 
@@ -37,4 +39,6 @@ template = PromptTemplate(
     name="summarize_prompt_template",
 )
 
-template.save("templates/summarize_prompt_template.json")
+# loaded by utils.prompt_templates at startup
+os.makedirs(PROMPT_TEMPLATES_DIR, exist_ok=True)
+template.save(os.path.join(PROMPT_TEMPLATES_DIR, "summarize_prompt_template.json"))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Local stub of the ollama /api/embed endpoint, used by the embedding benchmarks in
+this folder. Like ollama it runs --parallel requests at a time (OLLAMA_NUM_PARALLEL),
+the others wait for a slot, and a request costs --latency plus --per-text for each
+of its inputs. With --failure-rate, that share of the requests is answered with a
+503 (what ollama does once its queue is full). Embeddings are deterministic per
+text and normalized, as ollama returns them.
+
+Usage:
+    python scripts/stub_ollama_server.py --port 11434 --parallel 4 --per-text 0.002
+"""
+import argparse
+import asyncio
+import random
+import zlib
+from typing import Any
+
+import numpy as np
+import orjson
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+
+def embed(text: str, dimensions: int) -> np.ndarray:
+    vector = np.random.default_rng(zlib.crc32(text.encode())).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def create_app(
+    latency: float = 0.02,
+    per_text: float = 0.002,
+    parallel: int = 4,
+    failure_rate: float = 0.0,
+    dimensions: int = 1024,
+    seed: int = 0,
+) -> FastAPI:
+    app = FastAPI(title="stub-ollama")
+    app.state.requests = 0
+    app.state.failures = 0
+    app.state.texts = 0
+    app.state.max_batch = 0
+    # every distinct client (host, port) pair is one TCP connection opened by a client
+    app.state.connections = set()
+    slots = asyncio.Semaphore(max(1, parallel))
+    failures = random.Random(seed)
+
+    @app.post("/api/embed")
+    async def api_embed(request: Request) -> Any:
+        if request.client:
+            app.state.connections.add((request.client.host, request.client.port))
+        payload = await request.json()
+        texts = payload.get("input", [])
+        texts = [texts] if isinstance(texts, str) else texts
+        app.state.requests += 1
+        if failures.random() < failure_rate:
+            app.state.failures += 1
+            return Response(b'{"error":"server busy, please try again. maximum pending requests exceeded"}', status_code=503)
+        async with slots:
+            await asyncio.sleep(latency + per_text * len(texts))
+        app.state.texts += len(texts)
+        app.state.max_batch = max(app.state.max_batch, len(texts))
+        embeddings = np.vstack([embed(text, dimensions) for text in texts]) if texts else np.empty((0, dimensions))
+        body = {"model": payload.get("model", "stub"), "embeddings": embeddings, "prompt_eval_count": len(texts)}
+        return Response(orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY), media_type="application/json")
+
+    @app.get("/stats")
+    async def stats():
+        return {
+            "requests": app.state.requests,
+            "failures": app.state.failures,
+            "texts": app.state.texts,
+            "maxBatch": app.state.max_batch,
+            "connections": len(app.state.connections),
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds spent per request")
+    parser.add_argument("--per-text", type=float, default=0.002, help="seconds spent per input text")
+    parser.add_argument("--parallel", type=int, default=4, help="requests processed at once")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    parser.add_argument("--dimensions", type=int, default=1024)
+    args = parser.parse_args()
+    app = create_app(args.latency, args.per_text, args.parallel, args.failure_rate, args.dimensions)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
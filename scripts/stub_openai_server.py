@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Local stub of an OpenAI compatible chat completion server, used by the load tests
+and benchmarks in this folder. Every completion sleeps for a fixed latency without
+blocking, so a well behaved client scales with concurrency.
+
+Usage:
+    python scripts/stub_openai_server.py --port 8711 --latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+import uuid
+from typing import Any, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+
+def create_app(latency: float = 0.2, token_delay: float = 0.01) -> FastAPI:
+    app = FastAPI(title="stub-openai")
+    app.state.latency = latency
+    app.state.token_delay = token_delay
+    app.state.completions = 0
+    # every distinct client (host, port) pair is one TCP connection opened by a client
+    app.state.connections = set()
+
+    async def stream_completion(completion_id: str, model: str, answer: str):
+        # latency is the time to the first token, every following token waits token_delay
+        for i, token in enumerate(answer.split(" ")):
+            if i:
+                await asyncio.sleep(app.state.token_delay)
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token if i == 0 else f" {token}"}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        last = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        yield f"data: {json.dumps(last)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    async def chat_completions(request: Request) -> Any:
+        if request.client:
+            app.state.connections.add((request.client.host, request.client.port))
+        payload = await request.json()
+        await asyncio.sleep(app.state.latency)
+        app.state.completions += 1
+
+        prompt = str(payload.get("messages", [{}])[-1].get("content", ""))
+        answer = f"stub answer for: {prompt.strip()[:40]}"
+        if payload.get("stream"):
+            return StreamingResponse(
+                stream_completion(f"chatcmpl-{uuid.uuid4().hex}", payload.get("model", "stub"), answer),
+                media_type="text/event-stream",
+            )
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "stub"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": len(prompt.split()),
+                "completion_tokens": len(answer.split()),
+                "total_tokens": len(prompt.split()) + len(answer.split()),
+            },
+        }
+
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/chat/completions", chat_completions, methods=["POST"])
+
+    @app.get("/stats")
+    async def stats():
+        return {"completions": app.state.completions, "connections": len(app.state.connections)}
+
+    return app
+
+
+class StubServer:
+    """
+    Runs the stub server in a background thread, use it as a context manager.
+    """
+
+    def __init__(self, app: FastAPI, host: str = "127.0.0.1", port: int = 8711):
+        self.app = app
+        self.host = host
+        self.port = port
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def __enter__(self) -> "StubServer":
+        config = uvicorn.Config(self.app, host=self.host, port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._server:
+            self._server.should_exit = True
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8711)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds spent per completion")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds between streamed tokens")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.token_delay), host=args.host, port=args.port, log_level="warning")
@@ -1,32 +1,20 @@
 import logging
 import random
-from typing import cast
-from langchain_openai import ChatOpenAI
-from utils.model_service import init_openAIChat
+from typing import TYPE_CHECKING, AsyncIterator
+from utils.model_service import bind_openAIChat
+from utils.concurrency import model_call_slot
 from config.enums import ModelName
 
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+
 logger = logging.getLogger(__name__)
 
 class DemoModel:
 
     @staticmethod
-    def chat(question: str):
-        logger.info(f"DemoModel.chat method called with question: {question}")
-
-        seed = random.randint(0, 999999)
-        logger.debug(f"Using seed for ChatOpenAI: {seed}")
-        
-        try:
-            # Directly initialize the model, which returns a container
-            model_container = init_openAIChat(seed=seed)
-            if not model_container.model:
-                raise RuntimeError("Failed to get model from ModelService")
-
-            # The actual model instance is in the .model attribute
-            model = cast(ChatOpenAI, model_container.model)
-
-            response = model.invoke(
-                f"""
+    def _build_prompt(question: str) -> str:
+        return f"""
                     Question:
                     - {question}
                     settings (must follow!):
@@ -37,9 +25,66 @@ class DemoModel:
                     - markdown code should have language information like ```<language> content... ``` (I.E. ```json {{}}```)
                     - it should be consistent int one human language
                 """
-            )
+
+    @staticmethod
+    def _get_model(seed: int) -> "Runnable":
+        # The seed is sent with the request, the pooled singleton client is reused
+        return bind_openAIChat(seed=seed)
+
+    @staticmethod
+    def chat(question: str):
+        logger.info(f"DemoModel.chat method called with question: {question}")
+
+        seed = random.randint(0, 999999)
+        logger.debug(f"Using seed for ChatOpenAI: {seed}")
+
+        try:
+            model = DemoModel._get_model(seed)
+            response = model.invoke(DemoModel._build_prompt(question))
             logger.info("Successfully received response from ChatOpenAI.")
             return response.content
         except Exception as e:
             logger.error(f"Error during ChatOpenAI invocation: {e}", exc_info=True)
             raise
+
+    @staticmethod
+    async def achat(question: str):
+        """
+        Async variant of chat, awaits the completion without blocking the event loop.
+        Calls are limited per model by utils.concurrency.model_call_slot.
+        """
+        logger.info(f"DemoModel.achat method called with question: {question}")
+
+        seed = random.randint(0, 999999)
+        logger.debug(f"Using seed for ChatOpenAI: {seed}")
+
+        try:
+            model = DemoModel._get_model(seed)
+            async with model_call_slot(ModelName.OPENAI_CHAT):
+                response = await model.ainvoke(DemoModel._build_prompt(question))
+            logger.info("Successfully received response from ChatOpenAI.")
+            return response.content
+        except Exception as e:
+            logger.error(f"Error during ChatOpenAI invocation: {e}", exc_info=True)
+            raise
+
+    @staticmethod
+    async def astream_chat(question: str) -> AsyncIterator[str]:
+        """
+        Streaming variant of achat, yields the answer chunk by chunk as the model
+        emits it. The call slot is held until the stream ends.
+        """
+        logger.info(f"DemoModel.astream_chat method called with question: {question}")
+
+        seed = random.randint(0, 999999)
+        logger.debug(f"Using seed for ChatOpenAI: {seed}")
+
+        try:
+            model = DemoModel._get_model(seed)
+            async with model_call_slot(ModelName.OPENAI_CHAT):
+                async for chunk in model.astream(DemoModel._build_prompt(question)):
+                    yield chunk.content if isinstance(chunk.content, str) else str(chunk.content)
+            logger.info("Successfully streamed response from ChatOpenAI.")
+        except Exception as e:
+            logger.error(f"Error during ChatOpenAI streaming: {e}", exc_info=True)
+            raise
@@ -1,8 +1,11 @@
 import logging
 from config.enums import ModelName
-from utils.model_service import init_ollamaEmbeddings, init_huggingFaceEmbeddings
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from utils.model_service import model_registry
+from utils.embedding_cache import CachedEmbeddings, embedding_cache
+from utils.vector_index import vector_index_store, top_k
+from utils.batching import EmbeddingBatcher
+from config.models import EMBEDDING_BATCH_MAX_SIZE, EMBEDDING_BATCH_MAX_WAIT_MS
+from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -30,23 +33,40 @@ class DemoEmbeddingsService:
 
     def __init__(self):
         logger.info("Initializing DemoEmbeddingsService")
-        ollama_container = init_ollamaEmbeddings()
-        huggingface_container = init_huggingFaceEmbeddings()
+        # the models are loaded on first use (or by the startup warm-up), a request
+        # that needs none of them never pays for the imports and the model files.
+        # They are fetched from the registry on every call and not held here, so
+        # an instance it evicts is freed once the calls using it returned
+        # concurrent single-text requests are embedded together
+        self.ollama_batcher = EmbeddingBatcher(
+            lambda texts: self.ollama_embeddings.embed_documents_array(texts),
+            max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS,
+            name=ModelName.OLLAMA_EMBEDDINGS.value,
+        )
 
-        self.ollama_embeddings = ollama_container.model
-        self.huggingface_embeddings = huggingface_container.model
+    @staticmethod
+    def _cached(model_name: ModelName) -> CachedEmbeddings:
+        container = model_registry.get(model_name)
+        if not container.model:
+            raise RuntimeError(f"Failed to load {model_name.value}")
+        # every text is embedded once per model and settings, see utils.embedding_cache
+        return CachedEmbeddings(container.model, model_name=model_name.value, config=container.config)
 
-        if not self.ollama_embeddings:
-            raise RuntimeError(f"Failed to load ollama model: {ModelName.OLLAMA_EMBEDDINGS.value}")
-        if not self.huggingface_embeddings:
-            raise RuntimeError(f"Failed to load huggingface model: {ModelName.HUGGINGFACE_EMBEDDINGS.value}")
+    @property
+    def ollama_embeddings(self) -> CachedEmbeddings:
+        return self._cached(ModelName.OLLAMA_EMBEDDINGS)
+
+    @property
+    def huggingface_embeddings(self) -> CachedEmbeddings:
+        return self._cached(ModelName.HUGGINGFACE_EMBEDDINGS)
 
 
     def convertToEmbeddings(self, text: str):
         logger.info(f"convertToEmbeddings method called with text: {text[:50]}...") # Log first 50 chars
         try:
             # Test the embeddings
-            query_result = self.ollama_embeddings.embed_query(text)  # type: ignore[reportGeneralTypeIssues]
+            query_result = self.ollama_embeddings.embed_query_array(text)
             logger.debug(f"Embedding dimension: {len(query_result)}")
             logger.info("convertToEmbeddings completed successfully.")
             return query_result
@@ -54,38 +74,115 @@ class DemoEmbeddingsService:
             logger.error(f"Error in convertToEmbeddings: {e}", exc_info=True)
             raise
 
+    async def aconvertToEmbeddings(self, text: str):
+        """
+        Async variant of convertToEmbeddings, the text is embedded with other
+        concurrent requests in one embed_documents call (ollama embeds a query
+        exactly like a document).
+        """
+        logger.info(f"aconvertToEmbeddings method called with text: {text[:50]}...") # Log first 50 chars
+        try:
+            query_result = await self.ollama_batcher.embed(text)
+            logger.debug(f"Embedding dimension: {len(query_result)}")
+            logger.info("aconvertToEmbeddings completed successfully.")
+            return query_result
+        except Exception as e:
+            logger.error(f"Error in aconvertToEmbeddings: {e}", exc_info=True)
+            raise
+
     def getEmbeddingsFromDocuments(self, documents: list[str] = documents):
         logger.info(f"getEmbeddingsFromDocuments method called with {len(documents)} documents.")
         try:
             # For multiple documents
-            doc_embeddings = self.ollama_embeddings.embed_documents(documents)  # type: ignore[reportGeneralTypeIssues]
+            doc_embeddings = self.ollama_embeddings.embed_documents_array(documents)
             logger.info("getEmbeddingsFromDocuments completed successfully.")
             return doc_embeddings
         except Exception as e:
             logger.error(f"Error in getEmbeddingsFromDocuments: {e}", exc_info=True)
             raise
 
-    def embeddingsSearch(self, query: str = string, documents: list[str] = documents):
+    def embeddingsSearch(self, query: str = string, documents: list[str] = documents, k: int = 3):
         logger.info(f"embeddingsSearch method called with query (first 50 chars): '{query[:50]}' and {len(documents)} documents.")
         try:
             # Test the embeddings
-            fact_embedding = self.huggingface_embeddings.embed_documents(documents)  # type: ignore[reportGeneralTypeIssues]
-            question_embedding = self.huggingface_embeddings.embed_query(query)  # type: ignore[reportGeneralTypeIssues]
+            fact_embedding = self.huggingface_embeddings.embed_documents_array(documents)
+            question_embedding = self.huggingface_embeddings.embed_query_array(query)
             logger.debug(f"Fact embedding length: {len(fact_embedding)}, Question embedding length: {len(question_embedding)}")
 
-            result = cosine_similarity(np.array([question_embedding]), np.array(fact_embedding))
+            # embeddings are normalized, so the dot product is the cosine similarity
+            result = fact_embedding @ question_embedding
             logger.debug(f"Cosine similarity calculation completed. Result shape: {result.shape}")
 
-            sorted_list = [
-                f"{x:.4f} ({documents[i]})"
-                for rank, (i, x) in enumerate(
-                    sorted(enumerate(result.tolist()[0]), key=lambda y: y[1], reverse=True)[
-                        :3
-                    ]
-                )
-            ]
+            sorted_list = [f"{result[i]:.4f} ({documents[i]})" for i in top_k(result, k)]
             logger.info("embeddingsSearch completed successfully.")
             return sorted_list
         except Exception as e:
             logger.error(f"Error in embeddingsSearch: {e}", exc_info=True)
             raise
+
+    def ingestDocuments(self, collection: str, documents: List[str], ids: Optional[List[str]] = None) -> List[str]:
+        logger.info(f"ingestDocuments method called for collection '{collection}' with {len(documents)} documents.")
+        try:
+            vectors = self.huggingface_embeddings.embed_documents_array(documents)
+            index = vector_index_store.get_or_create(collection, dimensions=vectors.shape[1])
+            added = index.add(documents, vectors, ids)
+            logger.info(f"ingestDocuments completed successfully, collection '{collection}' holds {len(index)} documents.")
+            return added
+        except Exception as e:
+            logger.error(f"Error in ingestDocuments: {e}", exc_info=True)
+            raise
+
+    def deleteDocuments(self, collection: str, ids: List[str]) -> int:
+        logger.info(f"deleteDocuments method called for collection '{collection}' with {len(ids)} ids.")
+        return vector_index_store.get(collection).delete(ids)
+
+    def dropCollection(self, collection: str) -> bool:
+        logger.info(f"dropCollection method called for collection '{collection}'.")
+        return vector_index_store.drop(collection)
+
+    def listCollections(self):
+        collections = []
+        for name in vector_index_store.names():
+            index = vector_index_store.get(name)
+            collections.append({
+                "name": name,
+                "documents": len(index),
+                "index": index.ann.describe() if index.ann is not None else {"type": "exact"},
+            })
+        return collections
+
+    def buildCollectionIndex(self, collection: str, nlist: Optional[int] = None, nprobe: Optional[int] = None):
+        logger.info(f"buildCollectionIndex method called for collection '{collection}' (nlist={nlist}, nprobe={nprobe}).")
+        return vector_index_store.get(collection).build_index(nlist=nlist, nprobe=nprobe)
+
+    def dropCollectionIndex(self, collection: str) -> bool:
+        logger.info(f"dropCollectionIndex method called for collection '{collection}'.")
+        return vector_index_store.get(collection).drop_index()
+
+    def hasCollection(self, collection: str) -> bool:
+        return vector_index_store.exists(collection)
+
+    def collectionSearch(
+        self,
+        collection: str,
+        query: str,
+        k: int = 3,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+    ):
+        logger.info(f"collectionSearch method called for collection '{collection}' with query (first 50 chars): '{query[:50]}'.")
+        try:
+            index = vector_index_store.get(collection)
+            question_embedding = self.huggingface_embeddings.embed_query_array(query)
+            results = index.search(question_embedding, k, nprobe=nprobe, exact=exact)
+            logger.info("collectionSearch completed successfully.")
+            return [{"id": doc_id, "document": text, "score": score} for doc_id, text, score in results]
+        except Exception as e:
+            logger.error(f"Error in collectionSearch: {e}", exc_info=True)
+            raise
+
+    def cacheStats(self):
+        return embedding_cache.stats()
+
+    def batchingStats(self):
+        return self.ollama_batcher.stats()
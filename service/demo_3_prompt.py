@@ -1,15 +1,73 @@
+import asyncio
 import logging
+import time
 from enum import Enum
-from langchain_core.prompts import PromptTemplate
-from utils.model_service import init_openAIChat
+from utils.model_service import model_registry
+from utils.concurrency import model_call_slot
+from utils.embedding_cache import CachedEmbeddings
+from utils.response_cache import ResponseCache, response_cache
+from utils.prompt_templates import prompt_templates
+from utils.chunking import chunk_by_tokens
 from config.enums import ModelName
-from langchain_openai import ChatOpenAI
-from typing import cast
+from config.models import (
+    SUMMARIZE_CHUNK_TOKENS,
+    SUMMARIZE_CHUNK_OVERLAP_TOKENS,
+    SUMMARIZE_MAP_MAX_TOKENS,
+    SUMMARIZE_MAP_CONCURRENCY,
+    SUMMARIZE_BATCH_CONCURRENCY,
+    RESPONSE_CACHE_EMBEDDER_RETRY_SECONDS,
+)
+import numpy as np
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union, cast
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
 
 
 logger = logging.getLogger(__name__)
 
 
+# looked up on every request, built once instead of inside the enum properties
+_LENGTH_DESCRIPTIONS = {
+    "SHORT": "SHORT (1 paragraph, 3-4 sentences, approx. 100 words)",
+    "MEDIUM": "MEDIUM (2-3 paragraphs, 8-10 sentences, approx. 100-300 words)",
+    "LONG": "LONG (6-7 paragraphs, 15-20 sentences, approx. 300-500 words)",
+}
+_LENGTH_MAX_TOKENS = {
+    "SHORT": 256,
+    "MEDIUM": 1024,
+    "LONG": 4112,
+}
+_FORMAT_DESCRIPTIONS = {
+    "PLAIN_TEXT": "plain text",
+    "MARKDOWN": "markdown",
+    "JSON": "json",
+    "CODE": "{relevant programming language}",
+}
+_FORMAT_RULES = {
+    "PLAIN_TEXT": """
+                - Provide the summary in plain text format without any special formatting.
+            """,
+    "MARKDOWN": """
+                - Format the summary using Markdown syntax, including headings, lists, and emphasis where appropriate.
+                - Use bold (`**bold**`) and italic (`*italic*`) formatting for emphasis.
+                - Use numbered lists for sequential steps or items, Use unordered lists for non-sequential items or bullet points.
+                - Use horizontal lines (---) to separate sections.
+            """,
+    "JSON": """
+                - Structure the summary as a valid JSON object.
+                - Use key-value pairs to represent different sections or points of the summary.
+                - Ensure proper nesting of objects and arrays where necessary.
+            """,
+    "CODE": """
+                - Include code snippets within triple backticks (```) if applicable.
+                - Specify the relevant programming language after the opening triple backticks (I.E. ```python).
+                - Ensure the code is properly indented and formatted.
+                - Avoid using excessive indentation or tabs for code blocks.
+            """,
+}
+
+
 class ResponseLengthOptions(Enum):
     SHORT = "SHORT"
     MEDIUM = "MEDIUM"
@@ -17,23 +75,13 @@ class ResponseLengthOptions(Enum):
 
     @property
     def description(self):
-        descriptions = {
-            "SHORT": "SHORT (1 paragraph, 3-4 sentences, approx. 100 words)",
-            "MEDIUM": "MEDIUM (2-3 paragraphs, 8-10 sentences, approx. 100-300 words)",
-            "LONG": "LONG (6-7 paragraphs, 15-20 sentences, approx. 300-500 words)",
-        }
-        return descriptions.get(
+        return _LENGTH_DESCRIPTIONS.get(
             self.value, "MEDIUM (2-3 paragraphs, 8-10 sentences, approx. 100-300 words)"
         )
 
     @property
     def max_tokens(self):
-        max_tokens_map = {
-            "SHORT": 256,
-            "MEDIUM": 1024,
-            "LONG": 4112,
-        }
-        return max_tokens_map.get(self.value, 300)
+        return _LENGTH_MAX_TOKENS.get(self.value, 300)
 
 
 class ResponseFormatOptions(Enum):
@@ -44,54 +92,15 @@ class ResponseFormatOptions(Enum):
 
     @property
     def description(self):
-        descriptions = {
-            "PLAIN_TEXT": "plain text",
-            "MARKDOWN": "markdown",
-            "JSON": "json",
-            "CODE": "{relevant programming language}",
-        }
-        return descriptions.get(self.value, "plain text")
+        return _FORMAT_DESCRIPTIONS.get(self.value, "plain text")
 
     @property
     def rules(self):
-        descriptions = {
-            "PLAIN_TEXT": """
-                - Provide the summary in plain text format without any special formatting.
-            """,
-            "MARKDOWN": """
-                - Format the summary using Markdown syntax, including headings, lists, and emphasis where appropriate.
-                - Use bold (`**bold**`) and italic (`*italic*`) formatting for emphasis.
-                - Use numbered lists for sequential steps or items, Use unordered lists for non-sequential items or bullet points.
-                - Use horizontal lines (---) to separate sections.
-            """,
-            "JSON": """
-                - Structure the summary as a valid JSON object.
-                - Use key-value pairs to represent different sections or points of the summary.
-                - Ensure proper nesting of objects and arrays where necessary.
-            """,
-            "CODE": """
-                - Include code snippets within triple backticks (```) if applicable.
-                - Specify the relevant programming language after the opening triple backticks (I.E. ```python).
-                - Ensure the code is properly indented and formatted.
-                - Avoid using excessive indentation or tabs for code blocks.
-            """,
-        }
-        return descriptions.get(self.value, "plain text")
+        return _FORMAT_RULES.get(self.value, "plain text")
 
 
-class DemoPromptService:
-
-    def __init__(self):
-        logger.info("DemoPromptService initialized.")
-        model_container = init_openAIChat()
-        model = model_container.model
-        if not model:
-            raise RuntimeError("Failed to get model from ModelService")
-
-        self.model_instance = cast(ChatOpenAI, model)
-        self.template = PromptTemplate(
-            input_variables=["content", "max_length", "response_format", "rules"],
-            template="""
+SUMMARIZE_TEMPLATE = "summarize"
+SUMMARIZE_PROMPT = """
                 Index: 
                     1. description
                     2. rules
@@ -113,32 +122,134 @@ class DemoPromptService:
                 ---
                 4. Content:
                 {content}
-            """.replace(
-                "[ \n\t\r]", " "
-            ).strip(),
-            validate_template=True,
-        )
+            """.strip()
 
-    def getSummarizePrompt(
+# map stage of long documents, the partial summaries are then summarized with SUMMARIZE_PROMPT
+SUMMARIZE_CHUNK_TEMPLATE = "summarize_chunk"
+SUMMARIZE_CHUNK_PROMPT = """
+                Summarize part {part} of {parts} of a longer document as plain text notes.
+                - Keep every main point, name, figure and date of this part.
+                - Do not add any commentary, opinions, or extra information.
+                - NEVER USE OTHER THEN ENGLISH LANGUAGE.
+                ---
+                {content}
+            """.strip()
+
+
+class DemoPromptService:
+
+    def __init__(self, cache: ResponseCache = response_cache):
+        logger.info("DemoPromptService initialized.")
+        self.response_cache = cache
+        # the embeddings model is loaded on the first semantic cache lookup, a failed
+        # load is retried after a while
+        self._embedder_retry_at = 0.0
+        # compiled once, the static part is rendered once per length and format
+        self.templates = prompt_templates
+        self.templates.register(SUMMARIZE_TEMPLATE, SUMMARIZE_PROMPT)
+        self.templates.register(SUMMARIZE_CHUNK_TEMPLATE, SUMMARIZE_CHUNK_PROMPT)
+
+    @property
+    def model_instance(self) -> "ChatOpenAI":
+        # the chat model (and langchain_openai) is loaded on first use, or by the startup warm-up
+        model = model_registry.get(ModelName.OPENAI_CHAT).model
+        if not model:
+            raise RuntimeError("Failed to get model from ModelService")
+        return cast("ChatOpenAI", model)
+
+    def _render_prompt(
         self,
         max_length: ResponseLengthOptions,
         response_format: ResponseFormatOptions,
         content: str,
     ) -> str:
-        logger.info(
-            f"Generating summarize prompt. max_length: {max_length.value}, response_format: {response_format.value}, content: {content}"
-        )
-        prompt = self.template.invoke(
+        prompt = self.templates.render(
+            SUMMARIZE_TEMPLATE,
             {
-                "content": content,
                 "max_length": max_length.description,
                 "response_format": response_format.description,
                 "rules": response_format.rules,
-            }
+            },
+            content=content,
         )
         logger.debug(f"Generated prompt: {prompt}")
+        return prompt
 
-        response = self.model_instance.invoke(prompt, max_tokens=max_length.max_tokens)
+    def _content_embedder(self) -> Optional[CachedEmbeddings]:
+        # fetched on every lookup and not held, the registry may evict the model when idle
+        if time.monotonic() < self._embedder_retry_at:
+            return None
+        try:
+            container = model_registry.get(ModelName.HUGGINGFACE_EMBEDDINGS)
+            if not container.model:
+                raise RuntimeError(f"Failed to load huggingface model: {ModelName.HUGGINGFACE_EMBEDDINGS.value}")
+        except Exception as e:
+            # loading may take a while to fail (i.e. hub retries offline), not paid on every cache miss
+            self._embedder_retry_at = time.monotonic() + RESPONSE_CACHE_EMBEDDER_RETRY_SECONDS
+            logger.warning(
+                f"Semantic cache disabled for {RESPONSE_CACHE_EMBEDDER_RETRY_SECONDS:.0f}s, "
+                f"could not load the embeddings model: {e}"
+            )
+            return None
+        return CachedEmbeddings(
+            container.model,
+            model_name=ModelName.HUGGINGFACE_EMBEDDINGS.value,
+            config=container.config,
+        )
+
+    @staticmethod
+    def _fits_embedder(embeddings: Any, content: str) -> bool:
+        """
+        Tells whether the embeddings model reads the whole content, sentence-transformers
+        models truncate it past their max_seq_length. Models of unknown length don't.
+        """
+        content = content.replace("\n", " ")
+        tokenizer = getattr(embeddings, "tokenizer", None)
+        if tokenizer is not None and hasattr(tokenizer, "encode_batch"):
+            # the truncating Rust tokenizer of OnnxEmbeddings keeps the rest apart
+            return not tokenizer.encode(content).overflowing
+        model = getattr(embeddings, "_client", None) or getattr(getattr(embeddings, "pool", None), "_model", None)
+        if getattr(model, "tokenizer", None) is None or not getattr(model, "max_seq_length", None):
+            return False
+        input_ids = model.tokenizer(content, truncation=False, verbose=False)["input_ids"]
+        return len(input_ids) <= model.max_seq_length
+
+    def _cache_keys(self, max_length: ResponseLengthOptions, response_format: ResponseFormatOptions, prompt: str) -> Tuple[str, str]:
+        model_name = self.model_instance.model_name
+        namespace = f"{model_name}|{max_length.max_tokens}|{max_length.value}|{response_format.value}"
+        return namespace, self.response_cache.make_key(model_name, max_length.max_tokens, prompt)
+
+    def _similar_summary(self, namespace: str, content: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Looks a summary of similar content up in the semantic tier of the response
+        cache, the exact tier missed.
+
+        Returns:
+            The cached summary or None, and the content embedding to store the
+            summary with (None when the semantic tier is off).
+        """
+        if not self.response_cache.semantic:
+            return None, None
+        embeddings = self._content_embedder()
+        if embeddings is None:
+            return None, None
+        try:
+            if not self._fits_embedder(embeddings.embeddings, content):
+                # a truncated embedding would match any content starting the same way
+                logger.debug("Semantic cache lookup skipped, the content exceeds the embeddings model length")
+                return None, None
+            vector = embeddings.embed_query_array(content)
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup skipped, could not embed the content: {e}")
+            return None, None
+        similar = self.response_cache.get_similar(namespace, vector)
+        if similar is None:
+            return None, vector
+        logger.debug(f"Semantic cache hit, similarity {similar[1]:.4f}")
+        return similar[0], vector
+
+    @staticmethod
+    def _response_text(response) -> str:
         logger.debug(f"Received response: {response}")
 
         if isinstance(response.content, str):
@@ -146,6 +257,36 @@ class DemoPromptService:
 
         return str(response.content)
 
+    def getSummarizePrompt(
+        self,
+        max_length: ResponseLengthOptions,
+        response_format: ResponseFormatOptions,
+        content: str,
+        use_cache: bool = True,
+    ) -> str:
+        logger.info(
+            f"Generating summarize prompt. max_length: {max_length.value}, response_format: {response_format.value}, content: {content}"
+        )
+        prompt = self._render_prompt(max_length, response_format, content)
+        use_cache = use_cache and self.response_cache.enabled
+        if not use_cache:
+            self.response_cache.bypass()
+        else:
+            namespace, key = self._cache_keys(max_length, response_format, prompt)
+            summary = self.response_cache.get(key)
+            if summary is not None:
+                return summary
+            summary, vector = self._similar_summary(namespace, content)
+            if summary is not None:
+                return summary
+            self.response_cache.miss()
+
+        response = self.model_instance.invoke(prompt, max_tokens=max_length.max_tokens)
+        summary = self._response_text(response)
+        if use_cache and summary:
+            self.response_cache.put(namespace, key, summary, vector)
+        return summary
+
     def getSummarizePromptV2(
         self,
         max_length: ResponseLengthOptions,
@@ -155,20 +296,223 @@ class DemoPromptService:
         logger.info(
             f"Generating summarize prompt v2. max_length: {max_length.value}, response_format: {response_format.value}, content: {content}"
         )
-        prompt = self.template.invoke(
-            {
-                "content": content,
-                "max_length": max_length.description,
-                "response_format": response_format.description,
-                "rules": response_format.rules,
-            }
+        prompt = self._render_prompt(max_length, response_format, content)
+        response = self.model_instance.invoke(prompt, max_tokens=max_length.max_tokens)
+        return self._response_text(response)
+
+    async def agetSummarizePrompt(
+        self,
+        max_length: ResponseLengthOptions,
+        response_format: ResponseFormatOptions,
+        content: str,
+        use_cache: bool = True,
+    ) -> str:
+        """
+        Async variant of getSummarizePrompt, the completion is awaited with ainvoke
+        inside a call slot of the chat model.
+        """
+        summary, _ = await self.agetCachedSummarizePrompt(max_length, response_format, content, use_cache)
+        return summary
+
+    async def agetCachedSummarizePrompt(
+        self,
+        max_length: ResponseLengthOptions,
+        response_format: ResponseFormatOptions,
+        content: str,
+        use_cache: bool = True,
+        semantic: bool = True,
+    ) -> Tuple[str, str]:
+        """
+        agetSummarizePrompt that also tells where the summary came from.
+
+        Args:
+            semantic: Whether a summary of similar content may answer, only the
+                      exact tier is looked up otherwise.
+
+        Returns:
+            The summary and its cache status: "exact" or "semantic" for a cached
+            summary, "miss" when it was generated, "bypass" when use_cache is off.
+        """
+        logger.info(
+            f"Generating summarize prompt (async). max_length: {max_length.value}, response_format: {response_format.value}, content: {content}"
         )
-        logger.debug(f"Generated prompt: {prompt}")
+        prompt = self._render_prompt(max_length, response_format, content)
+        use_cache = use_cache and self.response_cache.enabled
+        status, vector = "bypass", None
+        if not use_cache:
+            self.response_cache.bypass()
+        else:
+            namespace, key = self._cache_keys(max_length, response_format, prompt)
+            summary = self.response_cache.get(key)
+            if summary is not None:
+                return summary, "exact"
+            if semantic:
+                # embedding the content is CPU bound, kept off the event loop
+                summary, vector = await asyncio.to_thread(self._similar_summary, namespace, content)
+                if summary is not None:
+                    return summary, "semantic"
+            self.response_cache.miss()
+            status = "miss"
 
-        response = self.model_instance.invoke(prompt, max_tokens=max_length.max_tokens)
-        logger.debug(f"Received response: {response}")
+        async with model_call_slot(ModelName.OPENAI_CHAT):
+            response = await self.model_instance.ainvoke(prompt, max_tokens=max_length.max_tokens)
+        summary = self._response_text(response)
+        if use_cache and summary:
+            self.response_cache.put(namespace, key, summary, vector)
+        return summary, status
 
-        if isinstance(response.content, str):
-            return response.content
+    async def agetSummarizePromptV2(
+        self,
+        max_length: ResponseLengthOptions,
+        response_format: ResponseFormatOptions,
+        content: str,
+    ) -> str:
+        """
+        Async variant of getSummarizePromptV2.
+        """
+        logger.info(
+            f"Generating summarize prompt v2 (async). max_length: {max_length.value}, response_format: {response_format.value}, content: {content}"
+        )
+        prompt = self._render_prompt(max_length, response_format, content)
+        async with model_call_slot(ModelName.OPENAI_CHAT):
+            response = await self.model_instance.ainvoke(prompt, max_tokens=max_length.max_tokens)
+        return self._response_text(response)
 
-        return str(response.content)
+    async def _amapSummaries(self, chunks: List[str], map_concurrency: int, max_tokens: int) -> List[str]:
+        # at most map_concurrency chunks of the document in flight, within the call slots of the model
+        semaphore = asyncio.Semaphore(max(1, map_concurrency))
+
+        async def summarize(part: int, chunk: str) -> str:
+            prompt = self.templates.render(SUMMARIZE_CHUNK_TEMPLATE, {"parts": len(chunks)}, part=part, content=chunk)
+            async with semaphore:
+                async with model_call_slot(ModelName.OPENAI_CHAT):
+                    response = await self.model_instance.ainvoke(prompt, max_tokens=max_tokens)
+            return self._response_text(response)
+
+        return await asyncio.gather(*(summarize(part, chunk) for part, chunk in enumerate(chunks, 1)))
+
+    async def agetSummarizeDocument(
+        self,
+        max_length: ResponseLengthOptions,
+        response_format: ResponseFormatOptions,
+        content: str,
+        map_concurrency: int = SUMMARIZE_MAP_CONCURRENCY,
+        chunk_tokens: int = SUMMARIZE_CHUNK_TOKENS,
+        use_cache: bool = True,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Summarizes content of any length with a map-reduce over token-bounded chunks.
+
+        The chunks are summarized concurrently (map), the partial summaries are
+        joined and, while they still exceed a chunk, chunked and summarized again.
+        The last pass is a regular summarize call, with the requested length,
+        format and max_tokens, answered from the exact tier of the response cache
+        only. Content that fits in a chunk goes straight to it.
+
+        Returns:
+            The summary and the stats of the run: chunks, mapCalls and mapPasses.
+        """
+        logger.info(
+            f"Generating document summary. max_length: {max_length.value}, response_format: {response_format.value}, "
+            f"content: {len(content)} chars, map_concurrency: {map_concurrency}"
+        )
+        # a partial summary is at most half a chunk, so every pass halves the document at least
+        map_max_tokens = max(1, min(SUMMARIZE_MAP_MAX_TOKENS, chunk_tokens // 2))
+        overlap_tokens = min(SUMMARIZE_CHUNK_OVERLAP_TOKENS, chunk_tokens // 4)
+        # tokenizing a long document is CPU bound, kept off the event loop
+        chunks = await asyncio.to_thread(chunk_by_tokens, content, chunk_tokens, overlap_tokens)
+        stats = {"chunks": len(chunks), "mapCalls": 0, "mapPasses": 0}
+
+        while len(chunks) > 1:
+            partials = await self._amapSummaries(chunks, map_concurrency, map_max_tokens)
+            stats["mapCalls"] += len(chunks)
+            stats["mapPasses"] += 1
+            content = "\n\n".join(partials)
+            collapsed = await asyncio.to_thread(chunk_by_tokens, content, chunk_tokens)
+            if len(collapsed) >= len(chunks):
+                logger.warning(f"Partial summaries did not shrink ({len(chunks)} -> {len(collapsed)} chunks), reducing as is")
+                break
+            chunks = collapsed
+
+        # partial summaries of different documents read alike, only the exact tier may answer
+        summary, _ = await self.agetCachedSummarizePrompt(max_length, response_format, content, use_cache, semantic=False)
+        return summary, stats
+
+    async def abatchSummarizeAsCompleted(
+        self,
+        requests: Sequence[Tuple[ResponseLengthOptions, ResponseFormatOptions, str]],
+        max_concurrency: int = SUMMARIZE_BATCH_CONCURRENCY,
+        use_cache: bool = True,
+    ) -> AsyncIterator[Tuple[int, Union[Tuple[str, str], Exception]]]:
+        """
+        Summarizes many contents concurrently, like Runnable.abatch_as_completed.
+
+        At most `max_concurrency` requests of the batch are in flight, within the call
+        slots of the model. A failed request does not stop the others.
+
+        Args:
+            requests: (max_length, response_format, content) of every request.
+            max_concurrency: Requests of the batch summarized at once.
+            use_cache: Whether the summaries may be served from the response cache.
+
+        Yields:
+            The index of a request and its (summary, cache status), or the exception
+            it raised, as soon as it completes.
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def summarize(index: int, max_length, response_format, content: str):
+            async with semaphore:
+                try:
+                    return index, await self.agetCachedSummarizePrompt(max_length, response_format, content, use_cache)
+                except Exception as e:
+                    logger.warning(f"Summarize request {index} of the batch failed: {e}")
+                    return index, e
+
+        tasks = [asyncio.ensure_future(summarize(index, *request)) for index, request in enumerate(requests)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # the consumer went away (i.e. a client disconnected mid-stream)
+            for task in tasks:
+                task.cancel()
+
+    async def abatchSummarize(
+        self,
+        requests: Sequence[Tuple[ResponseLengthOptions, ResponseFormatOptions, str]],
+        max_concurrency: int = SUMMARIZE_BATCH_CONCURRENCY,
+        use_cache: bool = True,
+    ) -> List[Union[Tuple[str, str], Exception]]:
+        """
+        abatchSummarizeAsCompleted, with the results in the order of the requests,
+        like Runnable.abatch(return_exceptions=True).
+        """
+        results: List[Union[Tuple[str, str], Exception]] = [None] * len(requests)  # type: ignore[list-item]
+        async for index, result in self.abatchSummarizeAsCompleted(requests, max_concurrency, use_cache):
+            results[index] = result
+        return results
+
+    async def astreamSummarizePrompt(
+        self,
+        max_length: ResponseLengthOptions,
+        response_format: ResponseFormatOptions,
+        content: str,
+    ) -> AsyncIterator[str]:
+        """
+        Streaming variant of agetSummarizePrompt, yields the summary chunk by chunk
+        as the model emits it.
+        """
+        logger.info(
+            f"Streaming summarize prompt. max_length: {max_length.value}, response_format: {response_format.value}, content: {content}"
+        )
+        prompt = self._render_prompt(max_length, response_format, content)
+        async with model_call_slot(ModelName.OPENAI_CHAT):
+            async for chunk in self.model_instance.astream(prompt, max_tokens=max_length.max_tokens):
+                yield chunk.content if isinstance(chunk.content, str) else str(chunk.content)
+
+    def cacheStats(self):
+        return self.response_cache.stats()
+
+    def templateStats(self):
+        return self.templates.stats()
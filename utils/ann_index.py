@@ -0,0 +1,223 @@
+import json
+import logging
+import os
+from typing import List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# rows assigned to centroids per matrix product, bounds the temporary score matrix
+_ASSIGN_CHUNK = 16384
+
+
+def default_nlist(rows: int) -> int:
+    """Rule of thumb for the number of inverted lists, about 4 * sqrt(rows)."""
+    return int(min(max(4 * np.sqrt(max(rows, 1)), 16), 65536))
+
+
+class IVFIndex:
+    """
+    Inverted file index over normalized vectors.
+
+    A spherical k-means coarse quantizer splits the vector space into `nlist`
+    cells, every row is stored in the inverted list of its closest centroid. A
+    query only scores the rows of its `nprobe` closest cells, which trades recall
+    for latency. Vectors themselves are not copied, candidates are scored against
+    the matrix of the owning collection.
+
+    On disk an index is `ivf.json`, `ivf_centroids.npy` and `ivf_assignments.i32`,
+    the latter holds one centroid id per collection row and is only appended to.
+    """
+
+    def __init__(self, directory: str, centroids: np.ndarray, nprobe: int = 8):
+        self.directory = directory
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.nprobe = nprobe
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self._lists: List[np.ndarray] = [np.zeros(0, dtype=np.int64) for _ in range(self.nlist)]
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, "ivf.json")
+
+    @property
+    def _centroids_path(self) -> str:
+        return os.path.join(self.directory, "ivf_centroids.npy")
+
+    @property
+    def _assignments_path(self) -> str:
+        return os.path.join(self.directory, "ivf_assignments.i32")
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, "ivf.json"))
+
+    @classmethod
+    def train(
+        cls,
+        directory: str,
+        vectors: np.ndarray,
+        nlist: int,
+        nprobe: int = 8,
+        iterations: int = 15,
+        sample_size: int = 100_000,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """
+        Trains the coarse quantizer with spherical k-means on a sample of vectors.
+
+        Args:
+            directory: Folder the index is persisted to.
+            vectors: Normalized training vectors, usually the collection matrix.
+            nlist: Number of cells.
+            nprobe: Default number of cells scanned per query.
+            iterations: k-means iterations.
+            sample_size: Maximum number of vectors used for training.
+            seed: Random seed.
+
+        Returns:
+            An empty, trained IVFIndex.
+        """
+        rng = np.random.default_rng(seed)
+        rows = vectors.shape[0]
+        if rows == 0:
+            raise ValueError("Cannot train an index without vectors")
+        nlist = max(1, min(nlist, rows))
+        sample_rows = np.sort(rng.choice(rows, size=min(rows, max(sample_size, nlist)), replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+
+        centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+        for iteration in range(iterations):
+            assignments = cls._nearest(sample, centroids)
+            counts = np.bincount(assignments, minlength=nlist)
+            order = np.argsort(assignments, kind="stable")
+            filled = np.flatnonzero(counts)
+            sums = np.zeros_like(centroids)
+            sums[filled] = np.add.reduceat(sample[order], np.concatenate([[0], np.cumsum(counts[filled])[:-1]]))
+
+            empty = np.flatnonzero(counts == 0)
+            if empty.size:
+                # re-seed empty cells with random sample points
+                sums[empty] = sample[rng.choice(sample.shape[0], size=empty.size, replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+            logger.debug(f"k-means iteration {iteration + 1}/{iterations}, {empty.size} empty cells")
+
+        return cls(directory, centroids, nprobe)
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        assignments = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], _ASSIGN_CHUNK):
+            chunk = np.asarray(vectors[start:start + _ASSIGN_CHUNK], dtype=np.float32)
+            assignments[start:start + chunk.shape[0]] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignments
+
+    def _rebuild_lists(self) -> None:
+        order = np.argsort(self.assignments, kind="stable")
+        bounds = np.searchsorted(self.assignments[order], np.arange(self.nlist + 1))
+        self._lists = [order[bounds[i]:bounds[i + 1]].astype(np.int64) for i in range(self.nlist)]
+
+    def add(self, start_row: int, vectors: np.ndarray) -> None:
+        """
+        Assigns consecutive collection rows to their cells.
+
+        Args:
+            start_row: Row of the first vector in the collection matrix.
+            vectors: Normalized vectors of rows start_row, start_row + 1, ...
+        """
+        if start_row != self.assignments.shape[0]:
+            raise ValueError(f"Expected rows to be added from {self.assignments.shape[0]}, got {start_row}")
+        assignments = self._nearest(vectors, self.centroids)
+        self.assignments = np.concatenate([self.assignments, assignments])
+
+        rows = np.arange(start_row, start_row + assignments.shape[0], dtype=np.int64)
+        order = np.argsort(assignments, kind="stable")
+        cells, starts = np.unique(assignments[order], return_index=True)
+        ends = np.append(starts[1:], order.shape[0])
+        for cell, begin, end in zip(cells, starts, ends):
+            self._lists[cell] = np.concatenate([self._lists[cell], rows[order[begin:end]]])
+
+        if os.path.exists(self._assignments_path):
+            with open(self._assignments_path, "ab") as f:
+                f.write(assignments.astype("<i4").tobytes())
+
+    def reset(self, vectors: np.ndarray) -> None:
+        """Reassigns all rows, used after the collection is compacted."""
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self._lists = [np.zeros(0, dtype=np.int64) for _ in range(self.nlist)]
+        if os.path.exists(self._assignments_path):
+            os.remove(self._assignments_path)
+        if vectors.shape[0]:
+            self.add(0, vectors)
+        self.save()
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """
+        Returns the rows stored in the cells closest to the query.
+
+        Args:
+            query: Normalized query vector.
+            nprobe: Number of cells to scan, defaults to the index setting.
+
+        Returns:
+            Array of collection rows.
+        """
+        nprobe = max(1, min(nprobe or self.nprobe, self.nlist))
+        cells = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self._lists[cell] for cell in cells])
+
+    def save(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        np.save(self._centroids_path, self.centroids)
+        tmp_path = f"{self._assignments_path}.tmp"
+        self.assignments.astype("<i4").tofile(tmp_path)
+        os.replace(tmp_path, self._assignments_path)
+        with open(self._meta_path, "w") as f:
+            json.dump({"type": "ivf", "nlist": self.nlist, "nprobe": self.nprobe}, f)
+
+    @classmethod
+    def load(cls, directory: str, rows: Optional[int] = None) -> "IVFIndex":
+        """
+        Loads an index.
+
+        Args:
+            directory: Folder of the index.
+            rows: Rows of the owning collection, when given the assignments must
+                  cover exactly these rows. Without it only the centroids are loaded.
+
+        Raises:
+            ValueError: If the assignments do not match `rows`.
+        """
+        with open(os.path.join(directory, "ivf.json")) as f:
+            meta = json.load(f)
+        index = cls(directory, np.load(os.path.join(directory, "ivf_centroids.npy")), meta.get("nprobe", 8))
+        if rows is None:
+            return index
+        assignments = np.fromfile(index._assignments_path, dtype="<i4") if os.path.exists(index._assignments_path) else np.zeros(0, dtype=np.int32)
+        if assignments.shape[0] != rows:
+            raise ValueError(f"IVF index holds {assignments.shape[0]} rows, collection holds {rows}")
+        index.assignments = assignments.astype(np.int32)
+        index._rebuild_lists()
+        return index
+
+    @staticmethod
+    def remove(directory: str) -> None:
+        for name in ("ivf.json", "ivf_centroids.npy", "ivf_assignments.i32"):
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def describe(self) -> dict:
+        sizes = np.array([cell.shape[0] for cell in self._lists])
+        return {
+            "type": "ivf",
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "rows": int(self.assignments.shape[0]),
+            "largestList": int(sizes.max()) if sizes.size else 0,
+        }
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# queued by stop(), the worker exits once the batches before it are embedded
+_STOP: Any = object()
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into one batched call.
+
+    The first waiting request opens a batch, which is closed once it holds
+    `max_batch_size` texts or `max_wait_ms` have passed. The batch is embedded in
+    a worker thread with one `embed_documents` call and every waiting request gets
+    its own row back. Requests arriving while a batch runs form the next one.
+    """
+
+    def __init__(
+        self,
+        embed_documents: Callable[[List[str]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = "embeddings",
+    ):
+        self.embed_documents = embed_documents
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+        self._queue: Optional["asyncio.Queue[Tuple[str, asyncio.Future]]"] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self) -> "asyncio.Queue[Tuple[str, asyncio.Future]]":
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._queue is None or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run(self._queue))
+        return self._queue
+
+    async def embed(self, text: str) -> Any:
+        """
+        Embeds one text as part of the next batch.
+
+        Args:
+            text: The text to embed.
+
+        Returns:
+            The row of the batch result that belongs to `text`.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._ensure_worker().put_nowait((text, future))
+        return await future
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Embeds the queued texts and stops the worker. A later `embed` starts a
+        new one.
+
+        Args:
+            timeout: Seconds to wait for the queue to drain, the requests still
+                     waiting afterwards are cancelled.
+        """
+        if self._worker is None or self._queue is None:
+            return
+        worker, queue = self._worker, self._queue
+        self._worker = self._queue = None
+        if worker.done():
+            return
+        queue.put_nowait(_STOP)
+        try:
+            await asyncio.wait_for(worker, timeout)
+        except asyncio.TimeoutError:
+            waiting = [item for item in (queue.get_nowait() for _ in range(queue.qsize())) if item is not _STOP]
+            logger.warning(f"{self.name} batcher did not drain within {timeout}s, cancelling {len(waiting)} requests")
+            for _, future in waiting:
+                future.cancel()
+
+    async def _collect(self, queue: "asyncio.Queue[Tuple[str, asyncio.Future]]") -> List[Tuple[str, asyncio.Future]]:
+        batch = [await queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size and batch[-1] is not _STOP:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                # take what is already waiting without blocking
+                while len(batch) < self.max_batch_size and not queue.empty() and batch[-1] is not _STOP:
+                    batch.append(queue.get_nowait())
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self, queue: "asyncio.Queue[Tuple[str, asyncio.Future]]") -> None:
+        while True:
+            batch = await self._collect(queue)
+            stopping = batch[-1] is _STOP
+            batch = [(text, future) for text, future in batch[:-1 if stopping else None] if not future.cancelled()]
+            if batch:
+                await self._embed_batch(batch)
+            if stopping:
+                return
+
+    async def _embed_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = [text for text, _ in batch]
+        try:
+            results = await asyncio.to_thread(self.embed_documents, texts)
+        except asyncio.CancelledError:
+            # stop() timed out, the waiting requests are cancelled with the worker
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Batch of {len(texts)} {self.name} texts failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(texts)
+        logger.debug(f"Embedded a batch of {len(texts)} {self.name} texts")
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "averageBatchSize": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "maxBatchSize": self.max_batch_size,
+            "maxWaitMs": self.max_wait * 1000,
+        }
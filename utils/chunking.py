@@ -0,0 +1,134 @@
+import logging
+import re
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+from config.models import TOKENIZER_ENCODING
+
+logger = logging.getLogger(__name__)
+
+# used when the tiktoken encoding cannot be loaded (i.e. no network to fetch it)
+APPROX_CHARS_PER_TOKEN = 4
+
+_PARAGRAPHS = re.compile(r"\n\s*\n")
+_SENTENCES = re.compile(r"(?<=[.!?])\s+")
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = TOKENIZER_ENCODING) -> Optional[Any]:
+    """
+    Loads a tiktoken encoding once.
+
+    Args:
+        name: Name of the encoding, i.e. cl100k_base.
+
+    Returns:
+        The encoding, or None when it cannot be loaded, counts are then approximated
+        from the text length.
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"Could not load tiktoken encoding {name}, approximating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str, encoding: Optional[Any] = None) -> int:
+    """
+    Counts the tokens of a text.
+
+    Args:
+        text: The text.
+        encoding: A tiktoken encoding, get_encoding() by default.
+
+    Returns:
+        The number of tokens.
+    """
+    encoding = encoding or get_encoding()
+    if encoding is None:
+        return -(-len(text) // APPROX_CHARS_PER_TOKEN)
+    return len(encoding.encode_ordinary(text))
+
+
+def _split_tokens(text: str, max_tokens: int, encoding: Optional[Any]) -> List[str]:
+    # last resort for a sentence longer than a chunk
+    if encoding is None:
+        size = max_tokens * APPROX_CHARS_PER_TOKEN
+        return [text[i:i + size] for i in range(0, len(text), size)]
+    tokens = encoding.encode_ordinary(text)
+    return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+
+def _units(text: str, max_tokens: int, encoding: Optional[Any]) -> List[Tuple[str, str]]:
+    # paragraphs, or the sentences of the paragraphs that do not fit in a chunk,
+    # with the separator that precedes them in the text
+    units = []
+    for paragraph in _PARAGRAPHS.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph, encoding) <= max_tokens:
+            units.append((paragraph, "\n\n"))
+            continue
+        separator = "\n\n"
+        for sentence in _SENTENCES.split(paragraph):
+            pieces = [sentence] if count_tokens(sentence, encoding) <= max_tokens else _split_tokens(sentence, max_tokens, encoding)
+            for i, piece in enumerate(pieces):
+                # the pieces of a cut sentence follow each other without separator
+                units.append((piece, "" if i else separator))
+            separator = " "
+    return units
+
+
+def _join(units: List[Tuple[str, str]]) -> str:
+    return "".join(separator + text if i else text for i, (text, separator) in enumerate(units))
+
+
+def chunk_by_tokens(text: str, max_tokens: int, overlap_tokens: int = 0, encoding: Optional[Any] = None) -> List[str]:
+    """
+    Splits a text into chunks of at most `max_tokens` tokens.
+
+    Chunks are packed with whole paragraphs, then whole sentences, and only cut
+    inside a sentence longer than a chunk. Each chunk starts with the last units
+    of the previous one, up to `overlap_tokens`, so that no chunk starts without
+    context.
+
+    Args:
+        text: The text to split.
+        max_tokens: Token budget of a chunk.
+        overlap_tokens: Token budget of the units repeated from the previous chunk.
+        encoding: A tiktoken encoding, get_encoding() by default.
+
+    Returns:
+        The chunks, in order.
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be greater than 0")
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be lower than max_tokens")
+
+    encoding = encoding or get_encoding()
+    chunks: List[str] = []
+    current: List[Tuple[str, str]] = []
+    counts: List[int] = []
+    total = 0
+    for unit in _units(text, max_tokens, encoding):
+        # plus one token for the separator
+        tokens = count_tokens(unit[0], encoding) + 1
+        if current and total + tokens > max_tokens:
+            chunks.append(_join(current))
+            # carry the tail of the chunk over, as long as it fits the overlap
+            kept = 0
+            while kept < len(current) and sum(counts[len(counts) - kept - 1:]) <= overlap_tokens:
+                kept += 1
+            current, counts = current[len(current) - kept:], counts[len(counts) - kept:]
+            total = sum(counts)
+            while current and total + tokens > max_tokens:
+                total -= counts.pop(0)
+                current.pop(0)
+        current.append(unit)
+        counts.append(tokens)
+        total += tokens
+    if current:
+        chunks.append(_join(current))
+    return chunks
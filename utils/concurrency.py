@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Tuple
+from config.models import MODELS_CONFIG, MAX_CONCURRENT_REQUESTS
+from config.enums import ModelName
+
+logger = logging.getLogger(__name__)
+
+
+# semaphores are bound to the event loop they are first awaited on, so they are
+# keyed by (loop, model) to stay valid when a process runs more than one loop.
+_model_semaphores: Dict[Tuple[int, ModelName], asyncio.Semaphore] = {}
+
+
+def get_model_limit(model_name: ModelName) -> int:
+    """
+    Returns the maximum number of concurrent calls allowed for a model.
+
+    Args:
+        model_name: The model to look up in MODELS_CONFIG.
+
+    Returns:
+        The configured "max_concurrency" of the model, or MAX_CONCURRENT_REQUESTS.
+    """
+    model_data = MODELS_CONFIG.get(model_name, {})
+    return max(1, int(model_data.get("max_concurrency", MAX_CONCURRENT_REQUESTS)))
+
+
+def get_model_semaphore(model_name: ModelName) -> asyncio.Semaphore:
+    """
+    Returns the semaphore guarding calls to a model on the running event loop.
+
+    Args:
+        model_name: The model the semaphore belongs to.
+
+    Returns:
+        An asyncio.Semaphore sized by get_model_limit.
+    """
+    key = (id(asyncio.get_running_loop()), model_name)
+    semaphore = _model_semaphores.get(key)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(get_model_limit(model_name))
+        _model_semaphores[key] = semaphore
+    return semaphore
+
+
+@asynccontextmanager
+async def model_call_slot(model_name: ModelName) -> AsyncIterator[None]:
+    """
+    Waits for a free call slot of a model and holds it for the duration of the block.
+
+    Args:
+        model_name: The model that is about to be called.
+    """
+    semaphore = get_model_semaphore(model_name)
+    if semaphore.locked():
+        logger.debug(f"All {get_model_limit(model_name)} slots of {model_name.value} are busy, waiting.")
+    async with semaphore:
+        yield
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from config.models import (
+    EMBEDDING_CACHE_MAX_BYTES,
+    EMBEDDING_CACHE_DISK,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_DTYPE,
+)
+from utils.quantization import QuantizedVectors, quantize
+
+logger = logging.getLogger(__name__)
+
+# config keys of an embeddings model that change the produced vectors
+_OUTPUT_SETTINGS = ("encode_kwargs", "query_encode_kwargs", "dimensions", "onnx_quantize")
+
+
+class EmbeddingCache:
+    """
+    Content addressed cache of embedding vectors.
+
+    Vectors are keyed by model name + output settings + sha256 of the text, and
+    kept in an in-memory LRU tier bounded by bytes. With `disk_dir` set, every
+    vector is also written as a .npy file, which serves as a second tier across
+    restarts and workers.
+
+    Both tiers store vectors as `dtype` (float32, float16 or int8, see
+    utils.quantization) and hand them out as float32.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, dtype: str = "float32"):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.dtype = quantize(np.zeros(1, dtype=np.float32), dtype).dtype
+        self._entries: "OrderedDict[str, QuantizedVectors]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model_name: str, settings: Dict[str, Any], text: str) -> str:
+        """
+        Builds the cache key of a text.
+
+        Args:
+            model_name: Name of the embeddings model.
+            settings: Settings of the model that change its output (i.e. normalization).
+            text: The embedded text.
+
+        Returns:
+            A hex sha256 digest.
+        """
+        digest = hashlib.sha256()
+        digest.update(model_name.encode())
+        digest.update(b"\0")
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+        digest.update(b"\0")
+        digest.update(text.encode())
+        return digest.hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        # int8 vectors are saved with their scale
+        suffix = "npz" if self.dtype == "int8" else "npy"
+        return os.path.join(str(self.disk_dir), key[:2], f"{key}.{suffix}")
+
+    def _load(self, path: str) -> QuantizedVectors:
+        if path.endswith(".npz"):
+            with np.load(path) as archive:
+                return QuantizedVectors(archive["data"], archive["scale"])
+        return QuantizedVectors(np.load(path))
+
+    def _save(self, f: Any, vector: QuantizedVectors) -> None:
+        if vector.scale is not None:
+            np.savez(f, data=vector.data, scale=vector.scale)
+        else:
+            np.save(f, vector.data)
+
+    def _remember(self, key: str, vector: QuantizedVectors) -> None:
+        # caller holds the lock
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous.nbytes
+        if vector.nbytes > self.max_bytes:
+            return
+        self._entries[key] = vector
+        self.bytes += vector.nbytes
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Looks a vector up in memory, then on disk.
+
+        Args:
+            key: A key built with make_key.
+
+        Returns:
+            The cached float32 vector, or None on a miss.
+        """
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector.dequantize()
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                try:
+                    vector = self._load(path)
+                    if vector.dtype != self.dtype:
+                        # written with another EMBEDDING_CACHE_DTYPE
+                        vector = quantize(vector.dequantize(), self.dtype)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Could not read cached embedding {path}: {e}")
+                else:
+                    with self._lock:
+                        self.disk_hits += 1
+                        self._remember(key, vector)
+                    return vector.dequantize()
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        """
+        Stores a vector in memory and, when enabled, on disk.
+
+        Args:
+            key: A key built with make_key.
+            vector: The embedding vector.
+        """
+        # a read-only copy, the caller keeps using (and may modify) the vector it passed in
+        vector = quantize(np.array(vector, dtype=np.float32), self.dtype)
+        vector.data.flags.writeable = False
+        with self._lock:
+            self._remember(key, vector)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    self._save(f, vector)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not write cached embedding {path}: {e}")
+
+    def clear(self) -> None:
+        """Drops the in-memory tier, the disk tier is left untouched."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "maxBytes": self.max_bytes,
+                "dtype": self.dtype,
+                "hits": self.hits,
+                "diskHits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "disk": bool(self.disk_dir),
+            }
+
+
+embedding_cache = EmbeddingCache(
+    max_bytes=EMBEDDING_CACHE_MAX_BYTES,
+    disk_dir=EMBEDDING_CACHE_DIR if EMBEDDING_CACHE_DISK else None,
+    dtype=EMBEDDING_CACHE_DTYPE,
+)
+
+
+class CachedEmbeddings:
+    """
+    Wraps a LangChain embeddings model so that every text is embedded once per
+    model and settings. Only the texts missing from the cache are sent to the
+    model, in a single embed_documents call.
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        model_name: str,
+        config: Dict[str, Any],
+        cache: EmbeddingCache = embedding_cache,
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+
+        settings = {key: config[key] for key in _OUTPUT_SETTINGS if config.get(key)}
+        self.document_settings = {k: v for k, v in settings.items() if k != "query_encode_kwargs"}
+        # models without dedicated query settings embed queries like documents
+        self.query_settings = dict(self.document_settings)
+        if settings.get("query_encode_kwargs"):
+            self.query_settings["encode_kwargs"] = settings["query_encode_kwargs"]
+
+    def embed_documents_array(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embeds texts through the cache.
+
+        Args:
+            texts: The texts to embed.
+
+        Returns:
+            A float32 matrix of shape (len(texts), dimensions).
+        """
+        keys = [self.cache.make_key(self.model_name, self.document_settings, text) for text in texts]
+        vectors: List[Optional[np.ndarray]] = [self.cache.get(key) for key in keys]
+
+        missing: Dict[str, List[int]] = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(texts[i], []).append(i)
+
+        if missing:
+            logger.debug(f"Embedding {len(missing)} of {len(texts)} texts with {self.model_name}")
+            if hasattr(self.embeddings, "embed_documents_array"):
+                # models computing numpy vectors skip the round trip through lists
+                computed = self.embeddings.embed_documents_array(list(missing))
+            else:
+                computed = self.embeddings.embed_documents(list(missing))
+            for (text, indexes), vector in zip(missing.items(), computed):
+                vector = np.asarray(vector, dtype=np.float32)
+                self.cache.put(keys[indexes[0]], vector)
+                for i in indexes:
+                    vectors[i] = vector
+
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack(vectors)
+
+    def embed_query_array(self, text: str) -> np.ndarray:
+        """
+        Embeds a query through the cache.
+
+        Args:
+            text: The query.
+
+        Returns:
+            A float32 vector.
+        """
+        key = self.cache.make_key(self.model_name, self.query_settings, text)
+        vector = self.cache.get(key)
+        if vector is None:
+            if hasattr(self.embeddings, "embed_query_array"):
+                vector = self.embeddings.embed_query_array(text)
+            else:
+                vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+            self.cache.put(key, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_query_array(text).tolist()
@@ -0,0 +1,295 @@
+"""
+Runs the huggingface embeddings model in a pool of worker processes that share one
+copy of its weights.
+
+The pool belongs to the API process that created it: each uvicorn worker
+(`--workers N`) loads its own model and starts its own pool, so a deployment holds
+N copies of the weights and N * EMBEDDING_POOL_WORKERS worker processes. Run a
+single uvicorn worker with a larger pool to keep one copy.
+"""
+import logging
+import queue
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _worker(model: Any, conn: Any, buffer_name: str, max_batch_size: int, dimensions: int, threads: int) -> None:
+    # runs in a pool process, the model weights are shared with the parent
+    import torch
+
+    torch.set_num_threads(max(1, threads))
+    buffer = shared_memory.SharedMemory(name=buffer_name)
+    output = np.ndarray((max_batch_size, dimensions), dtype=np.float32, buffer=buffer.buf)
+    try:
+        while True:
+            task = conn.recv()
+            if task is None:
+                break
+            texts, encode_kwargs = task
+            encode_kwargs.setdefault("show_progress_bar", False)
+            try:
+                vectors = model.encode(texts, convert_to_numpy=True, **encode_kwargs)
+                output[:len(texts)] = vectors
+                conn.send((len(texts), None))
+            except Exception as e:
+                conn.send((0, f"{type(e).__name__}: {e}"))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del output
+        buffer.close()
+
+
+class _Worker:
+    def __init__(self, process: Any, conn: Any, buffer: shared_memory.SharedMemory, output: np.ndarray):
+        self.process = process
+        self.conn = conn
+        self.buffer = buffer
+        self.output = output
+
+
+def _shutdown(workers: List[_Worker]) -> None:
+    # also run by weakref.finalize when the pool is garbage collected or at exit
+    for worker in workers:
+        try:
+            worker.conn.send(None)
+        except (OSError, ValueError):
+            pass
+    for worker in workers:
+        worker.process.join(timeout=5)
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.conn.close()
+        worker.buffer.close()
+        try:
+            worker.buffer.unlink()
+        except FileNotFoundError:
+            pass
+    workers.clear()
+
+
+class EmbeddingProcessPool:
+    """
+    Runs a sentence-transformers model in a pool of worker processes.
+
+    The model is loaded once, in this process, and its weights are moved to shared
+    memory. Every worker maps the same weights instead of holding its own copy.
+    Workers are forked from a forkserver that has torch already imported, so a
+    threaded API process is never forked itself.
+
+    Each worker owns a shared-memory output buffer of `max_batch_size` rows: it
+    writes the vectors of a batch there and only sends their count back, the vectors
+    are never pickled. Texts above `max_batch_size` are split into sub-batches
+    dispatched to the idle workers concurrently.
+
+    Inference runs outside the API process, so forward passes neither hold its GIL
+    nor compete with request handling, and embedding throughput scales with the
+    pool workers. The pool is not shared across uvicorn workers, see above.
+    The importing __main__ module must be guarded by `if __name__ == "__main__"`,
+    the workers import it.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_folder: Optional[str] = None,
+        model_kwargs: Optional[Dict[str, Any]] = None,
+        workers: int = 2,
+        threads_per_worker: int = 1,
+        max_batch_size: int = 32,
+        start_method: str = "forkserver",
+    ):
+        import torch.multiprocessing as mp
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.max_batch_size = max(1, max_batch_size)
+        self.threads_per_worker = max(1, threads_per_worker)
+        model = SentenceTransformer(model_name, cache_folder=cache_folder, **(model_kwargs or {}))
+        model.eval()
+        # the parameters are moved to shared memory, the workers get handles to them
+        model.share_memory()
+        # renamed get_embedding_dimension in recent sentence-transformers
+        get_dimension = getattr(model, "get_embedding_dimension", None) or model.get_sentence_embedding_dimension
+        self.dimensions = get_dimension()
+        self.weight_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+        self._model = model
+
+        self._context = mp.get_context(start_method)
+        if start_method == "forkserver":
+            self._context.set_forkserver_preload(["torch", "sentence_transformers"])
+        self._workers: List[_Worker] = []
+        self._idle: "queue.Queue[int]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._finalizer = weakref.finalize(self, _shutdown, self._workers)
+        for _ in range(max(1, workers)):
+            self._workers.append(self._spawn())
+            self._idle.put(len(self._workers) - 1)
+        self._dispatcher = ThreadPoolExecutor(max_workers=len(self._workers), thread_name_prefix="embedding-pool")
+        self.batches = 0
+        self.texts = 0
+        self.restarts = 0
+        logger.info(
+            f"Embedding pool of {len(self._workers)} workers started for {model_name} "
+            f"({self.weight_bytes} bytes of shared weights)"
+        )
+
+    def _spawn(self, buffer: Optional[shared_memory.SharedMemory] = None) -> _Worker:
+        if buffer is None:
+            buffer = shared_memory.SharedMemory(create=True, size=self.max_batch_size * self.dimensions * 4)
+        output = np.ndarray((self.max_batch_size, self.dimensions), dtype=np.float32, buffer=buffer.buf)
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker,
+            args=(self._model, child_conn, buffer.name, self.max_batch_size, self.dimensions, self.threads_per_worker),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn, buffer, output)
+
+    @property
+    def workers(self) -> int:
+        return len(self._workers)
+
+    def pids(self) -> List[int]:
+        return [worker.process.pid for worker in self._workers]
+
+    def _run(self, texts: List[str], encode_kwargs: Dict[str, Any], out: np.ndarray, rows: np.ndarray) -> None:
+        index = self._idle.get()
+        worker = self._workers[index]
+        try:
+            worker.conn.send((texts, encode_kwargs))
+            count, error = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            # the worker died (i.e. killed for memory), it is replaced for the next batches
+            logger.error(f"Embedding pool worker {worker.process.pid} died: {e}")
+            with self._lock:
+                worker.conn.close()
+                worker.process.join(timeout=1)
+                self._workers[index] = self._spawn(worker.buffer)
+                self.restarts += 1
+            raise RuntimeError(f"Embedding pool worker died while embedding {len(texts)} texts") from e
+        else:
+            if error is not None:
+                raise RuntimeError(f"Embedding pool worker failed: {error}")
+            # the only copy of the vectors, from the shared buffer into their rows of the result
+            out[rows] = worker.output[:count]
+        finally:
+            self._idle.put(index)
+
+    def embed(self, texts: Sequence[str], encode_kwargs: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """
+        Embeds texts in the pool.
+
+        Args:
+            texts: The texts to embed.
+            encode_kwargs: Keyword arguments of SentenceTransformer.encode, i.e.
+                           normalize_embeddings.
+
+        Returns:
+            A float32 matrix of shape (len(texts), dimensions).
+
+        Raises:
+            RuntimeError: If a worker failed or died.
+        """
+        if not self._workers:
+            raise RuntimeError("Embedding pool is closed")
+        encode_kwargs = dict(encode_kwargs or {})
+        out = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        # longest first, like SentenceTransformer.encode, so a sub-batch pads its texts
+        # to similar lengths instead of to the longest text of an arbitrary slice
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        batches = [order[start:start + self.max_batch_size] for start in range(0, len(texts), self.max_batch_size)]
+        with self._lock:
+            self.batches += len(batches)
+            self.texts += len(texts)
+        if len(batches) == 1:
+            self._run(list(texts), encode_kwargs, out, np.arange(len(texts)))
+            return out
+        futures = [
+            self._dispatcher.submit(self._run, [texts[i] for i in rows], encode_kwargs, out, rows)
+            for rows in batches
+        ]
+        for future in futures:
+            future.result()
+        return out
+
+    def close(self) -> None:
+        self._dispatcher.shutdown(wait=True)
+        self._finalizer()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": len(self._workers),
+                "threadsPerWorker": self.threads_per_worker,
+                "maxBatchSize": self.max_batch_size,
+                "sharedWeightBytes": self.weight_bytes,
+                "batches": self.batches,
+                "texts": self.texts,
+                "restarts": self.restarts,
+            }
+
+
+class PooledHuggingFaceEmbeddings:
+    """
+    HuggingFaceEmbeddings compatible embeddings (same inputs, output shape and
+    normalization) computed by an EmbeddingProcessPool. The *_array methods hand
+    the float32 matrix out without converting it to lists.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_folder: Optional[str] = None,
+        model_kwargs: Optional[Dict[str, Any]] = None,
+        encode_kwargs: Optional[Dict[str, Any]] = None,
+        query_encode_kwargs: Optional[Dict[str, Any]] = None,
+        pool_workers: int = 2,
+        pool_threads_per_worker: int = 1,
+        pool_max_batch_size: int = 32,
+        pool_start_method: str = "forkserver",
+        **kwargs: Any,
+    ):
+        if kwargs:
+            logger.debug(f"Ignoring HuggingFaceEmbeddings settings not used by the pool: {sorted(kwargs)}")
+        self.model_name = model_name
+        self.encode_kwargs = dict(encode_kwargs or {})
+        self.query_encode_kwargs = dict(query_encode_kwargs or {})
+        self.pool = EmbeddingProcessPool(
+            model_name,
+            cache_folder=cache_folder,
+            model_kwargs=model_kwargs,
+            workers=pool_workers,
+            threads_per_worker=pool_threads_per_worker,
+            max_batch_size=pool_max_batch_size,
+            start_method=pool_start_method,
+        )
+
+    @staticmethod
+    def _clean(texts: Sequence[str]) -> List[str]:
+        # as HuggingFaceEmbeddings does
+        return [text.replace("\n", " ") for text in texts]
+
+    def embed_documents_array(self, texts: Sequence[str]) -> np.ndarray:
+        return self.pool.embed(self._clean(texts), self.encode_kwargs)
+
+    def embed_query_array(self, text: str) -> np.ndarray:
+        return self.pool.embed(self._clean([text]), self.query_encode_kwargs or self.encode_kwargs)[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_query_array(text).tolist()
+
+    def close(self) -> None:
+        """Stops the worker processes and frees their shared memory, called by the registry on eviction."""
+        self.pool.close()
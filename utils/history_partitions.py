@@ -0,0 +1,350 @@
+import asyncio
+import logging
+import re
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from config.database import (
+    async_engine,
+    HISTORY_ARCHIVE_AFTER_DAYS,
+    HISTORY_ARCHIVE_BATCH_SIZE,
+    HISTORY_MAINTENANCE_INTERVAL_HOURS,
+    HISTORY_MAINTENANCE_LOCK_TIMEOUT_MS,
+    HISTORY_PARTITIONS_AHEAD,
+    HISTORY_RETENTION_DROP,
+    HISTORY_RETENTION_MONTHS,
+)
+
+logger = logging.getLogger(__name__)
+
+TABLE = "chat_history"
+# taken by the maintenance run, so that a single worker or CLI runs it at a time
+MAINTENANCE_LOCK_ID = 0x63686174
+
+_MONTH_SUFFIX = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def utc_now() -> datetime:
+    """The clock of the maintenance, timezone-aware in UTC."""
+    return datetime.now(timezone.utc)
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date, table: str = TABLE) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+@contextmanager
+def transaction(connection: Connection, lock_timeout_ms: Optional[int] = None) -> Iterator[Connection]:
+    """
+    Runs a step of the maintenance in its own transaction, committed at the end of
+    the block, so that its locks are held only as long as the step.
+
+    Args:
+        connection: A connection to the database, outside of a transaction.
+        lock_timeout_ms: For DDL, how long to wait for the table locks before
+                         failing instead of queueing the traffic behind it. The
+                         statement timeout is lifted, attaching a partition scans it.
+    """
+    with connection.begin():
+        if lock_timeout_ms is not None:
+            connection.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+            connection.execute(text("SET LOCAL statement_timeout = 0"))
+        yield connection
+
+
+def list_partitions(connection: Connection, table: str = TABLE) -> List[Tuple[str, date]]:
+    """
+    Lists the monthly partitions attached to a table.
+
+    Args:
+        connection: A connection to the database.
+        table: The partitioned table.
+
+    Returns:
+        (partition name, first day of its month) pairs, oldest first. The default
+        partition is not listed.
+    """
+    rows = connection.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table"
+        ),
+        {"table": table},
+    ).scalars()
+    partitions = []
+    for name in rows:
+        match = _MONTH_SUFFIX.search(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(
+    connection: Connection,
+    month: date,
+    table: str = TABLE,
+    batch_size: int = HISTORY_ARCHIVE_BATCH_SIZE,
+    lock_timeout_ms: int = HISTORY_MAINTENANCE_LOCK_TIMEOUT_MS,
+) -> str:
+    """
+    Creates the partition of a month.
+
+    Rows of that month that landed in the default partition are moved into the new
+    partition before it is attached, attaching would fail otherwise. The table is
+    created, filled `batch_size` rows per transaction and attached in separate
+    transactions, a table left unattached by an interrupted run is reused.
+
+    Args:
+        connection: A connection to the database, outside of a transaction.
+        month: Any day of the month.
+        table: The partitioned table.
+        batch_size: Rows moved per transaction.
+        lock_timeout_ms: Lock timeout of the DDL.
+
+    Returns:
+        The name of the partition.
+    """
+    month = month_start(month)
+    name = partition_name(month, table)
+    bounds = {"start": month, "end": add_months(month, 1)}
+    move = (
+        f'WITH moved AS (DELETE FROM "{table}_default" WHERE ctid = ANY(ARRAY('
+        f'SELECT ctid FROM "{table}_default" WHERE created_at >= :start AND created_at < :end {{limit}}'
+        f')) RETURNING *) INSERT INTO "{name}" SELECT * FROM moved'
+    )
+    with transaction(connection, lock_timeout_ms):
+        connection.execute(
+            text(f'CREATE TABLE IF NOT EXISTS "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        )
+    while True:
+        with transaction(connection):
+            moved = connection.execute(text(move.format(limit="LIMIT :limit")), {**bounds, "limit": batch_size}).rowcount
+        if moved < batch_size:
+            break
+    with transaction(connection, lock_timeout_ms):
+        # rows inserted since the last batch
+        connection.execute(text(move.format(limit="")), bounds)
+        connection.execute(
+            text(f"ALTER TABLE \"{table}\" ATTACH PARTITION \"{name}\" FOR VALUES FROM ('{month}') TO ('{bounds['end']}')")
+        )
+    return name
+
+
+def ensure_partitions(
+    connection: Connection,
+    months_ahead: int = HISTORY_PARTITIONS_AHEAD,
+    table: str = TABLE,
+    since: Optional[date] = None,
+    today: Optional[date] = None,
+    batch_size: int = HISTORY_ARCHIVE_BATCH_SIZE,
+    lock_timeout_ms: int = HISTORY_MAINTENANCE_LOCK_TIMEOUT_MS,
+    dry_run: bool = False,
+) -> List[str]:
+    """
+    Creates the missing monthly partitions up to `months_ahead` months from now.
+
+    Args:
+        connection: A connection to the database, outside of a transaction.
+        months_ahead: Number of future months that must have a partition.
+        table: The partitioned table.
+        since: First month that must have a partition, the current month by default.
+        today: The current day, in UTC by default.
+        batch_size: Rows moved out of the default partition per transaction.
+        lock_timeout_ms: Lock timeout of the DDL.
+        dry_run: Only return the partitions that would be created.
+
+    Returns:
+        The names of the created partitions.
+    """
+    today = today or utc_now().date()
+    with transaction(connection):
+        existing = {month for _, month in list_partitions(connection, table)}
+    month = month_start(since or today)
+    last = add_months(month_start(today), months_ahead)
+    created = []
+    while month <= last:
+        if month not in existing:
+            if dry_run:
+                created.append(partition_name(month, table))
+            else:
+                created.append(create_partition(connection, month, table, batch_size, lock_timeout_ms))
+        month = add_months(month, 1)
+    return created
+
+
+def archive_rows(
+    connection: Connection,
+    before: datetime,
+    table: str = TABLE,
+    batch_size: int = HISTORY_ARCHIVE_BATCH_SIZE,
+    dry_run: bool = False,
+) -> int:
+    """
+    Sets archived_at on every exchange created before a time, the partial indexes
+    on active rows stop covering them.
+
+    Rows are archived `batch_size` at a time, one transaction each, so that no
+    transaction holds its row locks (or bloats the table) for long.
+
+    Args:
+        connection: A connection to the database, outside of a transaction.
+        before: Exchanges created before this time are archived, timezone-aware.
+        table: The partitioned table.
+        batch_size: Rows archived per transaction.
+        dry_run: Only count the exchanges that would be archived.
+
+    Returns:
+        The number of archived exchanges.
+    """
+    # created_at is a timestamp in the session time zone, compared to an instant
+    active = f'FROM "{table}" WHERE created_at < CAST(:before AS timestamptz) AND archived_at IS NULL'
+    if dry_run:
+        with transaction(connection):
+            return connection.execute(text(f"SELECT count(*) {active}"), {"before": before}).scalar()
+    archived = 0
+    while True:
+        with transaction(connection):
+            count = connection.execute(
+                text(
+                    f'UPDATE "{table}" SET archived_at = now() '
+                    f"WHERE (id, created_at) IN (SELECT id, created_at {active} LIMIT :limit)"
+                ),
+                {"before": before, "limit": batch_size},
+            ).rowcount
+        archived += count
+        if count < batch_size:
+            return archived
+
+
+def retire_partitions(
+    connection: Connection,
+    before: date,
+    drop: bool = False,
+    table: str = TABLE,
+    lock_timeout_ms: int = HISTORY_MAINTENANCE_LOCK_TIMEOUT_MS,
+    dry_run: bool = False,
+) -> List[str]:
+    """
+    Detaches the partitions of the months before a date, in bulk instead of
+    deleting their rows one by one.
+
+    Detached partitions stay in the database as plain tables, to be dumped (i.e.
+    with pg_dump -t) and dropped later, unless `drop` is set. Every partition is
+    retired in its own transaction.
+
+    Args:
+        connection: A connection to the database, outside of a transaction.
+        before: Partitions of months starting before this date are retired.
+        drop: Drop the partitions instead of keeping them detached.
+        table: The partitioned table.
+        lock_timeout_ms: Lock timeout of the DDL.
+        dry_run: Only return the partitions that would be retired.
+
+    Returns:
+        The names of the retired partitions.
+    """
+    with transaction(connection):
+        partitions = [name for name, month in list_partitions(connection, table) if month < before]
+    if dry_run:
+        return partitions
+    for name in partitions:
+        with transaction(connection, lock_timeout_ms):
+            connection.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            if drop:
+                connection.execute(text(f'DROP TABLE "{name}"'))
+    return partitions
+
+
+def run_maintenance(
+    connection: Connection,
+    archive_after_days: int = HISTORY_ARCHIVE_AFTER_DAYS,
+    retention_months: int = HISTORY_RETENTION_MONTHS,
+    drop: bool = HISTORY_RETENTION_DROP,
+    months_ahead: int = HISTORY_PARTITIONS_AHEAD,
+    table: str = TABLE,
+    batch_size: int = HISTORY_ARCHIVE_BATCH_SIZE,
+    lock_timeout_ms: int = HISTORY_MAINTENANCE_LOCK_TIMEOUT_MS,
+    now: Optional[datetime] = None,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """
+    Creates the upcoming partitions, archives old exchanges and retires the
+    partitions past retention. Skipped when another run holds the lock.
+
+    Every step commits on its own: DDL waits at most `lock_timeout_ms` for its
+    locks and archiving goes `batch_size` rows per transaction, so the run never
+    holds locks the traffic waits on for long. A step that fails leaves the
+    previous ones done, the next run picks up from there.
+
+    Args:
+        connection: A connection to the database, outside of a transaction.
+        archive_after_days: Exchanges older than this are archived, 0 to keep them active.
+        retention_months: Months kept attached besides the current one, 0 to keep every month.
+        drop: Drop retired partitions instead of detaching them.
+        months_ahead: Number of future months that must have a partition.
+        table: The partitioned table.
+        batch_size: Rows archived, or moved out of the default partition, per transaction.
+        lock_timeout_ms: Lock timeout of the DDL.
+        now: The current time, timezone-aware, utc_now() by default.
+        dry_run: Report what would be done without changing anything.
+
+    Returns:
+        What the run did.
+    """
+    now = now or utc_now()
+    # held by the session, across the transactions of the steps
+    with transaction(connection):
+        locked = connection.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": MAINTENANCE_LOCK_ID}).scalar()
+    if not locked:
+        return {"skipped": True}
+
+    try:
+        report: Dict[str, Any] = {"skipped": False}
+        report["created"] = ensure_partitions(
+            connection, months_ahead, table, today=now.date(), batch_size=batch_size,
+            lock_timeout_ms=lock_timeout_ms, dry_run=dry_run,
+        )
+        report["archived"] = 0
+        if archive_after_days > 0:
+            report["archived"] = archive_rows(
+                connection, now - timedelta(days=archive_after_days), table, batch_size, dry_run
+            )
+        report["retired"] = []
+        if retention_months > 0:
+            before = add_months(month_start(now.date()), -retention_months)
+            report["retired"] = retire_partitions(connection, before, drop, table, lock_timeout_ms, dry_run)
+        report["dropped"] = drop
+        return report
+    finally:
+        with transaction(connection):
+            connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MAINTENANCE_LOCK_ID})
+
+
+async def maintenance_loop(interval_hours: float = HISTORY_MAINTENANCE_INTERVAL_HOURS) -> None:
+    """
+    Runs the maintenance every `interval_hours`, started by the app lifespan.
+
+    Args:
+        interval_hours: Hours between two runs.
+    """
+    while True:
+        try:
+            async with async_engine.connect() as connection:
+                report = await connection.run_sync(run_maintenance)
+            logger.info(f"Chat history maintenance: {report}")
+        except Exception as e:
+            logger.error(f"Chat history maintenance failed: {e}", exc_info=True)
+        await asyncio.sleep(interval_hours * 3600)
@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from config.database import (
+    AsyncSessionLocal,
+    HISTORY_BATCH_SIZE,
+    HISTORY_ENABLED,
+    HISTORY_ENQUEUE_TIMEOUT_MS,
+    HISTORY_FLUSH_INTERVAL_MS,
+    HISTORY_QUEUE_MAX_SIZE,
+)
+from models.chat.history import ChatHistory
+from models.model import Model
+
+logger = logging.getLogger(__name__)
+
+# queued to stop the worker
+_STOP = object()
+
+
+class HistoryRecorder:
+    """
+    Write-behind recorder of chat exchanges into the chat_history table.
+
+    Routes enqueue records into a bounded in-process queue and return right away,
+    a background worker writes them with multi-row INSERTs once `batch_size`
+    records are queued or `flush_interval_ms` passed since the first one. Records
+    are timestamped when queued, so an exchange is always older than its follow-ups
+    however late it is written. When the queue is full, record waits up to
+    `enqueue_timeout_ms` for room and then drops the record, so a slow database
+    never stalls the responses for long. stop() drains the queue before returning.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int,
+        batch_size: int,
+        flush_interval_ms: float,
+        enqueue_timeout_ms: float,
+        session_factory: Any = AsyncSessionLocal,
+        enabled: bool = True,
+    ):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._model_ids: Dict[str, uuid.UUID] = {}
+        self.recorded = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.flush_time = 0.0
+
+    def start(self) -> None:
+        """Starts the worker on the running event loop, if it is not running yet."""
+        if not self.enabled or (self._worker is not None and not self._worker.done()):
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker = asyncio.create_task(self._run(self._queue), name="history-recorder")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Writes the queued records and stops the worker.
+
+        Args:
+            timeout: Seconds to wait for the queue to drain, the worker is cancelled
+                     afterwards.
+        """
+        if self._worker is None or self._queue is None:
+            return
+        worker, queue = self._worker, self._queue
+        self._worker = self._queue = None
+        if worker.done():
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            try:
+                queue.put_nowait(_STOP)
+            except asyncio.QueueFull:
+                # the worker makes room as it writes, unless the database is stuck
+                await asyncio.wait_for(queue.put(_STOP), timeout)
+            await asyncio.wait_for(worker, max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            worker.cancel()
+            logger.warning(f"History recorder did not drain within {timeout}s, {queue.qsize()} records lost")
+
+    async def record(
+        self,
+        prompt: str,
+        model_name: str,
+        request_route: str,
+        answers: Any = None,
+        params: Optional[Dict[str, Any]] = None,
+        parent_id: Optional[uuid.UUID] = None,
+    ) -> Optional[uuid.UUID]:
+        """
+        Queues a chat exchange to be written.
+
+        Args:
+            prompt: The prompt of the user.
+            model_name: Name of the model that answered, resolved to a row of the models table.
+            request_route: The route that served the exchange.
+            answers: The answers of the model.
+            params: Parameters of the request.
+            parent_id: The exchange this one follows up on.
+
+        Returns:
+            The id the record will be written with, or None when it was dropped.
+        """
+        if not self.enabled:
+            return None
+        self.start()
+        assert self._queue is not None
+
+        record_id = uuid.uuid4()
+        row = {
+            "id": record_id,
+            # naive UTC like the partition bounds, see utils.history_partitions
+            "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+            "prompt": prompt,
+            "params": params,
+            "model_name": model_name,
+            "parent_id": parent_id,
+            "request_route": request_route,
+            "answers": answers,
+        }
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(row), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                logger.warning(f"History queue full, dropped record of {request_route}")
+                return None
+        return record_id
+
+    async def record_stream(
+        self,
+        chunks: AsyncIterator[str],
+        meta: Optional[Dict[str, Any]] = None,
+        **record_kwargs: Any,
+    ) -> AsyncIterator[str]:
+        """
+        Forwards streamed text chunks and records the whole answer once the stream completed.
+
+        Args:
+            chunks: Text chunks produced by the model.
+            meta: Gets the id of the record as "historyId", once the stream completed.
+            record_kwargs: Arguments of record, except answers.
+
+        Yields:
+            The chunks.
+        """
+        parts: List[str] = []
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        history_id = await self.record(answers=["".join(parts)], **record_kwargs)
+        if meta is not None:
+            meta["historyId"] = str(history_id) if history_id is not None else None
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # drain what was queued before stop
+        batch = []
+        while not queue.empty():
+            item = queue.get_nowait()
+            if item is not _STOP:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+        if batch:
+            await self._flush(batch)
+
+    async def _resolve_models(self, db: Any, names: List[str]) -> None:
+        missing = [name for name in names if name not in self._model_ids]
+        if not missing:
+            return
+        # models that answer for the first time get a row
+        await db.execute(
+            pg_insert(Model).on_conflict_do_nothing(index_elements=[Model.model_name]),
+            [{"model_name": name} for name in missing],
+        )
+        rows = await db.execute(select(Model.model_name, Model.id).where(Model.model_name.in_(missing)))
+        self._model_ids.update({name: model_id for name, model_id in rows})
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        start = time.perf_counter()
+        try:
+            async with self.session_factory() as db:
+                await self._resolve_models(db, sorted({row["model_name"] for row in batch}))
+                rows = [
+                    {
+                        "id": row["id"],
+                        "prompt": row["prompt"],
+                        "params": row["params"],
+                        "model_id": self._model_ids[row["model_name"]],
+                        "parent_id": row["parent_id"],
+                        "request_route": row["request_route"],
+                        "answers": row["answers"],
+                        "created_at": row["created_at"],
+                    }
+                    for row in batch
+                ]
+                await db.execute(pg_insert(ChatHistory), rows)
+                await db.commit()
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Could not write {len(batch)} chat history records: {e}", exc_info=True)
+            return
+        self.recorded += len(batch)
+        self.batches += 1
+        self.flush_time += time.perf_counter() - start
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "maxQueueSize": self.max_queue_size,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "avgBatchSize": round(self.recorded / self.batches, 1) if self.batches else 0.0,
+            "avgFlushMs": round(self.flush_time / self.batches * 1000, 2) if self.batches else 0.0,
+        }
+
+
+history_recorder = HistoryRecorder(
+    max_queue_size=HISTORY_QUEUE_MAX_SIZE,
+    batch_size=HISTORY_BATCH_SIZE,
+    flush_interval_ms=HISTORY_FLUSH_INTERVAL_MS,
+    enqueue_timeout_ms=HISTORY_ENQUEUE_TIMEOUT_MS,
+    enabled=HISTORY_ENABLED,
+)
@@ -0,0 +1,312 @@
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+from config.enums import ModelName
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ModelContainer(Generic[T]):
+    """
+    A container class to hold a model instance along with its configuration.
+    Instantiation is handled by __new__ to adhere to specific design constraints.
+    """
+
+    model: T
+    config: Dict[str, Any]
+    is_singleton: bool
+
+    def __new__(
+        cls, model: T, config: Dict[str, Any], is_singleton: bool
+    ) -> "ModelContainer[T]":
+        """
+        Creates and initializes a new ModelContainer instance.
+
+        Args:
+            model: The model object instance.
+            config: The configuration dictionary used to create the model.
+            is_singleton: A boolean indicating if the model is a singleton.
+
+        Returns:
+            A new instance of ModelContainer populated with the provided data.
+        """
+        instance = super().__new__(cls)
+        instance.model = model
+        instance.config = config
+        instance.is_singleton = is_singleton
+        return instance
+
+
+@dataclass
+class ModelProvider:
+    # builds a model instance from its effective config
+    build: Callable[[Dict[str, Any]], Any]
+    # bytes held in memory by an instance, counted against the memory budget
+    footprint: Callable[[Any], int] = lambda instance: 0
+
+
+@dataclass
+class _Instance:
+    model_name: ModelName
+    container: ModelContainer
+    bytes: int
+    last_used: float
+    uses: int = 0
+
+
+class ModelRegistry:
+    """
+    Thread-safe registry of model instances, built by the provider ("provider" key)
+    of each model of `models_config` from its "config", merged with per-call
+    overrides.
+
+    Instances of "singleton" models are pooled by a digest of their effective
+    config, so the same overrides get the same instance back. Concurrent first
+    calls for a config build it once, the other callers wait for it. Past
+    `max_bytes` (as estimated by the providers) or `max_instances`, the least
+    recently used instances idle for at least `min_idle_seconds` are evicted and
+    closed, when they have a close() method (i.e. worker processes of an embedding
+    pool). Callers should get the instance on every use rather than hold it.
+    """
+
+    def __init__(
+        self,
+        models_config: Dict[ModelName, Dict[str, Any]],
+        max_bytes: int = 0,
+        max_instances: int = 0,
+        min_idle_seconds: float = 300,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.models_config = models_config
+        self.max_bytes = max_bytes
+        self.max_instances = max_instances
+        self.min_idle_seconds = min_idle_seconds
+        self._clock = clock
+        self._providers: Dict[str, ModelProvider] = {}
+        self._instances: Dict[str, _Instance] = {}
+        self._pending: Dict[str, Future] = {}
+        self._default_keys: Dict[ModelName, str] = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.builds = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def register_provider(self, name: str, provider: ModelProvider) -> None:
+        """
+        Registers the provider of the models configured with `"provider": name`,
+        replacing one of the same name.
+        """
+        with self._lock:
+            self._providers[name] = provider
+
+    def _model_data(self, model_name: ModelName) -> Dict[str, Any]:
+        if model_name not in self.models_config:
+            raise KeyError(f"Model {model_name.value} is not configured")
+        return self.models_config[model_name]
+
+    def effective_config(self, model_name: ModelName, **overrides) -> Dict[str, Any]:
+        """
+        Returns the configured config of a model merged with the overrides.
+        """
+        config = copy.deepcopy(self._model_data(model_name).get("config", {}))
+        config.update(overrides)
+        return config
+
+    @staticmethod
+    def config_key(model_name: ModelName, provider: str, config: Dict[str, Any]) -> str:
+        """
+        Builds the pool key of a model config.
+
+        Args:
+            model_name: Name of the model.
+            provider: Name of its provider.
+            config: The effective config of the model.
+
+        Returns:
+            A hex sha256 digest of the canonical JSON of the three.
+        """
+        canonical = json.dumps(
+            {"model": model_name.value, "provider": provider, "config": config},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=repr,
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _build(self, model_name: ModelName, provider: ModelProvider, config: Dict[str, Any], is_singleton: bool):
+        logger.debug(f"Building model {model_name.value} with config: {config}")
+        # providers may adjust their config, nested dicts are copied, override objects (i.e. clients) are not
+        instance = provider.build({key: copy.copy(value) if isinstance(value, dict) else value for key, value in config.items()})
+        with self._lock:
+            self.builds += 1
+        return ModelContainer(model=instance, config=config, is_singleton=is_singleton)
+
+    def get(self, model_name: ModelName, force_new: bool = False, **overrides) -> ModelContainer:
+        """
+        Returns an instance of a model, built on first use.
+
+        Args:
+            model_name: The model, a key of models_config.
+            force_new: If True, a new instance is built and replaces the pooled one
+                       of the same config.
+            **overrides: Config overrides, instances are pooled per effective config.
+
+        Returns:
+            A ModelContainer holding the instance and its effective config.
+
+        Raises:
+            KeyError: If the model is not configured or its provider not registered.
+        """
+        model_data = self._model_data(model_name)
+        provider_name = model_data.get("provider")
+        provider = self._providers.get(provider_name)
+        if provider is None:
+            raise KeyError(f"No provider '{provider_name}' registered for model {model_name.value}")
+
+        is_singleton = model_data.get("singleton", False)
+        # the configured config never changes, its key is computed once
+        key = None if overrides else self._default_keys.get(model_name)
+        config = None
+        if key is None:
+            config = self.effective_config(model_name, **overrides)
+            if not is_singleton:
+                return self._build(model_name, provider, config, is_singleton)
+            key = self.config_key(model_name, provider_name, config)
+            if not overrides:
+                self._default_keys[model_name] = key
+
+        evicted: List[_Instance] = []
+        with self._lock:
+            instance = self._instances.get(key)
+            hit = instance is not None and not force_new
+            if hit:
+                instance.last_used = self._clock()
+                instance.uses += 1
+                self.hits += 1
+                if self._over_budget():
+                    # nothing was idle when the budget was exceeded, it may be by now
+                    evicted = self._evict(keep=key, warn=False)
+            else:
+                pending = self._pending.get(key)
+                building = pending is None
+                if building:
+                    pending = self._pending[key] = Future()
+
+        if hit:
+            self._close(evicted)
+            return instance.container
+        if not building:
+            # another caller is building this config, its error is raised here too
+            return pending.result()
+
+        try:
+            if config is None:
+                config = self.effective_config(model_name, **overrides)
+            container = self._build(model_name, provider, config, is_singleton)
+            footprint = int(provider.footprint(container.model) or 0)
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            replaced = self._instances.pop(key, None)
+            if replaced is not None:
+                self.bytes -= replaced.bytes
+            self._instances[key] = _Instance(model_name, container, footprint, self._clock(), uses=1)
+            self.bytes += footprint
+            del self._pending[key]
+            evicted = self._evict(keep=key)
+        pending.set_result(container)
+        self._close(evicted)
+        return container
+
+    def _over_budget(self) -> bool:
+        # caller holds the lock
+        return (self.max_bytes > 0 and self.bytes > self.max_bytes) or (
+            self.max_instances > 0 and len(self._instances) > self.max_instances
+        )
+
+    def _evict(self, keep: str, warn: bool = True) -> List[_Instance]:
+        # caller holds the lock, and closes the evicted instances once it released it
+        evicted: List[_Instance] = []
+        if not self._over_budget():
+            return evicted
+        now = self._clock()
+        idle = sorted(
+            (instance.last_used, key)
+            for key, instance in self._instances.items()
+            if key != keep and now - instance.last_used >= self.min_idle_seconds
+        )
+        for _, key in idle:
+            if not self._over_budget():
+                return evicted
+            instance = self._instances.pop(key)
+            self.bytes -= instance.bytes
+            self.evictions += 1
+            evicted.append(instance)
+            logger.info(f"Evicted idle model {instance.model_name.value} ({instance.bytes} bytes)")
+        if warn and self._over_budget():
+            logger.warning(
+                f"Model registry over budget ({self.bytes} bytes, {len(self._instances)} instances), "
+                f"no instance idle for {self.min_idle_seconds}s"
+            )
+        return evicted
+
+    @staticmethod
+    def _close(instances: List[_Instance]) -> None:
+        # releases what the garbage collector would not (processes, shared memory)
+        for instance in instances:
+            close = getattr(instance.container.model, "close", None)
+            if not callable(close):
+                continue
+            try:
+                close()
+            except Exception as e:
+                logger.warning(f"Could not close evicted model {instance.model_name.value}: {e}")
+
+    def is_loaded(self, model_name: ModelName) -> bool:
+        """Tells whether the instance of the configured config of a model is pooled."""
+        key = self._default_keys.get(model_name)
+        with self._lock:
+            return key is not None and key in self._instances
+
+    def evict(self, model_name: Optional[ModelName] = None) -> int:
+        """
+        Drops the pooled instances of a model, or of every model, and closes them.
+
+        Returns:
+            The number of dropped instances.
+        """
+        with self._lock:
+            keys = [key for key, instance in self._instances.items() if model_name in (None, instance.model_name)]
+            dropped = [self._instances.pop(key) for key in keys]
+            for instance in dropped:
+                self.bytes -= instance.bytes
+        self._close(dropped)
+        return len(dropped)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            instances: Dict[str, int] = {}
+            for instance in self._instances.values():
+                instances[instance.model_name.value] = instances.get(instance.model_name.value, 0) + 1
+            return {
+                "instances": instances,
+                "bytes": self.bytes,
+                "maxBytes": self.max_bytes,
+                "maxInstances": self.max_instances,
+                "builds": self.builds,
+                "hits": self.hits,
+                "evictions": self.evictions,
+            }
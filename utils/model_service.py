@@ -1,197 +1,192 @@
 import logging
-from typing import Optional, TypeVar, Generic, Dict, Any
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Tuple
 from pydantic import SecretStr
 import re
-from config.models import MODELS_CONFIG
+import httpx
+from config.models import (
+    MODELS_CONFIG,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    MAX_TIME_TO_WAIT,
+    MODEL_REGISTRY_MAX_BYTES,
+    MODEL_REGISTRY_MAX_INSTANCES,
+    MODEL_REGISTRY_MIN_IDLE_SECONDS,
+)
 from config.enums import ModelName
-from langchain_ollama import OllamaEmbeddings
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
-from langchain_openai import ChatOpenAI
-
-logger = logging.getLogger(__name__)
-
-T = TypeVar("T")
-
-
-class ModelContainer(Generic[T]):
-    """
-    A container class to hold a model instance along with its configuration.
-    Instantiation is handled by __new__ to adhere to specific design constraints.
-    """
+from utils.model_registry import ModelContainer, ModelProvider, ModelRegistry
 
-    model: T
-    config: Dict[str, Any]
-    is_singleton: bool
+# the provider packages take seconds to import (torch for huggingface), they are
+# imported by the providers when they build their first model
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
 
-    def __new__(
-        cls, model: T, config: Dict[str, Any], is_singleton: bool
-    ) -> "ModelContainer[T]":
-        """
-        Creates and initializes a new ModelContainer instance.
+logger = logging.getLogger(__name__)
 
-        Args:
-            model: The model object instance.
-            config: The configuration dictionary used to create the model.
-            is_singleton: A boolean indicating if the model is a singleton.
 
-        Returns:
-            A new instance of ModelContainer populated with the provided data.
-        """
-        instance = super().__new__(cls)
-        instance.model = model
-        instance.config = config
-        instance.is_singleton = is_singleton
-        return instance
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
 
 
-_ollama_embeddings_singleton: Optional[ModelContainer[OllamaEmbeddings]] = None
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
 
 
-def init_ollamaEmbeddings(
-    force_new: bool = False, **kwargs
-) -> ModelContainer[OllamaEmbeddings]:
+def get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
     """
-    Initializes and returns a ModelContainer for an OllamaEmbeddings instance.
-
-    If the model is configured as a singleton, this function will return the
-    existing container instance unless `force_new=True` is passed or configuration
-    overrides are provided via kwargs.
-
-    Args:
-        force_new: If True, a new instance will be created and will replace the
-                   existing singleton instance.
-        **kwargs: Configuration overrides for the model. Providing kwargs will
-                  result in a new instance that is not saved as a singleton.
+    Returns the long-lived sync and async HTTP clients shared by every ChatOpenAI
+    instance and the ollama embeddings client, so connections and TLS sessions are
+    reused across requests and across instances built with configuration overrides.
 
     Returns:
-        A ModelContainer holding the instance of OllamaEmbeddings.
+        A tuple of (httpx.Client, httpx.AsyncClient).
     """
-    global _ollama_embeddings_singleton
-    model_name = ModelName.OLLAMA_EMBEDDINGS
-    model_data = MODELS_CONFIG[model_name]
-    is_singleton = model_data.get("singleton", False)
+    global _http_client, _http_async_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.Client(limits=_http_limits(), timeout=MAX_TIME_TO_WAIT)
+    if _http_async_client is None or _http_async_client.is_closed:
+        _http_async_client = httpx.AsyncClient(limits=_http_limits(), timeout=MAX_TIME_TO_WAIT)
+    return _http_client, _http_async_client
 
-    # Return singleton if it exists and no overrides are requested
-    if is_singleton and not force_new and not kwargs and _ollama_embeddings_singleton:
-        return _ollama_embeddings_singleton
 
-    config = model_data.get("config", {}).copy()
-    config.update(kwargs)
+def _build_ollama_embeddings(config: Dict[str, Any]):
+    # keep-alive connections of the shared pool, sub-batching and retries
+    config.setdefault("http_client", get_http_clients()[0])
 
-    logger.debug(f"Initializing OllamaEmbeddings with config: {config}")
-    instance = OllamaEmbeddings(**config)
+    from utils.ollama_embeddings import OllamaEmbeddingsClient
 
-    container = ModelContainer(model=instance, config=config, is_singleton=is_singleton)
+    return OllamaEmbeddingsClient(**config)
 
-    # Store as singleton if it's a singleton and this is the first creation
-    # or a forced refresh without temporary overrides.
-    if is_singleton and not kwargs:
-        _ollama_embeddings_singleton = container
 
-    return container
+def _build_huggingface_embeddings(config: Dict[str, Any]):
+    from langchain_huggingface.embeddings import HuggingFaceEmbeddings
 
+    return HuggingFaceEmbeddings(**config)
 
-_huggingface_embeddings_singleton: Optional[ModelContainer[HuggingFaceEmbeddings]] = (
-    None
-)
 
+def _build_huggingface_pool_embeddings(config: Dict[str, Any]):
+    from utils.embedding_pool import PooledHuggingFaceEmbeddings
 
-def init_huggingFaceEmbeddings(
-    force_new: bool = False, **kwargs
-) -> ModelContainer[HuggingFaceEmbeddings]:
-    """
-    Initializes and returns a ModelContainer for a HuggingFaceEmbeddings instance.
+    return PooledHuggingFaceEmbeddings(**config)
 
-    If the model is configured as a singleton, this function will return the
-    existing container instance unless `force_new=True` is passed or configuration
-    overrides are provided via kwargs.
 
-    Args:
-        force_new: If True, a new instance will be created and will replace the
-                   existing singleton instance.
-        **kwargs: Configuration overrides for the model. Providing kwargs will
-                  result in a new instance that is not saved as a singleton.
+def _build_onnx_embeddings(config: Dict[str, Any]):
+    from utils.onnx_embeddings import OnnxEmbeddings
 
-    Returns:
-        A ModelContainer holding the instance of HuggingFaceEmbeddings.
-    """
-    global _huggingface_embeddings_singleton
-    model_name = ModelName.HUGGINGFACE_EMBEDDINGS
-    model_data = MODELS_CONFIG[model_name]
-    is_singleton = model_data.get("singleton", False)
+    return OnnxEmbeddings(**config)
 
-    if (
-        is_singleton
-        and not force_new
-        and not kwargs
-        and _huggingface_embeddings_singleton
-    ):
-        return _huggingface_embeddings_singleton
 
-    config = model_data.get("config", {}).copy()
-    config.update(kwargs)
+def _torch_footprint(instance) -> int:
+    # parameters and buffers of the sentence-transformers module
+    client = getattr(instance, "_client", None)
+    if client is None or not hasattr(client, "parameters"):
+        return 0
+    tensors = list(client.parameters()) + list(client.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
 
-    logger.debug(f"Initializing HuggingFaceEmbeddings with config: {config}")
-    instance = HuggingFaceEmbeddings(**config)
 
-    container = ModelContainer(model=instance, config=config, is_singleton=is_singleton)
+def _build_openai_chat(config: Dict[str, Any]):
+    # Handle special case for api_key to wrap it in SecretStr
+    if "api_key" in config and config["api_key"] is not None:
+        config["api_key"] = SecretStr(config["api_key"])
 
-    if is_singleton and not kwargs:
-        _huggingface_embeddings_singleton = container
+    # Handle special case for 'seed' to place it in 'model_kwargs'
+    if "seed" in config:
+        if "model_kwargs" not in config:
+            config["model_kwargs"] = {}
+        config["model_kwargs"]["seed"] = config.pop("seed")
+
+    # Reuse the shared connection pool unless a client is given explicitly
+    http_client, http_async_client = get_http_clients()
+    config.setdefault("http_client", http_client)
+    config.setdefault("http_async_client", http_async_client)
+
+    from langchain_openai import ChatOpenAI
 
-    return container
+    return ChatOpenAI(**config)
 
 
-_openai_chat_singleton: Optional[ModelContainer[ChatOpenAI]] = None
+# every model of MODELS_CONFIG is built by the provider named by its "provider" key
+model_registry = ModelRegistry(
+    MODELS_CONFIG,
+    max_bytes=MODEL_REGISTRY_MAX_BYTES,
+    max_instances=MODEL_REGISTRY_MAX_INSTANCES,
+    min_idle_seconds=MODEL_REGISTRY_MIN_IDLE_SECONDS,
+)
+model_registry.register_provider("ollama", ModelProvider(build=_build_ollama_embeddings))
+model_registry.register_provider(
+    "huggingface", ModelProvider(build=_build_huggingface_embeddings, footprint=_torch_footprint)
+)
+model_registry.register_provider(
+    "huggingface_pool",
+    # the workers map the weights of the API process, they are counted once
+    ModelProvider(build=_build_huggingface_pool_embeddings, footprint=lambda instance: instance.pool.weight_bytes),
+)
+model_registry.register_provider(
+    "onnx", ModelProvider(build=_build_onnx_embeddings, footprint=lambda instance: instance.model_bytes)
+)
+model_registry.register_provider("openai", ModelProvider(build=_build_openai_chat))
 
 
-def init_openAIChat(force_new: bool = False, **kwargs) -> ModelContainer[ChatOpenAI]:
+def bind_openAIChat(**call_kwargs) -> "Runnable":
     """
-    Initializes and returns a ModelContainer for a ChatOpenAI instance.
+    Returns the singleton ChatOpenAI bound to per-call parameters.
 
-    If the model is configured as a singleton, this function will return the
-    existing container instance unless `force_new=True` is passed or configuration
-    overrides are provided via kwargs.
+    Request-varying settings such as `seed`, `max_tokens` or `temperature` are sent
+    with each invocation instead of being baked into a new ChatOpenAI instance, so
+    they never cost a client (and connection pool) rebuild.
 
     Args:
-        force_new: If True, a new instance will be created and will replace the
-                   existing singleton instance.
-        **kwargs: Configuration overrides for the model. Providing kwargs will
-                  result in a new instance that is not saved as a singleton.
+        **call_kwargs: Parameters added to every request made through the binding.
 
     Returns:
-        A ModelContainer holding the instance of ChatOpenAI.
+        A Runnable wrapping the singleton ChatOpenAI instance.
     """
-    global _openai_chat_singleton
-    model_name = ModelName.OPENAI_CHAT
-    model_data = MODELS_CONFIG[model_name]
-    is_singleton = model_data.get("singleton", False)
+    model = model_registry.get(ModelName.OPENAI_CHAT).model
+    if not model:
+        raise RuntimeError("Failed to get model from ModelService")
+    if not call_kwargs:
+        return model
+    return model.bind(**call_kwargs)
 
-    if is_singleton and not force_new and not kwargs and _openai_chat_singleton:
-        return _openai_chat_singleton
 
-    config = model_data.get("config", {}).copy()
-    config.update(kwargs)
+def loaded_models() -> Dict[str, bool]:
+    """
+    Tells which models are loaded with their configured config.
 
-    # Handle special case for api_key to wrap it in SecretStr
-    if "api_key" in config and config["api_key"] is not None:
-        config["api_key"] = SecretStr(config["api_key"])
+    Returns:
+        Whether each configured model is loaded, by model name.
+    """
+    return {model_name.value: model_registry.is_loaded(model_name) for model_name in MODELS_CONFIG}
 
-    # Handle special case for 'seed' to place it in 'model_kwargs'
-    if "seed" in config:
-        if "model_kwargs" not in config:
-            config["model_kwargs"] = {}
-        config["model_kwargs"]["seed"] = config.pop("seed")
 
-    logger.debug(f"Initializing ChatOpenAI with config: {config}")
-    instance = ChatOpenAI(**config)
+def warm_up(model_names: Optional[Sequence[ModelName]] = None) -> Dict[str, Optional[str]]:
+    """
+    Loads models ahead of their first use, one after the other.
+
+    Blocking (imports, model files), run it in a thread from async code.
 
-    container = ModelContainer(model=instance, config=config, is_singleton=is_singleton)
+    Args:
+        model_names: The models to load, every configured one by default.
 
-    if is_singleton and not kwargs:
-        _openai_chat_singleton = container
+    Returns:
+        The error of each model that failed to load, None for the loaded ones.
+    """
+    errors: Dict[str, Optional[str]] = {}
+    for model_name in model_names or list(MODELS_CONFIG):
+        try:
+            model_registry.get(model_name)
+            errors[model_name.value] = None
+            logger.info(f"Model {model_name.value} is warm.")
+        except Exception as e:
+            errors[model_name.value] = str(e)
+            logger.error(f"Could not warm up model {model_name.value}: {e}", exc_info=True)
+    return errors
 
-    return container
 
 def convert_prompt(template: str) -> str:
     modified_template = re.sub("[ \n\t\r]+", "⁂", template).strip()
@@ -0,0 +1,188 @@
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+import httpx
+import numpy as np
+import orjson
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "http://localhost:11434"
+# busy (503 once OLLAMA_MAX_QUEUE is full), rate limited or restarting, a 500 is
+# an error of the model or of the input that a retry would only repeat
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+# smallest sub-batch worth a request of its own when spreading texts over the slots
+MIN_BATCH_SIZE = 8
+
+
+class OllamaEmbeddingsClient:
+    """
+    OllamaEmbeddings compatible client of the ollama /api/embed endpoint.
+
+    Requests go through a shared keep-alive connection pool. Texts are split in
+    sub-batches of at most `batch_size` texts and `batch_max_chars` characters,
+    spread evenly so that up to `max_concurrency` requests run at once (the server
+    processes OLLAMA_NUM_PARALLEL of them in parallel). Connection errors and
+    busy/unavailable answers are retried up to `max_retries` times with full-jitter
+    exponential backoff, honoring Retry-After.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        base_url: Optional[str] = None,
+        http_client: Optional[httpx.Client] = None,
+        batch_size: int = 64,
+        batch_max_chars: int = 32000,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.25,
+        backoff_max_seconds: float = 8.0,
+        keep_alive: Optional[str] = None,
+        truncate: bool = True,
+        dimensions: Optional[int] = None,
+        options: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ):
+        if kwargs:
+            logger.debug(f"Ignoring OllamaEmbeddings settings not used by the client: {sorted(kwargs)}")
+        self.model = model
+        self.url = (base_url or DEFAULT_BASE_URL).rstrip("/") + "/api/embed"
+        self.http_client = http_client or httpx.Client()
+        self.batch_size = max(1, batch_size)
+        self.batch_max_chars = max(1, batch_max_chars)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.payload: Dict[str, Any] = {"model": model, "truncate": truncate}
+        if keep_alive is not None:
+            self.payload["keep_alive"] = keep_alive
+        if dimensions is not None:
+            self.payload["dimensions"] = dimensions
+        if options:
+            self.payload["options"] = options
+        self._dispatcher = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="ollama-embed")
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.texts = 0
+
+    def split(self, texts: Sequence[str]) -> List[range]:
+        """
+        Splits texts in the sub-batches sent as one request each.
+
+        Returns:
+            Index ranges of the sub-batches, in order.
+        """
+        if not texts:
+            return []
+        # enough sub-batches to respect batch_size and to keep every slot busy, of
+        # even sizes so that no small last batch runs alone
+        count = max(math.ceil(len(texts) / self.batch_size), min(self.max_concurrency, len(texts) // MIN_BATCH_SIZE))
+        target = math.ceil(len(texts) / max(1, count))
+        batches, start, chars = [], 0, 0
+        for i, text in enumerate(texts):
+            if i > start and (i - start >= target or chars + len(text) > self.batch_max_chars):
+                batches.append(range(start, i))
+                start, chars = i, 0
+            chars += len(text)
+        batches.append(range(start, len(texts)))
+        return batches
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max_seconds)
+            except ValueError:
+                pass
+        # full jitter, concurrent clients do not retry in lockstep
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_seconds * 2 ** attempt))
+
+    def _post(self, texts: List[str]) -> np.ndarray:
+        payload = {**self.payload, "input": texts}
+        attempt = 0
+        while True:
+            response = None
+            with self._lock:
+                self.requests += 1
+            try:
+                response = self.http_client.post(self.url, json=payload)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    embeddings = orjson.loads(response.content)["embeddings"]
+                    if len(embeddings) != len(texts):
+                        raise RuntimeError(f"Ollama returned {len(embeddings)} embeddings for {len(texts)} texts")
+                    return np.asarray(embeddings, dtype=np.float32)
+                error: Exception = httpx.HTTPStatusError(
+                    f"Ollama answered {response.status_code}: {response.text[:200]}",
+                    request=response.request,
+                    response=response,
+                )
+            except httpx.TransportError as e:
+                error = e
+            if attempt >= self.max_retries:
+                with self._lock:
+                    self.failures += 1
+                raise error
+            delay = self._backoff(attempt, response)
+            logger.warning(f"Ollama embed request failed ({error}), retry {attempt + 1} in {delay:.2f}s")
+            with self._lock:
+                self.retries += 1
+            time.sleep(delay)
+            attempt += 1
+
+    def embed_documents_array(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embeds texts, in concurrent sub-batches.
+
+        Args:
+            texts: The texts to embed.
+
+        Returns:
+            A float32 matrix of shape (len(texts), dimensions).
+
+        Raises:
+            httpx.HTTPError: If a sub-batch still fails after the retries.
+        """
+        texts = list(texts)
+        with self._lock:
+            self.texts += len(texts)
+        batches = self.split(texts)
+        if not batches:
+            return np.empty((0, 0), dtype=np.float32)
+        if len(batches) == 1:
+            return self._post(texts)
+        futures = [self._dispatcher.submit(self._post, texts[batch.start:batch.stop]) for batch in batches]
+        try:
+            return np.vstack([future.result() for future in futures])
+        finally:
+            # a failed sub-batch fails the call, the ones not started yet are dropped
+            for future in futures:
+                future.cancel()
+
+    def embed_query_array(self, text: str) -> np.ndarray:
+        return self.embed_documents_array([text])[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_query_array(text).tolist()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "texts": self.texts,
+                "batchSize": self.batch_size,
+                "maxConcurrency": self.max_concurrency,
+            }
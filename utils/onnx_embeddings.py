@@ -0,0 +1,233 @@
+import json
+import logging
+import os
+import re
+import threading
+import warnings
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+_POOLING_MODES = ("mean", "cls", "max")
+_METADATA_FILE = "embeddings.json"
+_FP32_FILE = "model.onnx"
+_INT8_FILE = "model.int8.onnx"
+_export_lock = threading.Lock()
+
+
+def export_dir(model_name: str, cache_folder: Optional[str] = None) -> str:
+    """Returns the directory the ONNX export of a model is written to."""
+    folder = cache_folder or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(folder, "onnx", re.sub(r"[^A-Za-z0-9_.-]+", "--", model_name.strip("/")))
+
+
+def export_onnx(model_name: str, cache_folder: Optional[str] = None, quantize: bool = False, opset: int = 17) -> str:
+    """
+    Exports the transformer of a sentence-transformers model to ONNX, once.
+
+    The graph takes the tokenizer outputs and returns the token embeddings, the
+    pooling and normalization of the model are recorded in embeddings.json next to
+    it along with the tokenizer, and applied by OnnxEmbeddings.
+
+    Args:
+        model_name: Name or path of the sentence-transformers model.
+        cache_folder: Folder of the model downloads, the export goes to its onnx/
+                      subfolder.
+        quantize: Also write a copy with weights dynamically quantized to int8.
+        opset: ONNX opset of the export.
+
+    Returns:
+        The export directory.
+    """
+    path = export_dir(model_name, cache_folder)
+    with _export_lock:
+        if not os.path.exists(os.path.join(path, _METADATA_FILE)):
+            _export(model_name, cache_folder, path, opset)
+        if quantize and not os.path.exists(os.path.join(path, _INT8_FILE)):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info(f"Quantizing the ONNX export of {model_name} to int8")
+            tmp_path = os.path.join(path, f"{_INT8_FILE}.{os.getpid()}.tmp")
+            quantize_dynamic(os.path.join(path, _FP32_FILE), tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, os.path.join(path, _INT8_FILE))
+    return path
+
+
+def _export(model_name: str, cache_folder: Optional[str], path: str, opset: int) -> None:
+    import torch
+    from sentence_transformers import SentenceTransformer, models
+
+    logger.info(f"Exporting {model_name} to ONNX in {path}")
+    model = SentenceTransformer(model_name, cache_folder=cache_folder, device="cpu")
+    transformer = model[0]
+    pooling = next((module for module in model if isinstance(module, models.Pooling)), None)
+    input_names = [name for name in _INPUT_NAMES if name in model.tokenizer.model_input_names]
+    pooling_mode = "mean"
+    if pooling is not None:
+        # an attribute since sentence-transformers 6
+        pooling_mode = getattr(pooling, "pooling_mode", None)
+        if not isinstance(pooling_mode, str):
+            pooling_mode = pooling.get_pooling_mode_str()
+    # renamed get_embedding_dimension in recent sentence-transformers
+    dimensions = (getattr(model, "get_embedding_dimension", None) or model.get_sentence_embedding_dimension)()
+    if pooling_mode not in _POOLING_MODES:
+        raise ValueError(f"Pooling '{pooling_mode}' of {model_name} is not supported, only {', '.join(_POOLING_MODES)}")
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(input_names, inputs)))[0]
+
+    sample = model.tokenizer(["an export sample", "a longer export sample text"], padding=True, return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["token_embeddings"]}
+    os.makedirs(path, exist_ok=True)
+    tmp_path = os.path.join(path, f"{_FP32_FILE}.{os.getpid()}.tmp")
+    with torch.no_grad(), warnings.catch_warnings():
+        # the tracer warns about shape checks of the attention mask, the graph is
+        # dynamic over batch and sequence
+        warnings.simplefilter("ignore")
+        torch.onnx.export(
+            TokenEmbeddings(transformer.auto_model).eval(),
+            tuple(sample[name] for name in input_names),
+            tmp_path,
+            input_names=input_names,
+            output_names=["token_embeddings"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            dynamo=False,
+        )
+    os.replace(tmp_path, os.path.join(path, _FP32_FILE))
+    model.tokenizer.save_pretrained(path)
+    metadata = {
+        "model_name": model_name,
+        "input_names": input_names,
+        "max_seq_length": model.max_seq_length,
+        "dimensions": dimensions,
+        "pooling_mode": pooling_mode,
+        "normalize": any(isinstance(module, models.Normalize) for module in model),
+        "pad_token_id": model.tokenizer.pad_token_id or 0,
+        "pad_token": model.tokenizer.pad_token or "[PAD]",
+    }
+    with open(os.path.join(path, _METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+
+class OnnxEmbeddings:
+    """
+    HuggingFaceEmbeddings compatible embeddings (same inputs, output shape,
+    pooling and normalization) computed with ONNX Runtime from an ONNX export of
+    the sentence-transformers model, made on first use and reused afterwards.
+
+    With `onnx_quantize` the weights are dynamically quantized to int8, faster and
+    4x smaller at a small accuracy cost (see scripts/onnx_embeddings_accuracy.py).
+    `onnx_intra_op_threads` sets the threads of a forward pass, 0 lets ONNX Runtime
+    use one per physical core. Texts are tokenized with the Rust tokenizer of the
+    export, torch is only imported to export.
+
+    This is not a general speedup over SentenceTransformer: on CPU the fp32 session
+    is only faster one text per forward pass, and slower from batches of a few
+    texts on. The int8 session is about 2.5x faster one text at a time, and on par
+    or slower from batches of 16. `onnx_batch_size` (texts per forward pass)
+    defaults to 1 accordingly, measure with scripts/bench_onnx_embeddings.py
+    before raising it.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_folder: Optional[str] = None,
+        model_kwargs: Optional[Dict[str, Any]] = None,
+        encode_kwargs: Optional[Dict[str, Any]] = None,
+        query_encode_kwargs: Optional[Dict[str, Any]] = None,
+        onnx_quantize: bool = False,
+        onnx_intra_op_threads: int = 0,
+        onnx_batch_size: int = 1,
+        **kwargs: Any,
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        if kwargs:
+            logger.debug(f"Ignoring HuggingFaceEmbeddings settings not used by ONNX Runtime: {sorted(kwargs)}")
+        if (model_kwargs or {}).get("device", "cpu") != "cpu":
+            logger.warning("ONNX embeddings run on the CPU, the device of model_kwargs is ignored")
+        self.model_name = model_name
+        # the batch_size of the torch settings does not apply, the tuned onnx_batch_size does
+        self.encode_kwargs = {k: v for k, v in (encode_kwargs or {}).items() if k != "batch_size"}
+        self.query_encode_kwargs = {k: v for k, v in (query_encode_kwargs or {}).items() if k != "batch_size"}
+        self.quantize = onnx_quantize
+        self.batch_size = max(1, int(onnx_batch_size))
+
+        path = export_onnx(model_name, cache_folder, quantize=onnx_quantize)
+        with open(os.path.join(path, _METADATA_FILE)) as f:
+            self.metadata = json.load(f)
+        self.model_path = os.path.join(path, _INT8_FILE if onnx_quantize else _FP32_FILE)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = max(0, onnx_intra_op_threads)
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.metadata["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.metadata["pad_token_id"], pad_token=self.metadata["pad_token"])
+        self.dimensions = self.metadata["dimensions"]
+        logger.info(f"ONNX embeddings of {model_name} loaded from {self.model_path}")
+
+    @property
+    def model_bytes(self) -> int:
+        return os.path.getsize(self.model_path)
+
+    def _pool(self, token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        mode = self.metadata["pooling_mode"]
+        if mode == "cls":
+            return token_embeddings[:, 0]
+        mask = attention_mask[..., None].astype(np.float32)
+        if mode == "max":
+            return np.where(mask > 0, token_embeddings, -1e9).max(axis=1)
+        # mean of the token embeddings, padding excluded
+        return (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def _encode(self, texts: Sequence[str], encode_kwargs: Dict[str, Any]) -> np.ndarray:
+        out = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        # longest first, like SentenceTransformer.encode, batches pad to similar lengths
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in rows])
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            token_embeddings = self.session.run(
+                None, {name: inputs[name] for name in self.metadata["input_names"]}
+            )[0]
+            out[rows] = self._pool(token_embeddings, inputs["attention_mask"])
+        if self.metadata["normalize"] or encode_kwargs.get("normalize_embeddings"):
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out
+
+    @staticmethod
+    def _clean(texts: Sequence[str]) -> List[str]:
+        # as HuggingFaceEmbeddings does
+        return [text.replace("\n", " ") for text in texts]
+
+    def embed_documents_array(self, texts: Sequence[str]) -> np.ndarray:
+        return self._encode(self._clean(texts), self.encode_kwargs)
+
+    def embed_query_array(self, text: str) -> np.ndarray:
+        return self._encode(self._clean([text]), self.query_encode_kwargs or self.encode_kwargs)[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_query_array(text).tolist()
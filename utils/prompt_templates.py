@@ -0,0 +1,251 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from string import Formatter
+from typing import Any, Dict, List, Optional, Tuple
+from config.models import PROMPT_TEMPLATES_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledTemplate:
+    """
+    An f-string prompt template split once into literal segments and slots.
+
+    Rendering joins the segments with the slot values, nothing is parsed or
+    validated per call. `bind` substitutes some of the slots ahead of time, so a
+    template bound to everything but the request content renders as
+    prefix + content + suffix.
+    """
+
+    def __init__(self, name: str, segments: List[Tuple[str, Optional[str]]]):
+        self.name = name
+        # adjacent literals are merged, every segment but the last one ends with a slot
+        merged: List[Tuple[str, Optional[str]]] = []
+        literal = ""
+        for text, slot in segments:
+            literal += text
+            if slot is not None:
+                merged.append((literal, slot))
+                literal = ""
+        merged.append((literal, None))
+        self.segments = merged
+        self.slots = frozenset(slot for _, slot in merged if slot is not None)
+
+    @classmethod
+    def parse(cls, name: str, template: str) -> "CompiledTemplate":
+        """
+        Compiles an f-string template.
+
+        Args:
+            name: Name of the template.
+            template: The template, with {slot} placeholders and {{ }} escapes.
+
+        Returns:
+            The compiled template.
+
+        Raises:
+            ValueError: If the template is malformed or uses format specs,
+                conversions or attribute access in a slot.
+        """
+        segments: List[Tuple[str, Optional[str]]] = []
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if field is not None and (spec or conversion or not field.isidentifier()):
+                raise ValueError(f"Unsupported placeholder {{{field}}} in template '{name}'")
+            segments.append((literal, field))
+        return cls(name, segments)
+
+    def bind(self, **values: Any) -> "CompiledTemplate":
+        """
+        Substitutes some slots, the others are left for render.
+
+        Args:
+            **values: Values of the slots to substitute.
+
+        Returns:
+            A new compiled template without the substituted slots.
+        """
+        segments = []
+        for literal, slot in self.segments:
+            if slot is not None and slot in values:
+                segments.append((literal + str(values[slot]), None))
+            else:
+                segments.append((literal, slot))
+        return CompiledTemplate(self.name, segments)
+
+    def render(self, **values: Any) -> str:
+        """
+        Renders the template.
+
+        Args:
+            **values: Values of every remaining slot.
+
+        Returns:
+            The rendered prompt.
+
+        Raises:
+            KeyError: If a slot has no value.
+        """
+        if len(self.segments) == 2:
+            # bound to everything but one slot, i.e. the content
+            (prefix, slot), (suffix, _) = self.segments
+            return prefix + str(values[slot]) + suffix
+        parts = []
+        for literal, slot in self.segments:
+            parts.append(literal)
+            if slot is not None:
+                parts.append(str(values[slot]))
+        return "".join(parts)
+
+
+class TemplateRegistry:
+    """
+    Prompt templates compiled once, by name.
+
+    Templates are registered from code or loaded from the LangChain JSON files of
+    a directory (as saved by scripts/prompt_json_generator.py). Bound variants are
+    cached per name and bound values, so the static part of a prompt is rendered
+    once per combination of options instead of once per request.
+    """
+
+    def __init__(self):
+        self._templates: Dict[str, CompiledTemplate] = {}
+        self._bound: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], CompiledTemplate] = {}
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.render_seconds = 0.0
+
+    def register(self, name: str, template: str, partial_variables: Optional[Dict[str, Any]] = None) -> CompiledTemplate:
+        """
+        Compiles and registers a template, replacing one of the same name.
+
+        Args:
+            name: Name of the template.
+            template: An f-string template.
+            partial_variables: Values bound once and for all.
+
+        Returns:
+            The compiled template.
+        """
+        compiled = CompiledTemplate.parse(name, template)
+        if partial_variables:
+            compiled = compiled.bind(**partial_variables)
+        with self._lock:
+            self._templates[name] = compiled
+            self._bound = {key: bound for key, bound in self._bound.items() if key[0] != name}
+        return compiled
+
+    def load_file(self, path: str) -> Optional[CompiledTemplate]:
+        """
+        Loads a LangChain prompt template saved as JSON.
+
+        Args:
+            path: Path of the JSON file, its "name" key or file name names the template.
+
+        Returns:
+            The compiled template, or None when the file is not an f-string prompt template.
+        """
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("_type", "prompt") != "prompt" or data.get("template_format", "f-string") != "f-string":
+            logger.warning(f"Skipping prompt template {path}, only f-string prompt templates are supported")
+            return None
+
+        name = data.get("name") or os.path.splitext(os.path.basename(path))[0]
+        compiled = self.register(name, data["template"], data.get("partial_variables"))
+        declared = set(data.get("input_variables", []))
+        if declared and declared != compiled.slots:
+            logger.warning(f"Prompt template {name} declares {sorted(declared)} but uses {sorted(compiled.slots)}")
+        return compiled
+
+    def load_dir(self, directory: str) -> List[str]:
+        """
+        Loads every *.json prompt template of a directory.
+
+        Args:
+            directory: The directory, a missing one loads nothing.
+
+        Returns:
+            The names of the loaded templates.
+        """
+        loaded = []
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            try:
+                compiled = self.load_file(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Could not load prompt template {path}: {e}")
+                continue
+            if compiled is not None:
+                loaded.append(compiled.name)
+        if loaded:
+            logger.info(f"Loaded prompt templates {loaded} from {directory}")
+        return loaded
+
+    def get(self, name: str) -> CompiledTemplate:
+        """
+        Raises:
+            KeyError: If no template has this name.
+        """
+        with self._lock:
+            if name not in self._templates:
+                raise KeyError(f"Prompt template '{name}' not found")
+            return self._templates[name]
+
+    def bound(self, name: str, **values: Any) -> CompiledTemplate:
+        """
+        Returns a template bound to static values, compiled on first use.
+
+        Args:
+            name: Name of the template.
+            **values: The static slot values, i.e. the response options.
+
+        Returns:
+            The bound template, the same instance for the same values.
+        """
+        key = (name, tuple(sorted((slot, str(value)) for slot, value in values.items())))
+        bound = self._bound.get(key)
+        if bound is None:
+            bound = self.get(name).bind(**values)
+            with self._lock:
+                self._bound[key] = bound
+        return bound
+
+    def render(self, name: str, static: Dict[str, Any], **values: Any) -> str:
+        """
+        Renders a template bound to `static` with the per-request `values`.
+
+        Args:
+            name: Name of the template.
+            static: Slot values shared by many requests, the bound template is cached.
+            **values: The per-request slot values.
+
+        Returns:
+            The rendered prompt.
+        """
+        start = time.perf_counter()
+        prompt = self.bound(name, **static).render(**values)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.renders += 1
+            self.render_seconds += elapsed
+        return prompt
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._templates)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "templates": sorted(self._templates),
+                "boundVariants": len(self._bound),
+                "renders": self.renders,
+                "avgRenderUs": round(self.render_seconds / self.renders * 1e6, 2) if self.renders else 0.0,
+            }
+
+
+prompt_templates = TemplateRegistry()
+prompt_templates.load_dir(PROMPT_TEMPLATES_DIR)
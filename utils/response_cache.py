@@ -0,0 +1,272 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from config.models import (
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_SEMANTIC,
+    RESPONSE_CACHE_SIMILARITY,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    namespace: str
+    answer: str
+    expires_at: float
+    # row of the entry in the semantic index of its namespace
+    row: Optional[int] = None
+
+
+class _SemanticIndex:
+    """
+    Unit vectors of the cached entries of a namespace, in the rows of a matrix that
+    grows by doubling. Freed rows are reused, so a lookup is one matrix-vector product.
+    """
+
+    def __init__(self, dimensions: int):
+        self.matrix = np.zeros((16, dimensions), dtype=np.float32)
+        self.keys: List[Optional[str]] = [None] * 16
+        self.size = 0
+        self.free: List[int] = []
+
+    def add(self, key: str, vector: np.ndarray) -> int:
+        if self.free:
+            row = self.free.pop()
+        else:
+            if self.size == len(self.matrix):
+                self.matrix = np.concatenate([self.matrix, np.zeros_like(self.matrix)])
+                self.keys.extend([None] * self.size)
+            row = self.size
+            self.size += 1
+        self.matrix[row] = vector
+        self.keys[row] = key
+        return row
+
+    def remove(self, row: int) -> None:
+        self.matrix[row] = 0
+        self.keys[row] = None
+        self.free.append(row)
+
+    def __len__(self) -> int:
+        return self.size - len(self.free)
+
+    def nearest(self, vector: np.ndarray) -> Tuple[Optional[str], float]:
+        if len(self) == 0:
+            return None, 0.0
+        scores = self.matrix[:self.size] @ vector
+        if self.free:
+            scores[self.free] = -np.inf
+        row = int(np.argmax(scores))
+        return self.keys[row], float(scores[row])
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class ResponseCache:
+    """
+    Two-tier cache of LLM answers.
+
+    The exact tier is keyed by a digest of the model, its max_tokens and the rendered
+    prompt. The semantic tier compares the embedding of the request content with
+    the ones of the cached entries of the same namespace (model and response
+    options), and returns the answer of the closest one when its cosine similarity
+    reaches `similarity_threshold`.
+
+    Entries expire `ttl_seconds` after being stored and the least recently used
+    ones are evicted past `max_entries`, from both tiers at once.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        similarity_threshold: float,
+        semantic: bool = True,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.semantic = semantic
+        self.enabled = enabled
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._indexes: Dict[str, _SemanticIndex] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(model_name: str, max_tokens: int, prompt: str) -> str:
+        """
+        Builds the exact tier key of a prompt.
+
+        Args:
+            model_name: Name of the chat model.
+            max_tokens: Completion token limit of the call.
+            prompt: The rendered prompt.
+
+        Returns:
+            A hex sha256 digest.
+        """
+        digest = hashlib.sha256()
+        digest.update(model_name.encode())
+        digest.update(b"\0")
+        digest.update(str(max_tokens).encode())
+        digest.update(b"\0")
+        digest.update(prompt.encode())
+        return digest.hexdigest()
+
+    def _drop(self, key: str) -> None:
+        # caller holds the lock
+        entry = self._entries.pop(key)
+        if entry.row is not None:
+            index = self._indexes[entry.namespace]
+            index.remove(entry.row)
+            if len(index) == 0:
+                del self._indexes[entry.namespace]
+
+    def _live(self, key: str) -> Optional[_Entry]:
+        # caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self._clock():
+            self._drop(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Looks an answer up in the exact tier.
+
+        Args:
+            key: A key built with make_key.
+
+        Returns:
+            The cached answer, or None on a miss.
+        """
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return None
+            self.exact_hits += 1
+            return entry.answer
+
+    def get_similar(self, namespace: str, vector: np.ndarray) -> Optional[Tuple[str, float]]:
+        """
+        Looks the closest answer up in the semantic tier.
+
+        Args:
+            namespace: Model and response options the answer must have been stored with.
+            vector: Embedding of the whole request content, content the embedder
+                    would truncate must not be looked up here.
+
+        Returns:
+            The cached answer and its similarity, or None when no entry reaches
+            the threshold.
+        """
+        vector = _unit(vector)
+        with self._lock:
+            while namespace in self._indexes:
+                key, score = self._indexes[namespace].nearest(vector)
+                if key is None or score < self.similarity_threshold:
+                    break
+                entry = self._live(key)
+                if entry is not None:
+                    self.semantic_hits += 1
+                    return entry.answer, score
+                # expired, the next closest entry may still be valid
+            return None
+
+    def put(self, namespace: str, key: str, answer: str, vector: Optional[np.ndarray] = None) -> None:
+        """
+        Stores an answer in the exact tier and, given the content embedding, in the
+        semantic tier.
+
+        Args:
+            namespace: Model and response options of the answer.
+            key: A key built with make_key.
+            answer: The answer of the model.
+            vector: Embedding of the request content.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            entry = _Entry(namespace=namespace, answer=answer, expires_at=self._clock() + self.ttl_seconds)
+            if vector is not None and self.semantic:
+                vector = _unit(vector)
+                index = self._indexes.get(namespace)
+                if index is None:
+                    index = self._indexes[namespace] = _SemanticIndex(len(vector))
+                entry.row = index.add(key, vector)
+            self._entries[key] = entry
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def miss(self) -> None:
+        """Counts a request that no tier could answer, lookups only count hits."""
+        with self._lock:
+            self.misses += 1
+
+    def bypass(self) -> None:
+        """Counts a request that opted out of the cache."""
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._indexes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "semantic": self.semantic,
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "ttlSeconds": self.ttl_seconds,
+                "similarityThreshold": self.similarity_threshold,
+                "exactHits": self.exact_hits,
+                "semanticHits": self.semantic_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hitRate": round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+    similarity_threshold=RESPONSE_CACHE_SIMILARITY,
+    semantic=RESPONSE_CACHE_SEMANTIC,
+    enabled=RESPONSE_CACHE_ENABLED,
+)
@@ -0,0 +1,84 @@
+import base64
+from typing import Any, Dict
+import numpy as np
+import orjson
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+from config.enums import EmbeddingFormat
+from utils.quantization import QuantizedVectors, quantize
+
+# opt-in compact formats of embedding responses, selected with the Accept header
+BINARY_MEDIA_TYPE = "application/octet-stream"
+BASE64_MEDIA_TYPE = "application/vnd.embeddings+json"
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    orjson based JSON response that serializes NumPy arrays natively, without
+    converting them to Python lists first.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def _packed(vectors: QuantizedVectors) -> Dict[str, Any]:
+    packed: Dict[str, Any] = {
+        "dtype": vectors.dtype,
+        "shape": list(vectors.data.shape),
+        "data": base64.b64encode(
+            np.ascontiguousarray(vectors.data, dtype=vectors.data.dtype.newbyteorder("<")).tobytes()
+        ).decode(),
+    }
+    if vectors.scale is not None:
+        packed["scale"] = vectors.scale
+    return packed
+
+
+def embeddings_response(
+    request: Request,
+    key: str,
+    vectors: np.ndarray,
+    meta: Dict[str, Any],
+    format: EmbeddingFormat = EmbeddingFormat.FLOAT32,
+) -> Response:
+    """
+    Builds the response of an embeddings route in the format the client asked for.
+
+    `format` picks the dtype of the vectors: float32, float16, int8 (with one
+    float32 scale per vector, values are `data * scale`) or binary, which is
+    float32 sent as raw bytes. The encoding follows the Accept header:
+
+    - `Accept: application/octet-stream` (or format=binary): raw little-endian
+      bytes, followed by the float32 scales for int8. The shape and dtype are sent
+      in the X-Embedding-Shape / X-Embedding-Dtype headers (i.e. "12,1024").
+    - `Accept: application/vnd.embeddings+json`, float16 and int8: JSON with the
+      bytes base64 encoded under `key` as {"dtype", "shape", "data"}, plus "scale"
+      for int8.
+    - anything else: JSON with the float32 vectors as arrays of numbers.
+
+    Args:
+        request: The incoming request.
+        key: Name of the vectors field in JSON responses.
+        vectors: A 1-d vector or 2-d matrix.
+        meta: The meta block of JSON responses, sent as X-Embedding-* headers otherwise.
+        format: The output format.
+
+    Returns:
+        The response.
+    """
+    accept = request.headers.get("accept", "")
+    binary = format == EmbeddingFormat.BINARY or BINARY_MEDIA_TYPE in accept
+    dtype = EmbeddingFormat.FLOAT32.value if format == EmbeddingFormat.BINARY else EmbeddingFormat(format).value
+    quantized = quantize(vectors, dtype)
+    shape = ",".join(str(size) for size in quantized.data.shape)
+
+    if binary:
+        headers = {"X-Embedding-Shape": shape, "X-Embedding-Dtype": quantized.dtype}
+        headers.update({f"X-Embedding-{name.capitalize()}": str(value) for name, value in meta.items()})
+        return Response(content=quantized.tobytes(), media_type=BINARY_MEDIA_TYPE, headers=headers)
+
+    if BASE64_MEDIA_TYPE in accept or dtype != EmbeddingFormat.FLOAT32.value:
+        return FastJSONResponse({key: _packed(quantized), "meta": meta}, media_type=BASE64_MEDIA_TYPE)
+
+    return FastJSONResponse({key: quantized.data, "meta": meta})
@@ -0,0 +1,59 @@
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict
+
+logger = logging.getLogger(__name__)
+
+# headers that keep proxies (i.e. nginx) from buffering an event stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(data: Dict[str, Any], event: str = "") -> bytes:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n".encode()
+
+
+async def sse_stream(chunks: AsyncIterator[str], meta: Dict[str, Any]) -> AsyncIterator[bytes]:
+    """
+    Forwards text chunks of a model as server-sent events.
+
+    Every chunk is sent as `data: {"token": ...}` as soon as it is produced, the
+    last event (`event: done`) carries the `meta` block with the time to the first
+    token and the total generation time. Errors are sent as `event: error`, the
+    status code can no longer change once the stream started.
+
+    Args:
+        chunks: Text chunks produced by the model.
+        meta: Meta data sent with the final event.
+
+    Yields:
+        Encoded server-sent events.
+    """
+    start_time = time.perf_counter()
+    first_token_time = None
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            if first_token_time is None:
+                first_token_time = time.perf_counter() - start_time
+            yield sse_event({"token": chunk})
+    except Exception as e:
+        logger.error(f"Error while streaming response: {e}", exc_info=True)
+        yield sse_event({"error": str(e)}, event="error")
+        return
+
+    yield sse_event(
+        {
+            "meta": {
+                **meta,
+                "timeToFirstToken": round(first_token_time, 4) if first_token_time is not None else None,
+                "generationTime": round(time.perf_counter() - start_time, 4),
+            }
+        },
+        event="done",
+    )
@@ -0,0 +1,438 @@
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from config.models import VECTOR_INDEX_DIR
+from utils.ann_index import IVFIndex, default_nlist
+
+logger = logging.getLogger(__name__)
+
+_COLLECTION_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# rows are compacted away once this share of the matrix is deleted
+_COMPACT_RATIO = 0.25
+_MIN_CAPACITY = 1024
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns the indexes of the k highest scores, best first, without sorting the
+    whole array.
+
+    Args:
+        scores: 1-d array of scores.
+        k: Number of results.
+
+    Returns:
+        Array of at most k indexes.
+    """
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.shape[0]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def _fsync_dir(directory: str) -> None:
+    # makes the renames of a directory durable
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class VectorCollection:
+    """
+    A named collection of documents and their (normalized) embedding vectors.
+
+    Vectors are stored once in a contiguous float32 matrix memory-mapped from
+    `vectors.f32`, documents in an append-only `documents.jsonl` log. Search is a
+    single matrix-vector product followed by an argpartition top-k.
+    """
+
+    def __init__(self, name: str, directory: str, dimensions: Optional[int] = None):
+        self.ann: Optional[IVFIndex] = None
+        self.name = name
+        self.directory = directory
+        self._lock = threading.RLock()
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._documents_path = os.path.join(directory, "documents.jsonl")
+        self._meta_path = os.path.join(directory, "meta.json")
+
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._matrix: Optional[np.memmap] = None
+        self.count = 0
+
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                self.dimensions = int(json.load(f)["dimensions"])
+            self._load()
+        elif dimensions:
+            self.dimensions = int(dimensions)
+            with open(self._meta_path, "w") as f:
+                json.dump({"name": name, "dimensions": self.dimensions}, f)
+            self._resize(_MIN_CAPACITY)
+        else:
+            raise ValueError(f"Collection '{name}' does not exist")
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._matrix is None else self._matrix.shape[0]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _open_matrix(self, rows: int) -> None:
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.dimensions))
+
+    def _resize(self, rows: int) -> None:
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(rows * self.dimensions * 4)
+        self._open_matrix(rows)
+        alive = np.zeros(rows, dtype=bool)
+        alive[: self._alive.shape[0]] = self._alive[:rows]
+        self._alive = alive
+
+    def _load(self) -> None:
+        vectors_tmp, documents_tmp = f"{self._vectors_path}.tmp", f"{self._documents_path}.tmp"
+        if os.path.exists(documents_tmp):
+            if os.path.exists(vectors_tmp):
+                # a compaction stopped before replacing anything
+                os.remove(vectors_tmp)
+                os.remove(documents_tmp)
+            else:
+                # a compaction stopped between the two renames
+                os.replace(documents_tmp, self._documents_path)
+        elif os.path.exists(vectors_tmp):
+            os.remove(vectors_tmp)
+
+        row_bytes = self.dimensions * 4
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._resize(max(size // row_bytes, _MIN_CAPACITY))
+
+        if os.path.exists(self._documents_path):
+            with open(self._documents_path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    row = entry["row"]
+                    if entry.get("deleted"):
+                        self._alive[row] = False
+                        self._rows.pop(self.ids[row], None)
+                        continue
+                    self.ids.append(entry["id"])
+                    self.texts.append(entry["text"])
+                    self._alive[row] = True
+                    self._rows[entry["id"]] = row
+        self.count = len(self.ids)
+        logger.info(f"Loaded collection '{self.name}' with {len(self)} documents ({self.dimensions} dimensions).")
+
+        if IVFIndex.exists(self.directory):
+            try:
+                self.ann = IVFIndex.load(self.directory, self.count)
+            except ValueError as e:
+                logger.warning(f"Reassigning rows of the IVF index of '{self.name}': {e}")
+                assert self._matrix is not None
+                self.ann = IVFIndex.load(self.directory)
+                self.ann.reset(self._matrix[: self.count])
+
+    def _append_log(self, entries: Sequence[dict]) -> None:
+        with open(self._documents_path, "a") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+
+    def add(self, documents: Sequence[str], vectors: np.ndarray, ids: Optional[Sequence[str]] = None) -> List[str]:
+        """
+        Adds documents to the collection, documents with an existing id are replaced.
+
+        Args:
+            documents: The document texts.
+            vectors: Matrix of shape (len(documents), dimensions).
+            ids: Optional document ids, random ids are generated otherwise.
+
+        Returns:
+            The ids of the added documents.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(documents) or vectors.shape[1] != self.dimensions:
+            raise ValueError(
+                f"Expected vectors of shape ({len(documents)}, {self.dimensions}), got {vectors.shape}"
+            )
+        ids = list(ids) if ids is not None else [uuid.uuid4().hex for _ in documents]
+        if len(ids) != len(documents):
+            raise ValueError("ids and documents must have the same length")
+        if len(set(ids)) != len(ids):
+            raise ValueError("ids must be unique")
+
+        with self._lock:
+            replaced = [doc_id for doc_id in ids if doc_id in self._rows]
+            if replaced:
+                self.delete(replaced)
+
+            start = self.count
+            end = start + len(documents)
+            if end > self.capacity:
+                self._resize(max(end, self.capacity * 2))
+            assert self._matrix is not None
+            self._matrix[start:end] = vectors
+            self._matrix.flush()
+            if self.ann is not None:
+                self.ann.add(start, vectors)
+
+            self.ids.extend(ids)
+            self.texts.extend(documents)
+            self._alive[start:end] = True
+            for offset, doc_id in enumerate(ids):
+                self._rows[doc_id] = start + offset
+            self.count = end
+            self._append_log(
+                [{"row": start + offset, "id": doc_id, "text": text} for offset, (doc_id, text) in enumerate(zip(ids, documents))]
+            )
+        return ids
+
+    def delete(self, ids: Sequence[str]) -> int:
+        """
+        Deletes documents by id, unknown ids are ignored.
+
+        Args:
+            ids: The ids to delete.
+
+        Returns:
+            The number of deleted documents.
+        """
+        with self._lock:
+            rows = [self._rows.pop(doc_id) for doc_id in ids if doc_id in self._rows]
+            if not rows:
+                return 0
+            self._alive[rows] = False
+            self._append_log([{"row": row, "deleted": True} for row in rows])
+            if self.count and (self.count - len(self)) / self.count > _COMPACT_RATIO:
+                self.compact()
+            return len(rows)
+
+    def compact(self) -> None:
+        """
+        Rewrites the matrix and the document log without deleted rows.
+
+        The compacted files are written next to the originals and renamed over
+        them, the in-memory state is only swapped once both are in place.
+        """
+        with self._lock:
+            assert self._matrix is not None
+            keep = np.flatnonzero(self._alive[: self.count])
+            ids = [self.ids[row] for row in keep]
+            texts = [self.texts[row] for row in keep]
+            capacity = max(len(keep) * 2, _MIN_CAPACITY)
+
+            vectors_tmp, documents_tmp = f"{self._vectors_path}.tmp", f"{self._documents_path}.tmp"
+            with open(vectors_tmp, "wb") as f:
+                f.write(np.ascontiguousarray(self._matrix[keep]).tobytes())
+                f.truncate(capacity * self.dimensions * 4)
+                f.flush()
+                os.fsync(f.fileno())
+            with open(documents_tmp, "w") as f:
+                f.write("".join(
+                    json.dumps({"row": row, "id": doc_id, "text": text}) + "\n"
+                    for row, (doc_id, text) in enumerate(zip(ids, texts))
+                ))
+                f.flush()
+                os.fsync(f.fileno())
+
+            # the vectors first, _load finishes the swap if it stops in between
+            self._matrix.flush()
+            self._matrix = None
+            os.replace(vectors_tmp, self._vectors_path)
+            os.replace(documents_tmp, self._documents_path)
+            _fsync_dir(self.directory)
+
+            self.ids, self.texts, self.count = ids, texts, len(keep)
+            self._rows = {doc_id: row for row, doc_id in enumerate(ids)}
+            self._alive = np.zeros(capacity, dtype=bool)
+            self._alive[: self.count] = True
+            self._open_matrix(capacity)
+            if self.ann is not None:
+                # rows were renumbered, the trained centroids are kept
+                self.ann.reset(self._matrix[: self.count])
+            logger.info(f"Compacted collection '{self.name}' to {len(self)} documents.")
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 3,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+    ) -> List[Tuple[str, str, float]]:
+        """
+        Finds the k documents closest to a normalized query vector.
+
+        Args:
+            query: Vector of shape (dimensions,).
+            k: Number of results.
+            nprobe: Cells scanned when the collection has an IVF index.
+            exact: Scan every row even if the collection has an IVF index.
+
+        Returns:
+            A list of (id, text, score) tuples, best first.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        if query.shape != (self.dimensions,):
+            raise ValueError(f"Expected a query vector of {self.dimensions} dimensions, got {query.shape}")
+
+        with self._lock:
+            count = self.count
+            matrix = self._matrix
+            alive = self._alive[:count]
+            ids, texts = self.ids, self.texts
+            ann = None if exact else self.ann
+            candidates = ann.candidates(query, nprobe) if ann is not None else None
+        if matrix is None or count == 0:
+            return []
+
+        if candidates is not None:
+            # approximate: only the rows of the closest cells are scored
+            candidates = np.sort(candidates[alive[candidates]])
+            scores = matrix[candidates] @ query
+            return [
+                (ids[candidates[i]], texts[candidates[i]], float(scores[i]))
+                for i in top_k(scores, k)
+            ]
+
+        # vectors are normalized, so the dot product is the cosine similarity
+        scores = matrix[:count] @ query
+        if not alive.all():
+            scores[~alive] = -np.inf
+        rows = top_k(scores, min(k, int(alive.sum())))
+        return [(ids[row], texts[row], float(scores[row])) for row in rows]
+
+    def build_index(self, nlist: Optional[int] = None, nprobe: Optional[int] = None) -> dict:
+        """
+        Trains and attaches an IVF index, replacing an existing one. Rows added
+        later are assigned to the trained cells incrementally.
+
+        Args:
+            nlist: Number of cells, defaults to default_nlist of the collection size.
+            nprobe: Default number of cells scanned per query.
+
+        Returns:
+            A description of the index.
+        """
+        with self._lock:
+            assert self._matrix is not None
+            if len(self) == 0:
+                raise ValueError(f"Collection '{self.name}' is empty")
+            if self.count != len(self):
+                self.compact()
+            vectors = self._matrix[: self.count]
+            ann = IVFIndex.train(
+                self.directory,
+                vectors,
+                nlist=nlist or default_nlist(self.count),
+                nprobe=nprobe or 8,
+            )
+            ann.add(0, vectors)
+            ann.save()
+            self.ann = ann
+            logger.info(f"Built IVF index for collection '{self.name}': {ann.describe()}")
+            return ann.describe()
+
+    def drop_index(self) -> bool:
+        with self._lock:
+            if self.ann is None:
+                return False
+            self.ann = None
+            IVFIndex.remove(self.directory)
+            return True
+
+    def close(self) -> None:
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+
+
+class VectorIndexStore:
+    """
+    Keeps the named collections of a directory open, one sub folder per collection.
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self._collections: Dict[str, VectorCollection] = {}
+        self._lock = threading.Lock()
+
+    def _directory(self, name: str) -> str:
+        if not _COLLECTION_NAME.match(name):
+            raise ValueError(f"Invalid collection name '{name}', use 1-64 letters, digits, '_' or '-'")
+        return os.path.join(self.root_dir, name)
+
+    def exists(self, name: str) -> bool:
+        return name in self._collections or os.path.exists(os.path.join(self._directory(name), "meta.json"))
+
+    def get(self, name: str) -> VectorCollection:
+        """
+        Returns an existing collection.
+
+        Raises:
+            KeyError: If the collection does not exist.
+        """
+        directory = self._directory(name)
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                if not os.path.exists(os.path.join(directory, "meta.json")):
+                    raise KeyError(f"Collection '{name}' not found")
+                collection = VectorCollection(name, directory)
+                self._collections[name] = collection
+            return collection
+
+    def get_or_create(self, name: str, dimensions: int) -> VectorCollection:
+        directory = self._directory(name)
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = VectorCollection(name, directory, dimensions)
+                self._collections[name] = collection
+        if collection.dimensions != dimensions:
+            raise ValueError(
+                f"Collection '{name}' holds {collection.dimensions} dimensional vectors, got {dimensions}"
+            )
+        return collection
+
+    def drop(self, name: str) -> bool:
+        directory = self._directory(name)
+        with self._lock:
+            collection = self._collections.pop(name, None)
+            if collection is not None:
+                collection.close()
+            if not os.path.exists(directory):
+                return False
+            shutil.rmtree(directory)
+            return True
+
+    def names(self) -> List[str]:
+        if not os.path.isdir(self.root_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root_dir)
+            if os.path.exists(os.path.join(self.root_dir, name, "meta.json"))
+        )
+
+
+vector_index_store = VectorIndexStore(VECTOR_INDEX_DIR)